@@ -1,18 +1,35 @@
 import os
 import json
-import threading
+import math
 import time
 from urllib.parse import quote
-from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+from flask import Flask, g, request, jsonify, render_template, Response, stream_with_context, send_from_directory
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_caching import Cache
 
-from src.constants import SAUDACOES_WORDS, SAUDACOES_PHRASES, IDENTITY_KEYWORDS
-from src.utils import load_prompt_data, normalize_text
-from src.search import build_search_index, find_item_smart
+from src.constants import (
+    RESPOSTA_SAUDACAO, RESPOSTA_CREDITOS, SAUDACOES_WORDS, SAUDACOES_PHRASES, IDENTITY_KEYWORDS,
+    HISTORY_KEYWORDS, GENERIC_TRIGGERS, STOP_WORDS, CATEGORIAS_ALVO, AVISO_PRAZO
+)
+from src.utils import normalize_text
+from src.search import buscar_item, publicar_indice, serializar_payload, dados_publicos, ranquear
+from src.geo import coordenada_valida, coordenadas_do_item
+from src.reloader import BaseConhecimento, Recarregador, carregar_base
+from src.router import rotear
+from src import metricas
+from src.cache_respostas import CacheLRU, CacheRedis, chave_canonica
+from src import limites  # registra o esquema guia+redis:// no limits
+from src.coalescencia import CoalescedorStreams
+from src.sessoes import ArmazemSessoes, ArmazemSessoesRedis, id_sessao_valido, novo_id_sessao
+from src.respostas import resposta_template, renderizar_reserva
+from src.config import (
+    INDEX_SNAPSHOT, TEMPLATE_MIN_SCORE, METRICS_ENABLED, LLM_COALESCE, GEO_VIZINHOS, GEO_RAIO_KM,
+    SESSION_MAX_MESSAGES, SESSION_TTL, SESSION_MAX, HISTORY_MSG_MAX_TOKENS,
+    SEARCH_RATE_LIMIT, SEARCH_MAX_LIMIT, SEARCH_MIN_SCORE, LIMITER_SYNC_INTERVAL, LIMITE_CUSTO_RAPIDO,
+    LIMITE_CUSTO_NORMAL, CACHE_TTL, CACHE_MAX_ITEMS
+)
 from src.llm import conversar_com_chat
-from src.logger import log_interaction
+from src.logger import log_interaction, descarregar_logs
 
 APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 PROMPT_FILE = os.path.join(APP_ROOT, "data", "prompt.json")
@@ -20,98 +37,423 @@ PROMPT_FILE = os.path.join(APP_ROOT, "data", "prompt.json")
 app = Flask(__name__)
 
 redis_url = os.getenv("REDIS_URL")
-storage_uri = redis_url if redis_url else "memory://"
-cache_config = {
-    'CACHE_TYPE': 'RedisCache',
-    'CACHE_REDIS_URL': redis_url
-} if redis_url else {'CACHE_TYPE': 'SimpleCache'}
+# Redis só é importado e conectado no primeiro uso (src/conexao_redis.py), não na partida a frio.
+# Os limites contam localmente e sincronizam em lote; LIMITER_SYNC_INTERVAL=0 volta a consultar o Redis a cada requisição
+if redis_url:
+    storage_uri = f"guia+hibrido+{redis_url}" if LIMITER_SYNC_INTERVAL > 0 else f"guia+{redis_url}"
+else:
+    storage_uri = "memory://"
+
+coalescedor = CoalescedorStreams()
+
+# Testes de carga (benchmarks/bench_carga.py) desligam o limite com RATELIMIT_ENABLED=0
+app.config.setdefault("RATELIMIT_ENABLED", os.getenv("RATELIMIT_ENABLED", "1") != "0")
 
 limiter = Limiter(get_remote_address, app=app, default_limits=["200 per day", "50 per hour"], storage_uri=storage_uri)
-cache = Cache(app, config=cache_config)
+# Respostas da IA por consulta canônica: no Redis são compartilhadas entre instâncias, sem ele ficam num LRU local
+cache_respostas = CacheRedis(redis_url, CACHE_TTL) if redis_url else CacheLRU(CACHE_MAX_ITEMS, CACHE_TTL)
+
+# Rankings do /search por versão da base, consulta e filtro; as páginas saem do mesmo ranking
+cache_busca = CacheLRU(CACHE_MAX_ITEMS, CACHE_TTL)
+
+# Histórico da conversa fica no servidor; o cliente só devolve o id da sessão
+sessoes = (ArmazemSessoesRedis(redis_url, SESSION_TTL, SESSION_MAX_MESSAGES, HISTORY_MSG_MAX_TOKENS) if redis_url
+           else ArmazemSessoes(SESSION_MAX, SESSION_TTL, SESSION_MAX_MESSAGES, HISTORY_MSG_MAX_TOKENS))
 
-prompt_data = load_prompt_data(PROMPT_FILE)
-system_prompt = "\n".join(prompt_data.get("system_prompt", [])) if prompt_data else None
-if prompt_data:
-    build_search_index(prompt_data)
+base = carregar_base(PROMPT_FILE, INDEX_SNAPSHOT)
+prompt_data = base.data if base else None
+system_prompt = base.system_prompt if base else None
+if base:
+    publicar_indice(base.indice)
+
+def trocar_base(nova: BaseConhecimento):
+    global base, prompt_data, system_prompt
+    # Cada requisição lê `base` uma única vez, então dados, prompt e índice mudam juntos
+    base = nova
+    prompt_data = nova.data
+    system_prompt = nova.system_prompt
+    publicar_indice(nova.indice)
+
+recarregador = Recarregador(PROMPT_FILE, trocar_base, base.assinatura if base else None)
+recarregador.iniciar()
 
 def create_search_map_link(query: str) -> str:
     full_query = quote(f"{query}, Axixá, Maranhão")
     return f"https://www.google.com/maps/search/?api=1&query={full_query}"
 
-def responder_rapido(pergunta, resposta, tipo_log):
-    threading.Thread(target=log_interaction, args=(pergunta, resposta, tipo_log)).start()
-    return jsonify({"resposta": resposta, "mapa_link": None, "local_nome": tipo_log})
+def create_coord_map_link(lat: float, lon: float) -> str:
+    return f"https://www.google.com/maps/search/?api=1&query={lat:.6f},{lon:.6f}"
+
+def mapa_do_item(item: dict) -> str:
+    local_nome = item.get("nome") or item.get("orgao")
+    endereco = item.get("localizacao") or item.get("endereco") or ""
+    coordenadas = coordenadas_do_item(item)
+    if coordenadas:
+        return create_coord_map_link(*coordenadas)
+    if len(endereco) > 5 and "rural" not in endereco.lower():
+        return create_search_map_link(f"{local_nome}, {endereco}")
+    return create_search_map_link(local_nome)
+
+def estatisticas_cache() -> dict:
+    hits, misses = metricas.cache_consultas["hit"], metricas.cache_consultas["miss"]
+    estatisticas = {"hits": hits, "misses": misses, "taxa_acerto": hits / (hits + misses) if hits + misses else 0.0}
+    if isinstance(cache_respostas, CacheLRU):
+        estatisticas.update(itens=len(cache_respostas), expulsos=cache_respostas.expulsos)
+    return estatisticas
+
+metricas.REGISTRO.append(metricas.Medidor(
+    "guia_cache_taxa_acerto", "Fração das consultas ao cache de respostas que acertaram",
+    lambda: estatisticas_cache()["taxa_acerto"]))
+
+# Quantas respostas saíram por cada caminho (rapido, template, cache, llm)
+caminhos = metricas.respostas
+
+def registrar_caminho(caminho: str):
+    caminhos.incrementar(caminho)
+
+def responder_rapido(pergunta, resposta, tipo_log, sessao=None):
+    registrar_caminho("rapido")
+    log_interaction(pergunta, resposta, tipo_log, "rapido")
+    # Saudação e créditos não entram na sessão: não dão contexto e, com histórico,
+    # as perguntas seguintes perderiam o template e o cache
+    return jsonify({"resposta": resposta, "mapa_link": None, "local_nome": tipo_log, "sessao": sessao})
+
+@app.before_request
+def garantir_recarregador():
+    recarregador.iniciar()
+
+@app.after_request
+def gravar_logs_ao_fechar(response):
+    # Com LOG_SYNC os registros da requisição são gravados depois que a resposta (ou o stream) terminou
+    response.call_on_close(descarregar_logs)
+    return response
 
 @app.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/chat", methods=["POST"])
-@limiter.limit("10 per minute")
-def chat():
-    start_time = time.time()
-    data = request.json
+@app.errorhandler(429)
+def limite_excedido(e):
+    metricas.limite_excedido.incrementar()
+    return e.get_response()
+
+@app.route("/metrics")
+@limiter.exempt
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"erro": "Métricas desligadas"}), 404
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/sw.js")
+def service_worker():
+    # Servido na raiz para o escopo do service worker cobrir "/" e "/chat"
+    response = send_from_directory(app.static_folder, "sw.js", mimetype="application/javascript", max_age=0)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Service-Worker-Allowed"] = "/"
+    return response
+
+def snapshot_compacto(kb: BaseConhecimento) -> dict:
+    categorias = {}
+    for categoria in CATEGORIAS_ALVO:
+        categorias[categoria] = [
+            {
+                "nome": item.get("nome") or item.get("orgao"),
+                "local": item.get("localizacao") or item.get("endereco"),
+                "descricao": item.get("descricao") or item.get("descrição")
+            }
+            for item in kb.data.get(categoria, [])
+        ]
+    return {
+        "versao": kb.versao,
+        "respostas": {"saudacao": RESPOSTA_SAUDACAO, "creditos": RESPOSTA_CREDITOS},
+        "roteamento": {
+            "saudacoes_palavras": sorted(SAUDACOES_WORDS),
+            "saudacoes_frases": SAUDACOES_PHRASES,
+            "identidade": IDENTITY_KEYWORDS,
+            "historia": HISTORY_KEYWORDS,
+            "gatilhos_gerais": GENERIC_TRIGGERS,
+            "stop_words": sorted(STOP_WORDS)
+        },
+        "historia": kb.data.get("historia_axixa"),
+        "categorias": categorias
+    }
+
+_snapshot_serializado = (None, None)
+
+@app.route("/conhecimento")
+@limiter.exempt
+def conhecimento():
+    kb = base
+    if not kb:
+        return jsonify({"erro": "Base de conhecimento indisponível"}), 503
+    etag = f'"{kb.versao}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers={"ETag": etag})
+    global _snapshot_serializado
+    if _snapshot_serializado[0] != kb.versao:
+        _snapshot_serializado = (kb.versao, json.dumps(snapshot_compacto(kb), ensure_ascii=False, separators=(",", ":")))
+    corpo = _snapshot_serializado[1]
+    response = Response(corpo, mimetype="application/json")
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return response
+
+def parametro_inteiro(valor, padrao: int, minimo: int, maximo: int) -> int:
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        return padrao
+    return max(minimo, min(maximo, numero))
+
+def resultado_busca(ranqueado) -> dict:
+    item = ranqueado.item
+    return {
+        "nome": item.get("nome") or item.get("orgao"),
+        "categoria": ranqueado.categoria,
+        "score": round(ranqueado.score, 1),
+        "motivos": {
+            "fuzzy": round(ranqueado.fuzzy, 1),
+            "bonus_nome": ranqueado.bonus_nome,
+            "bonus_categoria": ranqueado.bonus_categoria
+        },
+        "mapa_link": mapa_do_item(item),
+        "item": dados_publicos(item)
+    }
+
+@app.route("/search")
+@limiter.limit(SEARCH_RATE_LIMIT)
+def buscar():
+    # Top-k estruturado, sem IA: o front e parceiros montam listas na hora
+    kb = base
+    if not kb:
+        return jsonify({"erro": "Base de conhecimento indisponível"}), 503
+    pergunta, erro = validar_pergunta({"pergunta": request.args.get("q", "").strip()})
+    if erro:
+        return jsonify(erro), 400
+    categorias = tuple(sorted({c.strip() for c in request.args.get("categoria", "").split(",") if c.strip()}))
+    desconhecidas = [c for c in categorias if c not in CATEGORIAS_ALVO]
+    if desconhecidas:
+        return jsonify({"erro": f"Categoria desconhecida: {', '.join(desconhecidas)}"}), 400
+    pagina = parametro_inteiro(request.args.get("pagina"), 1, 1, 10_000)
+    limite = parametro_inteiro(request.args.get("limite"), 10, 1, SEARCH_MAX_LIMIT)
+
+    chave = f"{kb.versao}|{normalize_text(pergunta)}|{','.join(categorias)}"
+    ranqueados = cache_busca.get(chave)
+    if ranqueados is None:
+        ranqueados = ranquear(pergunta, kb.indice, categorias, SEARCH_MIN_SCORE)
+        cache_busca.set(chave, ranqueados)
+    inicio = (pagina - 1) * limite
+    response = jsonify({
+        "consulta": pergunta,
+        "versao": kb.versao,
+        "total": len(ranqueados),
+        "pagina": pagina,
+        "limite": limite,
+        "paginas": math.ceil(len(ranqueados) / limite),
+        "resultados": [resultado_busca(r) for r in ranqueados[inicio:inicio + limite]]
+    })
+    # Mesma URL, mesma base: CDN e navegador podem reaproveitar por um minuto
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response
+
+def validar_pergunta(data: dict):
     pergunta = data.get("pergunta", "")
-    historico = data.get("historico", [])
-    
     if not pergunta:
-        return jsonify({"erro": "Pergunta vazia"}), 400
+        return None, {"erro": "Pergunta vazia"}
     if len(pergunta) > 500:
-        return jsonify({"erro": "Sua pergunta é muito longa (max 500 caracteres)."}), 400
+        return None, {"erro": "Sua pergunta é muito longa (max 500 caracteres)."}
+    return pergunta, None
+
+def validar_sessao(data: dict) -> str:
+    # Id ausente ou malformado abre uma sessão nova; histórico enviado pelo cliente é ignorado
+    sessao = data.get("sessao")
+    return sessao if id_sessao_valido(sessao) else novo_id_sessao()
+
+def registrar_turno(sessao: str, pergunta: str, resposta: str):
+    if resposta and "[Erro" not in resposta:
+        sessoes.registrar(sessao, pergunta, resposta)
 
+def validar_localizacao(data: dict):
+    # Opcional: {"lat": ..., "lon": ...} do navigator.geolocation; valor inválido é ignorado
+    localizacao = data.get("localizacao")
+    if not isinstance(localizacao, dict):
+        return None
+    lat, lon = localizacao.get("lat"), localizacao.get("lon")
+    return (float(lat), float(lon)) if coordenada_valida(lat, lon) else None
+
+def geral_proximos(proximos: list) -> dict:
+    # Distâncias arredondadas a 100 m: posições vizinhas geram o mesmo payload (e a mesma chave de cache)
+    items = [dict(p.item, categoria=p.categoria, distancia_km=round(p.distancia_km, 1)) for p in proximos]
+    return {"is_general": True, "category": "perto de você", "items": items}
+
+def resolver_pergunta(pergunta: str, localizacao: tuple = None) -> dict:
+    kb = base
+    cronometro = metricas.Cronometro()
     texto_input = normalize_text(pergunta)
+    cronometro.marcar("normalizar")
+    rota = rotear(texto_input)
+    cronometro.marcar("rotear")
+    plano = {
+        "texto_input": texto_input,
+        "system_prompt": kb.system_prompt if kb else None,
+        "resposta_rapida": None,
+        "item_data_json": None,
+        "local_nome": None,
+        "mapa_link": None,
+        "resposta_template": None,
+        "resposta_reserva": None,
+        "caminho": "llm",
+        "termos": rota.termos,
+        "item_id": None
+    }
     
-    palavras_input = set(texto_input.split())
-    if (palavras_input & SAUDACOES_WORDS) or any(p in texto_input for p in SAUDACOES_PHRASES):
-        return responder_rapido(pergunta, "Olá! Sou o Guia Digital de Axixá. Posso ajudar com escolas, lojas, turismo e história da cidade.", "Saudação")
+    if rota.saudacao:
+        plano["resposta_rapida"] = (RESPOSTA_SAUDACAO, "Saudação")
+        return plano
     
-    if any(k in texto_input for k in IDENTITY_KEYWORDS):
-        return responder_rapido(pergunta, "Desenvolvido por: Guilherme Moreira, José Ribamar, Marina de Jesus e Rikelmy Rabelo.", "Créditos")
-
-    item_data_json = None
-    local_nome = None
-    mapa_link = None
-    item_encontrado = None
-
-    if "historia" in texto_input:
-        item_data_json = json.dumps(prompt_data.get("historia_axixa"), ensure_ascii=False)
-        local_nome = "História"
-    elif "comida" in texto_input and "quais" in texto_input:
-        item_data_json = json.dumps(prompt_data.get("comidas_tipicas"), ensure_ascii=False)
-        local_nome = "Comidas Típicas"
+    if rota.identidade:
+        plano["resposta_rapida"] = (RESPOSTA_CREDITOS, "Créditos")
+        return plano
+
+    resultado = None
+    espacial = kb.indice.espacial if kb and localizacao and rota.perto_de_mim else None
+    proximos = espacial.proximos(*localizacao, GEO_VIZINHOS, rota.categorias, GEO_RAIO_KM or None) if espacial else None
+
+    if proximos:
+        geral = geral_proximos(proximos)
+        plano["item_data_json"] = serializar_payload(geral)
+        plano["resposta_reserva"] = renderizar_reserva(geral)
+        plano["item_id"] = "perto:" + ",".join(f"{p.categoria}:{p.posicao}" for p in proximos)
+        plano["local_nome"] = "Perto de você"
+        plano["mapa_link"] = create_coord_map_link(*coordenadas_do_item(proximos[0].item))
+        return plano
+
+    if rota.historia:
+        plano["item_data_json"] = kb.secoes["historia_axixa"]
+        plano["item_id"] = "historia_axixa"
+        plano["local_nome"] = "História"
+    elif rota.lista_comidas:
+        plano["item_data_json"] = kb.secoes["comidas_tipicas"]
+        plano["item_id"] = "comidas_tipicas"
+        plano["local_nome"] = "Comidas Típicas"
     else:
-        item_encontrado = find_item_smart(pergunta)
-
-    if item_encontrado and not item_data_json:
-        item_encontrado_copy = dict(item_encontrado)
-        if item_encontrado_copy.get("is_general"):
-            cat = item_encontrado_copy.get("category", "").lower()
-            if cat in ("escolas", "lojas", "igrejas"):
-                item_encontrado_copy["description"] = (
-                    str(item_encontrado_copy.get("description", "")) + " povoados"
-                )
-        item_data_json = json.dumps(item_encontrado_copy, ensure_ascii=False)
+        resultado = buscar_item(pergunta, rota, kb.indice if kb else None)
+        cronometro.marcar("buscar")
+
+    if resultado:
+        item_encontrado = resultado.item
+        plano["item_data_json"] = resultado.payload
+        plano["item_id"] = f"{resultado.categoria}:{resultado.posicao}"
+        plano["resposta_reserva"] = renderizar_reserva(resultado.item)
         
         if item_encontrado.get("is_general"):
-            local_nome = f"Geral: {item_encontrado.get('category')}"
+            plano["local_nome"] = f"Geral: {item_encontrado.get('category')}"
         else:
-            local_nome = item_encontrado.get("nome") or item_encontrado.get("orgao")
-            endereco = item_encontrado.get("localizacao") or item_encontrado.get("endereco") or ""
-            if len(endereco) > 5 and "rural" not in endereco.lower():
-                mapa_link = create_search_map_link(f"{local_nome}, {endereco}")
-            else:
-                mapa_link = create_search_map_link(local_nome)
+            plano["mapa_link"] = mapa_do_item(item_encontrado)
+            plano["local_nome"] = item_encontrado.get("nome") or item_encontrado.get("orgao")
+            if kb:
+                plano["resposta_template"] = resposta_template(resultado, rota, kb.indice, TEMPLATE_MIN_SCORE)
+
+    return plano
+
+def cabecalho_stream(plano: dict, sessao: str = None) -> str:
+    return json.dumps({"mapa_link": plano["mapa_link"], "local_nome": plano["local_nome"], "origem": plano["caminho"], "sessao": sessao}) + "\n"
+
+def trocar_por_reserva(plano: dict, chunk: str, full_response: str) -> str:
+    # Nenhum provedor respondeu (ou o prazo acabou antes do primeiro token): com um item encontrado, a resposta sai do template
+    if not full_response and (chunk.startswith("[Erro") or chunk == AVISO_PRAZO) and plano["resposta_reserva"]:
+        plano["caminho"] = "reserva"
+        registrar_caminho("reserva")
+        return plano["resposta_reserva"]
+    return chunk
+
+def resposta_cacheavel(plano: dict, full_response: str) -> bool:
+    return bool(full_response) and plano["caminho"] != "reserva" and "[Erro" not in full_response and AVISO_PRAZO not in full_response
+
+def escolher_caminho(plano: dict, historico) -> tuple:
+    # O template só cobre perguntas inteiramente sobre o item, então vale mesmo no meio
+    # de uma conversa; já o cache é pulado com histórico, porque a resposta depende dela
+    if plano["resposta_template"]:
+        plano["caminho"] = "template"
+        registrar_caminho("template")
+        return None, plano["resposta_template"]
+    chave_cache = None if historico else chave_canonica(plano["termos"], plano["texto_input"], plano["item_id"], plano["item_data_json"])
+    resposta_cache = cache_respostas.get(chave_cache) if chave_cache else None
+    if chave_cache:
+        metricas.cache_consultas.incrementar("miss" if resposta_cache is None else "hit")
+    plano["caminho"] = "cache" if resposta_cache is not None else "llm"
+    registrar_caminho(plano["caminho"])
+    return chave_cache, resposta_cache
+
+# 10 perguntas normais por minuto, qualquer que seja o custo de cada uma
+LIMITE_CHAT = f"{10 * LIMITE_CUSTO_NORMAL} per minute"
+
+def custo_pergunta(data) -> int:
+    # Saudação e créditos saem sem IA: custam LIMITE_CUSTO_RAPIDO no limite do /chat (0 isenta)
+    pergunta = data.get("pergunta") if isinstance(data, dict) else None
+    if not isinstance(pergunta, str) or not pergunta or len(pergunta) > 500:
+        return LIMITE_CUSTO_NORMAL
+    rota = rotear(normalize_text(pergunta))
+    return LIMITE_CUSTO_RAPIDO if rota.saudacao or rota.identidade else LIMITE_CUSTO_NORMAL
+
+def custo_chat() -> int:
+    # O limiter consulta o custo duas vezes (exempt_when e cost): roteia a pergunta uma vez só
+    if "custo_chat" not in g:
+        g.custo_chat = custo_pergunta(request.get_json(silent=True))
+    return g.custo_chat
+
+@app.route("/chat", methods=["POST"])
+@limiter.limit(LIMITE_CHAT, cost=custo_chat, exempt_when=lambda: custo_chat() == 0)
+def chat():
+    start_time = time.time()
+    data = request.json
+    pergunta, erro = validar_pergunta(data)
+    
+    if erro:
+        return jsonify(erro), 400
+
+    sessao = validar_sessao(data)
+    historico = sessoes.historico(sessao)
+    plano = resolver_pergunta(pergunta, validar_localizacao(data))
+    if plano["resposta_rapida"]:
+        return responder_rapido(pergunta, *plano["resposta_rapida"], sessao)
+
+    item_data_json = plano["item_data_json"]
+    local_nome = plano["local_nome"]
+    chave_cache, resposta_pronta = escolher_caminho(plano, historico)
 
     def generate():
-        yield json.dumps({"mapa_link": mapa_link, "local_nome": local_nome}) + "\n"
+        cronometro = metricas.Cronometro()
+        yield cabecalho_stream(plano, sessao)
         
         full_response = ""
-        for chunk in conversar_com_chat(pergunta, system_prompt, item_data_json, historico):
-            full_response += chunk
-            yield chunk
+        if resposta_pronta is not None:
+            full_response = resposta_pronta
+            yield resposta_pronta
+        else:
+            stream = coalescedor.transmitir(
+                chave_cache if LLM_COALESCE else None,
+                lambda: conversar_com_chat(pergunta, plano["system_prompt"], item_data_json, historico))
+            try:
+                for chunk in stream:
+                    if not full_response:
+                        chunk = trocar_por_reserva(plano, chunk, full_response)
+                        cronometro.marcar("primeiro_token" if plano["caminho"] == "llm" else None)
+                    full_response += chunk
+                    yield chunk
+            finally:
+                # Se o cliente sair no meio do stream, fecha a conexão com a OpenRouter também
+                stream.close()
+            if chave_cache and resposta_cacheavel(plano, full_response):
+                cache_respostas.set(chave_cache, full_response)
+        # primeiro_token e stream só descrevem a IA; template e cache não entram no histograma
+        cronometro.marcar("stream" if plano["caminho"] == "llm" else None, desde_inicio=True)
+        registrar_turno(sessao, pergunta, full_response)
         
-        threading.Thread(target=log_interaction, args=(pergunta, full_response, local_nome)).start()
-        print(f"\033[92m[Latência] Total: {time.time() - start_time:.2f}s\033[0m")
+        log_interaction(pergunta, full_response, local_nome, plano["caminho"])
+        cronometro.marcar("registrar_log")
+        metricas.observar("total", time.time() - start_time)
+        print(f"\033[92m[Latência] Total: {time.time() - start_time:.2f}s ({plano['caminho']})\033[0m")
 
     return Response(stream_with_context(generate()), mimetype='text/plain')
 
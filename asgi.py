@@ -0,0 +1,161 @@
+# Entrada ASGI: uvicorn asgi:asgi_app
+# O /chat roda em asyncio (um processo segura centenas de streams abertos);
+# as demais rotas continuam no Flask através do WsgiToAsgi.
+import asyncio
+import json
+import time
+from asgiref.wsgi import WsgiToAsgi
+from limits import parse
+
+import app as appmod
+from src import metricas
+from src.coalescencia import CoalescedorStreamsAsync
+from src.config import LLM_COALESCE
+from src.llm import conversar_com_chat_async
+from src.logger import log_interaction, descarregar_logs
+
+LIMITE_CHAT = parse(appmod.LIMITE_CHAT)
+
+flask_asgi = WsgiToAsgi(appmod.app)
+coalescedor = CoalescedorStreamsAsync()
+
+async def ler_corpo(receive):
+    corpo = b""
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "http.disconnect":
+            return None
+        corpo += mensagem.get("body", b"")
+        if not mensagem.get("more_body"):
+            return corpo
+
+async def enviar_json(send, payload: dict, status: int = 200):
+    corpo = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())]
+    })
+    await send({"type": "http.response.body", "body": corpo})
+
+async def esperar_desconexao(receive):
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "http.disconnect":
+            return
+
+async def dentro_do_limite(scope, custo: int = 1) -> bool:
+    if not appmod.limiter.enabled or custo == 0:
+        return True
+    cliente = (scope.get("client") or ("127.0.0.1", 0))[0]
+    # Com Redis o hit é I/O bloqueante: fora do event loop, como o cache e as sessões
+    return await asyncio.to_thread(appmod.limiter.limiter.hit, LIMITE_CHAT, "asgi_chat", cliente, cost=custo)
+
+async def chat(scope, receive, send):
+    start_time = time.time()
+    appmod.recarregador.iniciar()
+    corpo = await ler_corpo(receive)
+    if corpo is None:
+        return
+
+    try:
+        data = json.loads(corpo or b"{}")
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        await enviar_json(send, {"erro": "JSON inválido"}, 400)
+        return
+    if not await dentro_do_limite(scope, appmod.custo_pergunta(data)):
+        metricas.limite_excedido.incrementar()
+        await enviar_json(send, {"erro": "Muitas perguntas em pouco tempo. Tente novamente em instantes."}, 429)
+        return
+
+    pergunta, erro = appmod.validar_pergunta(data)
+    if erro:
+        await enviar_json(send, erro, 400)
+        return
+
+    sessao = appmod.validar_sessao(data)
+    # Sessões no Redis são I/O bloqueante: fora do event loop, como o cache
+    historico = await asyncio.to_thread(appmod.sessoes.historico, sessao)
+    plano = appmod.resolver_pergunta(pergunta, appmod.validar_localizacao(data))
+    if plano["resposta_rapida"]:
+        resposta, tipo_log = plano["resposta_rapida"]
+        appmod.registrar_caminho("rapido")
+        log_interaction(pergunta, resposta, tipo_log, "rapido")
+        await enviar_json(send, {"local_nome": tipo_log, "mapa_link": None, "resposta": resposta, "sessao": sessao})
+        await asyncio.to_thread(descarregar_logs)
+        return
+
+    item_data_json = plano["item_data_json"]
+    local_nome = plano["local_nome"]
+    # Cache no Redis é I/O bloqueante: fora do event loop para não parar os outros streams
+    chave_cache, resposta_pronta = await asyncio.to_thread(appmod.escolher_caminho, plano, historico)
+
+    async def transmitir():
+        cronometro = metricas.Cronometro()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")]
+        })
+        await send({"type": "http.response.body", "body": appmod.cabecalho_stream(plano, sessao).encode("utf-8"), "more_body": True})
+
+        full_response = ""
+        if resposta_pronta is not None:
+            full_response = resposta_pronta
+            await send({"type": "http.response.body", "body": resposta_pronta.encode("utf-8"), "more_body": True})
+        else:
+            stream = coalescedor.transmitir(
+                chave_cache if LLM_COALESCE else None,
+                lambda: conversar_com_chat_async(pergunta, plano["system_prompt"], item_data_json, historico))
+            try:
+                async for chunk in stream:
+                    if not full_response:
+                        chunk = appmod.trocar_por_reserva(plano, chunk, full_response)
+                        cronometro.marcar("primeiro_token" if plano["caminho"] == "llm" else None)
+                    full_response += chunk
+                    await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+            finally:
+                await stream.aclose()
+            if chave_cache and appmod.resposta_cacheavel(plano, full_response):
+                await asyncio.to_thread(appmod.cache_respostas.set, chave_cache, full_response)
+        await send({"type": "http.response.body", "body": b""})
+        # primeiro_token e stream só descrevem a IA; template e cache não entram no histograma
+        cronometro.marcar("stream" if plano["caminho"] == "llm" else None, desde_inicio=True)
+        await asyncio.to_thread(appmod.registrar_turno, sessao, pergunta, full_response)
+
+        log_interaction(pergunta, full_response, local_nome, plano["caminho"])
+        await asyncio.to_thread(descarregar_logs)
+        cronometro.marcar("registrar_log")
+        metricas.observar("total", time.time() - start_time)
+        print(f"\033[92m[Latência] Total: {time.time() - start_time:.2f}s ({plano['caminho']})\033[0m")
+
+    # Se o cliente desconectar, cancela o stream e com ele a conexão com a OpenRouter
+    tarefa = asyncio.ensure_future(transmitir())
+    vigia = asyncio.ensure_future(esperar_desconexao(receive))
+    await asyncio.wait({tarefa, vigia}, return_when=asyncio.FIRST_COMPLETED)
+    if not tarefa.done():
+        tarefa.cancel()
+    vigia.cancel()
+    try:
+        await tarefa
+    except asyncio.CancelledError:
+        pass
+
+async def lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif mensagem["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def asgi_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/chat" and scope["method"] == "POST":
+        await chat(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
@@ -0,0 +1,205 @@
+# Teste de carga do /chat com a OpenRouter simulada (src/stub_llm.py):
+#   python -m benchmarks.bench_carga --modo asgi --concorrencia 50 --requisicoes 500
+#   python -m benchmarks.bench_carga --modo threaded --taxa 20 --duracao 30 --output threaded.json
+#   python -m benchmarks.bench_carga --url http://127.0.0.1:8000 (servidor já no ar)
+# Os modos sobem o app num subprocesso apontando LLM_PROVIDER=local para o stub deste processo.
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(RAIZ)
+
+from src import stub_llm
+from tests.test_cenarios_100 import CENARIOS
+
+PERGUNTAS = [p for p, _ in CENARIOS if p]
+
+COMANDOS = {
+    "threaded": [sys.executable, "-m", "flask", "--app", "app", "run", "--port", "{porta}", "--with-threads"],
+    "gevent": [sys.executable, "-m", "gunicorn", "-k", "gevent", "--worker-connections", "1000", "-b", "127.0.0.1:{porta}", "app:app"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:asgi_app", "--port", "{porta}", "--log-level", "warning"],
+}
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def subir_servidor(modo: str, url_stub: str, atalhos: bool):
+    porta = porta_livre()
+    env = dict(os.environ, LLM_PROVIDER="local", LLM_STUB_URL=url_stub, RATELIMIT_ENABLED="0", LOG_FILE="",
+               KB_RELOAD_INTERVAL="0", SUPABASE_URL="", SUPABASE_KEY="")
+    if not atalhos:
+        # Mede o caminho da IA: sem template, sem cache e sem coalescência
+        env.update(TEMPLATE_MIN_SCORE="0", CACHE_MAX_ITEMS="0", LLM_COALESCE="0")
+    comando = [parte.format(porta=porta) for parte in COMANDOS[modo]]
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.monotonic() + 20
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"Servidor '{modo}' não subiu: {processo.stderr.read().decode(errors='replace')[-500:]}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return processo, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f"Servidor '{modo}' não respondeu em 20s")
+
+async def uma_requisicao(client: httpx.AsyncClient, url: str, pergunta: str) -> dict:
+    inicio = time.perf_counter()
+    medida = {"status": None, "ttfb": None, "ttft": None, "total": None, "erro": None}
+    try:
+        async with client.stream("POST", url + "/chat", json={"pergunta": pergunta}) as response:
+            medida["status"] = response.status_code
+            medida["ttfb"] = time.perf_counter() - inicio
+            streaming = response.headers.get("content-type", "").startswith("text/plain")
+            corpo = b""
+            async for pedaco in response.aiter_raw():
+                corpo += pedaco
+                # No stream a primeira linha é o cabeçalho JSON; o primeiro token vem depois dela
+                if medida["ttft"] is None and (not streaming or corpo.split(b"\n", 1)[1:2] not in ([], [b""])):
+                    medida["ttft"] = time.perf_counter() - inicio
+        medida["total"] = time.perf_counter() - inicio
+        if response.status_code != 200:
+            medida["erro"] = f"http_{response.status_code}"
+        elif b"[Erro" in corpo:
+            medida["erro"] = "erro_ia"
+    except httpx.HTTPError as e:
+        medida["erro"] = type(e).__name__
+        medida["total"] = time.perf_counter() - inicio
+    return medida
+
+async def gerar_carga(url: str, concorrencia: int, taxa: float, requisicoes: int, duracao: float) -> tuple:
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    medidas = []
+    semaforo = asyncio.Semaphore(concorrencia)
+    perguntas = itertools.cycle(PERGUNTAS)
+
+    async with httpx.AsyncClient(limits=limites, timeout=60) as client:
+        async def disparar(pergunta):
+            async with semaforo:
+                medidas.append(await uma_requisicao(client, url, pergunta))
+
+        inicio = time.perf_counter()
+        tarefas = []
+        for i in itertools.count():
+            if (requisicoes and i >= requisicoes) or (duracao and time.perf_counter() - inicio >= duracao):
+                break
+            if taxa:
+                # Malha aberta: chegadas no ritmo pedido, mesmo que o servidor atrase
+                espera = inicio + i / taxa - time.perf_counter()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+            else:
+                await semaforo.acquire()
+                semaforo.release()
+            tarefas.append(asyncio.ensure_future(disparar(next(perguntas))))
+        await asyncio.gather(*tarefas)
+        return medidas, time.perf_counter() - inicio
+
+def percentis_ms(amostras: list) -> dict:
+    if not amostras:
+        return {}
+    ordenadas = sorted(amostras)
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000
+    return {"p50_ms": p(0.50), "p90_ms": p(0.90), "p99_ms": p(0.99), "max_ms": ordenadas[-1] * 1000}
+
+def resumir(medidas: list, duracao: float) -> dict:
+    erros = {}
+    for m in medidas:
+        if m["erro"]:
+            erros[m["erro"]] = erros.get(m["erro"], 0) + 1
+    ok = [m for m in medidas if not m["erro"]]
+    return {
+        "requisicoes": len(medidas),
+        "duracao_s": duracao,
+        "vazao_rps": len(ok) / duracao if duracao else None,
+        "taxa_erro": (len(medidas) - len(ok)) / len(medidas) if medidas else 0.0,
+        "erros": erros,
+        "ttfb": percentis_ms([m["ttfb"] for m in ok if m["ttfb"] is not None]),
+        "ttft": percentis_ms([m["ttft"] for m in ok if m["ttft"] is not None]),
+        "total": percentis_ms([m["total"] for m in ok])
+    }
+
+def imprimir(resultado: dict, base: dict = None):
+    r = resultado["resumo"]
+    print(f"modo {resultado['meta']['modo']}: {r['requisicoes']} requisições em {r['duracao_s']:.1f}s, "
+          f"{r['vazao_rps']:.1f} req/s, erros {r['taxa_erro']:.1%} {r['erros'] or ''}")
+    print(f"{'':8} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for nome in ("ttfb", "ttft", "total"):
+        valores = r[nome]
+        if not valores:
+            continue
+        linha = f"{nome:8} {valores['p50_ms']:10.1f} {valores['p90_ms']:10.1f} {valores['p99_ms']:10.1f} {valores['max_ms']:10.1f}"
+        if base and base["resumo"].get(nome):
+            linha += f"  (p50 {valores['p50_ms'] / base['resumo'][nome]['p50_ms']:.2f}x da base)"
+        print(linha)
+    if base:
+        print(f"vazão: {r['vazao_rps'] / base['resumo']['vazao_rps']:.2f}x da base ({base['meta']['modo']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do /chat com LLM simulado")
+    parser.add_argument("--modo", choices=sorted(COMANDOS), default="asgi", help="como subir o app")
+    parser.add_argument("--url", help="usa um servidor já no ar em vez de subir um (o LLM dele é o que estiver configurado)")
+    parser.add_argument("--concorrencia", type=int, default=20, help="requisições abertas ao mesmo tempo")
+    parser.add_argument("--taxa", type=float, default=0, help="chegadas por segundo (0 = malha fechada pela concorrência)")
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--duracao", type=float, default=0, help="segundos; substitui --requisicoes")
+    parser.add_argument("--primeiro-token", type=float, default=0.3, help="latência do stub até o primeiro token (s)")
+    parser.add_argument("--intervalo", type=float, default=0.02, help="intervalo entre tokens do stub (s)")
+    parser.add_argument("--partes", type=int, default=10, help="chunks por resposta do stub")
+    parser.add_argument("--com-atalhos", action="store_true", help="mantém template, cache e coalescência ligados")
+    parser.add_argument("--output", help="salva o resultado em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior (ex.: outro modo)")
+    args = parser.parse_args()
+
+    stub = processo = None
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            stub = stub_llm.iniciar_em_thread(primeiro_token=args.primeiro_token, intervalo=args.intervalo, partes=args.partes)
+            processo, url = subir_servidor(args.modo, f"http://127.0.0.1:{stub.server_port}/v1/chat/completions", args.com_atalhos)
+        medidas, duracao = asyncio.run(gerar_carga(url, args.concorrencia, args.taxa,
+                                                   0 if args.duracao else args.requisicoes, args.duracao))
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait(10)
+        if stub:
+            stub.shutdown()
+            stub.server_close()
+
+    resultado = {
+        "meta": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "modo": "externo" if args.url else args.modo,
+            **{k: v for k, v in vars(args).items() if k not in ("output", "comparar")}
+        },
+        "resumo": resumir(medidas, duracao)
+    }
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+    imprimir(resultado, base)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Micro-benchmark do normalize_text: python -m benchmarks.bench_normalize
+import argparse
+import os
+import re
+import sys
+import timeit
+import unicodedata
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import load_prompt_data, normalize_text
+
+PROMPT_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'prompt.json')
+
+def normalize_text_original(text: str) -> str:
+    if not text: return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return text.strip()
+
+def corpus() -> list:
+    data = load_prompt_data(PROMPT_FILE)
+    textos = []
+    for categoria, items in data.items():
+        if isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict):
+                    textos.extend(str(v) for v in item.values())
+    return textos
+
+def medir(funcao, textos: list, repeticoes: int) -> float:
+    total = timeit.timeit(lambda: [funcao(t) for t in textos], number=repeticoes)
+    return total / (repeticoes * len(textos)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark do normalize_text")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    repeticoes = parser.parse_args().repeticoes
+
+    textos = corpus()
+    assert [normalize_text.__wrapped__(t) for t in textos] == [normalize_text_original(t) for t in textos]
+
+    original = medir(normalize_text_original, textos, repeticoes)
+    sem_cache = medir(normalize_text.__wrapped__, textos, repeticoes)
+    normalize_text.cache_clear()
+    com_cache = medir(normalize_text, textos, repeticoes)
+
+    print(f"{len(textos)} textos do prompt.json, {repeticoes} repetições")
+    print(f"original          : {original:7.3f} µs/chamada")
+    print(f"tabela (sem LRU)  : {sem_cache:7.3f} µs/chamada ({original / sem_cache:.1f}x)")
+    print(f"tabela + LRU      : {com_cache:7.3f} µs/chamada ({original / com_cache:.1f}x)")
+
+if __name__ == "__main__":
+    main()
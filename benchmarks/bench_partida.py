@@ -0,0 +1,91 @@
+# Partida a frio: tempo de "import app" e da primeira resposta num processo novo, como numa
+# função serverless recém-criada. python -m benchmarks.bench_partida --execucoes 10 --output partida.json
+# Cada execução é um subprocesso; o Supabase aponta para um projeto fictício (o cliente é só criado,
+# nada é enviado) e o Redis só entra com --redis apontando para um servidor de verdade.
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MEDICAO = r"""
+import json, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+with app.app.test_client() as client:
+    resposta = client.post('/chat', json={'pergunta': %r})
+    resposta.get_data()
+fim = time.perf_counter()
+print(json.dumps({"import_s": importado - inicio, "primeira_resposta_s": fim - importado, "total_s": fim - inicio,
+                  "status": resposta.status_code}))
+"""
+
+def medir(execucoes: int, pergunta: str, env_extra: dict) -> dict:
+    amostras = []
+    with tempfile.TemporaryDirectory() as pasta:
+        env = dict(os.environ, LOG_FILE=os.path.join(pasta, "logs.csv"), KB_RELOAD_INTERVAL="0",
+                   SUPABASE_URL="https://exemplo.supabase.co", SUPABASE_KEY="chave-ficticia", REDIS_URL="")
+        env.update(env_extra)
+        for _ in range(execucoes):
+            saida = subprocess.run([sys.executable, "-c", MEDICAO % pergunta], cwd=RAIZ, env=env,
+                                   capture_output=True, text=True, timeout=120)
+            linhas = [l for l in saida.stdout.splitlines() if l.startswith("{")]
+            if saida.returncode or not linhas:
+                raise RuntimeError(f"Execução falhou: {saida.stderr[-500:]}")
+            amostras.append(json.loads(linhas[-1]))
+    resumo = {}
+    for chave in ("import_s", "primeira_resposta_s", "total_s"):
+        valores = sorted(a[chave] for a in amostras)
+        resumo[chave] = {"mediana": statistics.median(valores), "min": valores[0], "max": valores[-1]}
+    resumo["status"] = sorted({a["status"] for a in amostras})
+    return resumo
+
+def main():
+    parser = argparse.ArgumentParser(description="Partida a frio do Guia Digital")
+    parser.add_argument("--execucoes", type=int, default=10)
+    parser.add_argument("--pergunta", default="Onde fica a Josy Boutique?", help="respondida sem IA (template)")
+    parser.add_argument("--redis", default="", help="REDIS_URL de um servidor real, para medir com Redis")
+    parser.add_argument("--output", help="salva os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    cenarios = {
+        "snapshot": {"REDIS_URL": args.redis},
+        "sem_snapshot": {"REDIS_URL": args.redis, "INDEX_SNAPSHOT": ""},
+    }
+    resultados = {
+        "meta": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "execucoes": args.execucoes,
+            "pergunta": args.pergunta,
+            "redis": bool(args.redis)
+        },
+        "cenarios": {nome: medir(args.execucoes, args.pergunta, env) for nome, env in cenarios.items()}
+    }
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+
+    print(f"{'cenário':15} {'import ms':>10} {'1ª resposta ms':>15} {'total ms':>10}")
+    for nome, r in resultados["cenarios"].items():
+        linha = f"{nome:15} {r['import_s']['mediana'] * 1000:10.1f} {r['primeira_resposta_s']['mediana'] * 1000:15.1f} {r['total_s']['mediana'] * 1000:10.1f}"
+        anterior = (base or {}).get("cenarios", {}).get(nome)
+        if anterior:
+            linha += f"  (total {r['total_s']['mediana'] / anterior['total_s']['mediana']:.2f}x da base)"
+        print(linha)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# Benchmark da busca e do roteamento: python -m benchmarks.bench_search --output resultados.json
+# Usa as 100 perguntas de tests/test_cenarios_100.py e corpora sintéticos 10x/100x/1000x.
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault("LOG_FILE", "")
+
+import app as appmod
+from src import search
+from src.constants import CATEGORIAS_ALVO
+from src.geo import IndiceEspacial
+from src.router import rotear
+from src.utils import load_prompt_data, normalize_text
+from tests.test_cenarios_100 import CENARIOS
+
+PERGUNTAS = [p for p, _ in CENARIOS if p]
+PALAVRAS_SINTETICAS = [
+    "santa", "nova", "vila", "sao", "jose", "maria", "rio", "alto", "boa", "vista", "cruz", "bela",
+    "centro", "porto", "campo", "flor", "sol", "mar", "verde", "branco", "pedra", "lagoa", "ponte"
+]
+
+def percentis(amostras: list) -> dict:
+    ordenadas = sorted(amostras)
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1e6
+    total = sum(ordenadas)
+    return {
+        "n": len(ordenadas),
+        "media_us": statistics.mean(ordenadas) * 1e6,
+        "p50_us": p(0.50),
+        "p90_us": p(0.90),
+        "p99_us": p(0.99),
+        "max_us": ordenadas[-1] * 1e6,
+        "ops_por_s": len(ordenadas) / total if total else None
+    }
+
+def cronometrar(funcao, entradas: list, repeticoes: int, antes=None) -> dict:
+    amostras = []
+    for _ in range(repeticoes):
+        for entrada in entradas:
+            if antes:
+                antes()
+            inicio = time.perf_counter()
+            funcao(entrada)
+            amostras.append(time.perf_counter() - inicio)
+    return percentis(amostras)
+
+def corpus_sintetico(data: dict, escala: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    sintetico = copy.deepcopy(data)
+    for categoria in CATEGORIAS_ALVO:
+        originais = data.get(categoria, [])
+        novos = list(copy.deepcopy(originais))
+        for _ in range(escala - 1):
+            for item in originais:
+                clone = {k: v for k, v in item.items() if not k.startswith("_")}
+                campo_nome = "nome" if "nome" in clone else "orgao"
+                sufixo = " ".join(rng.sample(PALAVRAS_SINTETICAS, 2))
+                clone[campo_nome] = f"{clone.get(campo_nome, '')} {sufixo}"
+                if clone.get("localizacao"):
+                    clone["localizacao"] = f"{clone['localizacao']} {rng.choice(PALAVRAS_SINTETICAS)}"
+                novos.append(clone)
+        sintetico[categoria] = novos
+    return sintetico
+
+def medir_chat(repeticoes: int) -> dict:
+    def llm_falso(pergunta, system_prompt, item_data_json=None, historico=None):
+        yield "Resposta simulada "
+        yield "da IA."
+
+    appmod.app.config['TESTING'] = True
+    appmod.limiter.enabled = False
+    try:
+        with patch.object(appmod, "conversar_com_chat", llm_falso), appmod.app.test_client() as client:
+            def postar(pergunta):
+                client.post('/chat', json={'pergunta': pergunta}).get_data()
+            return {
+                "sem_cache": cronometrar(postar, PERGUNTAS, repeticoes, antes=appmod.cache_respostas.clear),
+                "com_cache": cronometrar(postar, PERGUNTAS, repeticoes)
+            }
+    finally:
+        appmod.limiter.enabled = True
+
+def medir_lote(perguntas: list, repeticoes: int) -> dict:
+    # find_items_smart pontua o lote inteiro num cdist; o tempo é dividido por pergunta
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        search.find_items_smart(perguntas)
+        amostras.append((time.perf_counter() - inicio) / len(perguntas))
+    return percentis(amostras)
+
+def medir_geo(pontos: int, repeticoes: int, seed: int = 42) -> dict:
+    # prompt.json não tem coordenadas: pontos sintéticos espalhados ~10 km em volta do centro
+    rng = random.Random(seed)
+    centro = (-2.8389, -44.0622)
+    espacial = IndiceEspacial()
+    for i in range(pontos):
+        espacial.adicionar(centro[0] + rng.uniform(-0.1, 0.1), centro[1] + rng.uniform(-0.1, 0.1),
+                           CATEGORIAS_ALVO[i % len(CATEGORIAS_ALVO)], i, {})
+    consultas = [(centro[0] + rng.uniform(-0.1, 0.1), centro[1] + rng.uniform(-0.1, 0.1)) for _ in range(100)]
+    return cronometrar(lambda c: espacial.proximos(*c, 3), consultas, repeticoes)
+
+def medir_escala(data: dict, escala: int, repeticoes: int) -> dict:
+    sintetico = corpus_sintetico(data, escala)
+    total_itens = sum(len(sintetico.get(c, [])) for c in CATEGORIAS_ALVO)
+    normalize_text.cache_clear()
+    inicio = time.perf_counter()
+    search.build_search_index(sintetico)
+    tempo_build = time.perf_counter() - inicio
+    rotas = {p: rotear(normalize_text(p)) for p in PERGUNTAS}
+    return {
+        "itens": total_itens,
+        "build_search_index_s": tempo_build,
+        "find_item_smart": cronometrar(lambda p: search.find_item_smart(p, rotas[p]), PERGUNTAS, repeticoes),
+        "find_items_smart_por_pergunta": medir_lote(PERGUNTAS, repeticoes)
+    }
+
+def rodar(escalas: list, repeticoes: int) -> dict:
+    data = load_prompt_data(appmod.PROMPT_FILE)
+    textos = [normalize_text(p) for p in PERGUNTAS]
+    indice_original = search.SEARCH_CACHE
+    resultados = {
+        "meta": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "perguntas": len(PERGUNTAS),
+            "repeticoes": repeticoes
+        },
+        "estagios": {
+            "normalize_text_sem_cache": cronometrar(normalize_text.__wrapped__, PERGUNTAS, repeticoes),
+            "normalize_text_com_cache": cronometrar(normalize_text, PERGUNTAS, repeticoes),
+            "rotear": cronometrar(rotear, textos, repeticoes),
+            "find_item_smart": cronometrar(search.find_item_smart, PERGUNTAS, repeticoes),
+            "find_items_smart_por_pergunta": medir_lote(PERGUNTAS, repeticoes),
+            "ranquear": cronometrar(search.ranquear, PERGUNTAS, repeticoes),
+            "geo_proximos_100": medir_geo(100, repeticoes),
+            "geo_proximos_10000": medir_geo(10000, repeticoes),
+            "chat": medir_chat(max(1, repeticoes // 5))
+        },
+        "escalas": {}
+    }
+    try:
+        for escala in escalas:
+            print(f"Escala {escala}x...", file=sys.stderr)
+            resultados["escalas"][f"{escala}x"] = medir_escala(data, escala, max(1, repeticoes // escala) if escala > 1 else repeticoes)
+    finally:
+        search.publicar_indice(indice_original)
+    return resultados
+
+def _linhas(resultados: dict, prefixo: str = ""):
+    for chave, valor in resultados.items():
+        if isinstance(valor, dict) and "p50_us" in valor:
+            yield f"{prefixo}{chave}", valor
+        elif isinstance(valor, dict):
+            yield from _linhas(valor, f"{prefixo}{chave}.")
+
+def imprimir(resultados: dict, base: dict = None):
+    anteriores = dict(_linhas(base)) if base else {}
+    print(f"{'estágio':55} {'p50 µs':>10} {'p90 µs':>10} {'p99 µs':>10} {'ops/s':>10}")
+    for nome, r in _linhas({"estagios": resultados["estagios"], "escalas": resultados["escalas"]}):
+        linha = f"{nome:55} {r['p50_us']:10.1f} {r['p90_us']:10.1f} {r['p99_us']:10.1f} {r['ops_por_s']:10.0f}"
+        if nome in anteriores:
+            linha += f"  (p50 {r['p50_us'] / anteriores[nome]['p50_us']:.2f}x da base)"
+        print(linha)
+    for escala, r in resultados["escalas"].items():
+        print(f"build_search_index {escala:>6} ({r['itens']} itens): {r['build_search_index_s'] * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de busca/roteamento do Guia Digital")
+    parser.add_argument("--escalas", default="1,10,100,1000", help="multiplicadores do prompt.json sintético")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--output", help="salva os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    resultados = rodar([int(e) for e in args.escalas.split(",") if e], args.repeticoes)
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+    imprimir(resultados, base)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
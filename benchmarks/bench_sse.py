@@ -0,0 +1,101 @@
+# Benchmark do parser SSE: python -m benchmarks.bench_sse
+# Compara o laço antigo (iter_lines + decode/replace/json.loads por linha, um yield por token)
+# com o LeitorSSE incremental + Agrupador de src/sse.py.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sse import LeitorSSE, ler_stream
+
+PALAVRAS = ["Axixá", " fica", " no", " Maranhão", ",", " perto", " de", " São", " Luís", ".", " A", " Igreja",
+            " da", " Luz", " é", " de", " 1693", "!", " Juçara", " com", " camarão", "\n"]
+
+def gerar_stream(tokens: int, seed: int = 42) -> bytes:
+    rng = random.Random(seed)
+    linhas = [b": OPENROUTER PROCESSING\n\n"]
+    for i in range(tokens):
+        evento = {
+            "id": "gen-123", "provider": "DeepSeek", "model": "deepseek/deepseek-chat", "object": "chat.completion.chunk",
+            "created": 1700000000, "choices": [{"index": 0, "delta": {"role": "assistant", "content": rng.choice(PALAVRAS)},
+                                                "finish_reason": None, "logprobs": None}]
+        }
+        linhas.append(b"data: " + json.dumps(evento).encode("utf-8") + b"\n\n")
+    linhas.append(b"data: [DONE]\n\n")
+    return b"".join(linhas)
+
+def fatiar(bruto: bytes, tamanho: int) -> list:
+    return [bruto[i:i + tamanho] for i in range(0, len(bruto), tamanho)]
+
+def iter_lines(pedacos):
+    # Mesmo algoritmo do requests.Response.iter_lines (splitlines com sobra entre pedaços)
+    pendente = None
+    for pedaco in pedacos:
+        if pendente is not None:
+            pedaco = pendente + pedaco
+        linhas = pedaco.splitlines()
+        pendente = linhas.pop() if linhas and linhas[-1] and pedaco and linhas[-1][-1] == pedaco[-1] else None
+        yield from linhas
+    if pendente is not None:
+        yield pendente
+
+def extrair_conteudo_antigo(line) -> str:
+    if not line:
+        return ""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    decoded_line = line.replace('data: ', '').strip()
+    if decoded_line and decoded_line != '[DONE]':
+        try:
+            json_line = json.loads(decoded_line)
+            return json_line["choices"][0].get("delta", {}).get("content", "") or ""
+        except json.JSONDecodeError:
+            return ""
+    return ""
+
+def antigo(pedacos) -> list:
+    return [c for c in (extrair_conteudo_antigo(l) for l in iter_lines(pedacos)) if c]
+
+def so_parser(pedacos) -> list:
+    leitor = LeitorSSE()
+    saida = []
+    for pedaco in pedacos:
+        saida.extend(leitor.alimentar(pedaco))
+    return saida + leitor.finalizar()
+
+def com_agrupador(pedacos) -> list:
+    return list(ler_stream(pedacos, 48, 0.05))
+
+def medir(funcao, pedacos, repeticoes: int):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = funcao(pedacos)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, saida
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do parser SSE")
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    bruto = gerar_stream(args.tokens)
+    print(f"{args.tokens} tokens, {len(bruto) / 1024:.0f} KiB de SSE")
+    print(f"{'leitura do socket':22} {'implementação':16} {'µs/token':>10} {'writes':>8} {'vs antigo':>10}")
+    for nome, tamanho in (("1 evento por pedaço", None), ("pedaços de 1 KiB", 1024), ("pedaços de 16 KiB", 16384)):
+        pedacos = bruto.split(b"\n\n") if tamanho is None else fatiar(bruto, tamanho)
+        if tamanho is None:
+            pedacos = [p + b"\n\n" for p in pedacos if p]
+        base, saida_base = medir(antigo, pedacos, args.repeticoes)
+        for rotulo, funcao in (("antigo", antigo), ("LeitorSSE", so_parser), ("LeitorSSE+agrup.", com_agrupador)):
+            tempo, saida = medir(funcao, pedacos, args.repeticoes)
+            assert "".join(saida) == "".join(saida_base)
+            print(f"{nome:22} {rotulo:16} {tempo / args.tokens * 1e6:10.2f} {len(saida):8} {base / tempo:9.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from src.conexao_redis import obter_redis
+
+def termo_canonico(termo: str) -> str:
+    # Plural simples: "escolas" e "escola" caem na mesma chave
+    return termo[:-1] if len(termo) > 3 and termo.endswith("s") else termo
+
+def consulta_canonica(termos: list, texto_input: str) -> str:
+    # "onde fica a prefeitura", "prefeitura onde é" e "endereço da prefeitura" viram "prefeitura"
+    canonicos = sorted({termo_canonico(t) for t in termos})
+    return " ".join(canonicos) if canonicos else " ".join(texto_input.split())
+
+def chave_canonica(termos: list, texto_input: str, item_id, item_data_json) -> str:
+    hash_dados = hashlib.sha1((item_data_json or "").encode("utf-8")).hexdigest()
+    chave = f"{consulta_canonica(termos, texto_input)}|{item_id}|{hash_dados}"
+    return "resposta:" + hashlib.sha1(chave.encode("utf-8")).hexdigest()
+
+class CacheLRU:
+    # get/set/clear como o CacheRedis, para o caso sem Redis
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.itens = OrderedDict()
+        self.expulsos = 0
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self.itens.get(chave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if self.ttl and expira < time.monotonic():
+                del self.itens[chave]
+                return None
+            self.itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self.itens[chave] = (valor, time.monotonic() + self.ttl)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+                self.expulsos += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self.itens.clear()
+        return True
+
+    def __len__(self):
+        return len(self.itens)
+
+class CacheRedis:
+    # Mesma interface, compartilhada entre instâncias; o pacote redis só é importado na primeira consulta
+    def __init__(self, url: str, ttl: float, prefixo: str = "guia:"):
+        self.url = url
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self._cliente = None
+
+    def _redis(self):
+        # Cliente compartilhado de src/conexao_redis.py; os testes injetam um falso em _cliente
+        return self._cliente if self._cliente is not None else obter_redis(self.url)
+
+    def get(self, chave):
+        try:
+            valor = self._redis().get(self.prefixo + chave)
+            return valor.decode("utf-8") if valor is not None else None
+        except UnicodeDecodeError:
+            # Entrada em outro formato (ex.: pickle do Flask-Caching): trata como miss e sobrescreve depois
+            return None
+        except Exception as e:
+            # Redis fora do ar vira cache miss: a resposta ainda sai pela IA
+            print(f"Aviso (cache Redis indisponível): {e}")
+            return None
+
+    def set(self, chave, valor):
+        try:
+            return bool(self._redis().set(self.prefixo + chave, valor.encode("utf-8"), ex=int(self.ttl) or None))
+        except Exception as e:
+            print(f"Aviso (cache Redis indisponível): {e}")
+            return False
+
+    def clear(self):
+        cliente = self._redis()
+        chaves = list(cliente.scan_iter(match=self.prefixo + "resposta:*"))
+        if chaves:
+            cliente.delete(*chaves)
+        return True
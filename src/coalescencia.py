@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from src import metricas
+
+# Single-flight: perguntas idênticas ao mesmo tempo (mesma chave canônica, sem histórico)
+# compartilham um único stream da OpenRouter. Quem chega depois recebe o que já veio e segue junto.
+
+class Voo:
+    def __init__(self, condicao):
+        self.partes = []
+        self.fim = False
+        self.assinantes = 0
+        self.cond = condicao
+        self.tarefa = None
+
+class CoalescedorStreams:
+    def __init__(self):
+        self.voos = {}
+        self._lock = threading.Lock()
+
+    def transmitir(self, chave, abrir):
+        if chave is None:
+            return abrir()
+        with self._lock:
+            voo = self.voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self.voos[chave] = Voo(threading.Condition())
+            voo.assinantes += 1
+        if lider:
+            # O upstream é lido numa thread própria: se o primeiro cliente sair, os outros continuam
+            threading.Thread(target=self._produzir, args=(chave, voo, abrir()), name="voo-llm", daemon=True).start()
+        else:
+            metricas.streams_coalescidos.incrementar()
+        return self._ler(voo)
+
+    def _produzir(self, chave, voo, stream):
+        try:
+            for parte in stream:
+                with voo.cond:
+                    voo.partes.append(parte)
+                    voo.cond.notify_all()
+                with self._lock:
+                    if voo.assinantes == 0:
+                        break
+        except Exception as e:
+            with voo.cond:
+                voo.partes.append(f"[Erro IA: {str(e)}]")
+        finally:
+            stream.close()
+            with self._lock:
+                if self.voos.get(chave) is voo:
+                    del self.voos[chave]
+            with voo.cond:
+                voo.fim = True
+                voo.cond.notify_all()
+
+    def _ler(self, voo):
+        lidas = 0
+        try:
+            while True:
+                with voo.cond:
+                    while lidas >= len(voo.partes) and not voo.fim:
+                        voo.cond.wait()
+                    novas = voo.partes[lidas:]
+                    fim = voo.fim
+                lidas += len(novas)
+                yield from novas
+                if fim:
+                    return
+        finally:
+            with self._lock:
+                voo.assinantes -= 1
+
+class CoalescedorStreamsAsync:
+    def __init__(self):
+        self.voos = {}
+
+    def transmitir(self, chave, abrir):
+        if chave is None:
+            return abrir()
+        voo = self.voos.get(chave)
+        if voo is None:
+            voo = self.voos[chave] = Voo(asyncio.Condition())
+            voo.tarefa = asyncio.ensure_future(self._produzir(chave, voo, abrir()))
+        else:
+            metricas.streams_coalescidos.incrementar()
+        voo.assinantes += 1
+        return self._ler(chave, voo)
+
+    async def _produzir(self, chave, voo, stream):
+        try:
+            async for parte in stream:
+                async with voo.cond:
+                    voo.partes.append(parte)
+                    voo.cond.notify_all()
+        except Exception as e:
+            voo.partes.append(f"[Erro IA: {str(e)}]")
+        finally:
+            await stream.aclose()
+            if self.voos.get(chave) is voo:
+                del self.voos[chave]
+            voo.fim = True
+            async with voo.cond:
+                voo.cond.notify_all()
+
+    async def _ler(self, chave, voo):
+        lidas = 0
+        try:
+            while True:
+                async with voo.cond:
+                    await voo.cond.wait_for(lambda: lidas < len(voo.partes) or voo.fim)
+                    novas = voo.partes[lidas:]
+                    fim = voo.fim
+                lidas += len(novas)
+                for parte in novas:
+                    yield parte
+                if fim:
+                    return
+        finally:
+            voo.assinantes -= 1
+            # Todos saíram: cancela o upstream em vez de esperar o próximo chunk
+            if voo.assinantes == 0 and not voo.fim:
+                if self.voos.get(chave) is voo:
+                    del self.voos[chave]
+                voo.tarefa.cancel()
@@ -0,0 +1,19 @@
+import threading
+from src.config import REDIS_TIMEOUT
+
+# Um cliente (e um pool de conexões) por URL, compartilhado entre cache de respostas, sessões e limites.
+# O pacote redis (~0,2s de import) só carrega no primeiro uso, não na partida a frio.
+_clientes = {}
+_lock = threading.Lock()
+
+def obter_redis(url: str):
+    cliente = _clientes.get(url)
+    if cliente is None:
+        with _lock:
+            cliente = _clientes.get(url)
+            if cliente is None:
+                import redis
+                # Timeouts curtos: Redis lento ou fora do ar vira miss em vez de travar o /chat
+                cliente = _clientes[url] = redis.Redis.from_url(
+                    url, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT)
+    return cliente
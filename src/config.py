@@ -10,4 +10,88 @@ MODEL_NAME = "deepseek/deepseek-chat"
 
 # Configurações de Banco de Dados
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
\ No newline at end of file
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Configurações de conexão com a OpenRouter
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "10"))
+LLM_CONNECT_RETRIES = int(os.getenv("LLM_CONNECT_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.3"))
+
+# Configurações do registro de interações (lotes em segundo plano)
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "usage_logs.csv"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "20"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "1000"))
+# Serverless (Vercel congela a função entre requisições e não roda o atexit): grava ao fim de cada resposta
+LOG_SYNC = os.getenv("LOG_SYNC", "1" if os.getenv("VERCEL") else "0") == "1"
+
+# Recarga do data/prompt.json sem reiniciar (segundos entre verificações; 0 desliga)
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "5"))
+# Snapshot do índice gerado no build (python -m src.snapshot), lido na partida no lugar de reconstruir; vazio desliga
+INDEX_SNAPSHOT = os.getenv("INDEX_SNAPSHOT", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "indice.snapshot"))
+
+# Respostas prontas (sem IA) para buscas diretas com score alto (0 desliga)
+TEMPLATE_MIN_SCORE = float(os.getenv("TEMPLATE_MIN_SCORE", "115"))
+
+# Métricas por etapa no /metrics (formato Prometheus; "0" desliga)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False", "")
+
+# Orçamento do prompt enviado à OpenRouter (tokens estimados localmente; 0 desliga o limite total)
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "1200"))
+HISTORY_MSG_MAX_TOKENS = int(os.getenv("HISTORY_MSG_MAX_TOKENS", "200"))
+
+# Sessões de conversa no servidor: o cliente manda só a pergunta e o id opaco da sessão.
+# Guarda as últimas N mensagens (o que o prompt usa) e expira após SESSION_TTL segundos sem uso
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "4"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+# Sessões guardadas em memória quando não há Redis (LRU)
+SESSION_MAX = int(os.getenv("SESSION_MAX", "2000"))
+
+# /search: ranking sem IA, com limite próprio (maior que o do /chat), página máxima e score mínimo
+SEARCH_RATE_LIMIT = os.getenv("SEARCH_RATE_LIMIT", "60 per minute")
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "60"))
+
+# Perguntas idênticas simultâneas compartilham um único stream da OpenRouter ("0" desliga)
+LLM_COALESCE = os.getenv("LLM_COALESCE", "1") != "0"
+
+# Provedores de LLM: "openrouter" ou "local" (servidor stub de src/stub_llm.py, para testes de carga)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openrouter")
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8099/v1/chat/completions")
+# Modelo reserva na OpenRouter quando o principal falha ou o disjuntor está aberto (vazio desliga)
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+# Disjuntor por provedor: abre após N falhas seguidas e tenta de novo depois da espera (segundos)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# Prazo total do stream: encerra com aviso antes do maxDuration (15s) da Vercel matar a função
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "12"))
+
+# Agrupa os deltas do stream antes de enviar ao cliente: envia ao juntar N caracteres,
+# ao fechar uma frase ou após o intervalo (segundos). LLM_FLUSH_CHARS=0 envia cada token.
+LLM_FLUSH_CHARS = int(os.getenv("LLM_FLUSH_CHARS", "48"))
+LLM_FLUSH_INTERVAL = float(os.getenv("LLM_FLUSH_INTERVAL", "0.05"))
+
+# Perguntas "perto de mim" com localização do cliente: quantos lugares vão no payload
+# e a distância máxima em km (0 sem limite)
+GEO_VIZINHOS = int(os.getenv("GEO_VIZINHOS", "3"))
+GEO_RAIO_KM = float(os.getenv("GEO_RAIO_KM", "15"))
+
+# Cache das respostas da IA e dos rankings do /search: validade (segundos) e itens no LRU local
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", "500"))
+
+# Timeout (segundos) de conexão e de cada comando no Redis (cache, sessões e limites)
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+
+# Limite de requisições com REDIS_URL: contagem local sincronizada com o Redis em lote a cada
+# LIMITER_SYNC_INTERVAL segundos (0 consulta o Redis a cada requisição). Uma chave sincroniza na
+# hora ao juntar LIMITER_MAX_PENDING acertos: cada instância passa do limite em no máximo N - 1 por janela
+LIMITER_SYNC_INTERVAL = float(os.getenv("LIMITER_SYNC_INTERVAL", "1"))
+LIMITER_MAX_PENDING = int(os.getenv("LIMITER_MAX_PENDING", "3"))
+# Custos no limite do /chat, que vale 10 perguntas normais por minuto (10 * LIMITE_CUSTO_NORMAL).
+# A saudação e os créditos (respondidos sem IA) custam LIMITE_CUSTO_RAPIDO; 0 isenta. Com NORMAL=2 e
+# RAPIDO=1, por exemplo, uma saudação gasta meia pergunta
+LIMITE_CUSTO_NORMAL = int(os.getenv("LIMITE_CUSTO_NORMAL", "1"))
+LIMITE_CUSTO_RAPIDO = int(os.getenv("LIMITE_CUSTO_RAPIDO", "1"))
@@ -16,6 +16,18 @@ CATEGORY_KEYWORDS_MAP = {
     "comidas_tipicas": ["comida", "tipica", "prato", "fome", "comer", "restaurante", "gastronomia", "culinaria", "almoco", "jantar", "peixe", "jucara"]
 }
 
+GENERIC_TRIGGERS = {
+    "escolas": ["escola", "escolas", "colegio", "colegios", "estudar"],
+    "lojas": ["loja", "lojas", "comercio", "compras"],
+    "igrejas": ["igreja", "igrejas"],
+    "pontos_turisticos": ["turismo", "passear", "pontos turisticos", "praia", "praias"],
+    "predios_municipais": ["orgaos", "predios", "reparticoes"],
+    "campos_esportivos": ["esportes", "campos", "ginasio"],
+    "cemiterios": ["cemiterio", "cemiterios"],
+    "pousadas_dormitorios": ["dormir", "pousada", "pousadas"],
+    "comidas_tipicas": ["comida", "comer"]
+}
+
 STOP_WORDS = {
     'a', 'o', 'e', 'ou', 'de', 'do', 'da', 'dos', 'das', 'em', 'no', 'na', 
     'nos', 'nas', 'por', 'para', 'com', 'sem', 'sob', 'sobre', 'as', 'os',
@@ -28,10 +40,22 @@ STOP_WORDS = {
     'ver', 'comprar', 'vende'
 }
 
+RESPOSTA_SAUDACAO = "Olá! Sou o Guia Digital de Axixá. Posso ajudar com escolas, lojas, turismo e história da cidade."
+RESPOSTA_CREDITOS = "Desenvolvido por: Guilherme Moreira, José Ribamar, Marina de Jesus e Rikelmy Rabelo."
+
 SAUDACOES_WORDS = {"ola", "oi", "opa", "salve", "eai"}
 SAUDACOES_PHRASES = ["bom dia", "boa tarde", "boa noite", "tudo bem", "tude bem", "como vai"]
 
+HISTORY_KEYWORDS = ["historia"]
+# Com a localização do cliente, estas perguntas são respondidas pelo índice espacial
+PERTO_KEYWORDS = ["perto de mim", "perto daqui", "aqui perto", "proximo de mim", "proxima de mim", "mais proximo", "mais proxima"]
+# A lista de comidas típicas só é enviada quando todas estas palavras aparecem
+FOOD_LIST_KEYWORDS = ["comida", "quais"]
+
 IDENTITY_KEYWORDS = [
     "quem fez", "quem criou", "quem desenvolveu", "criador", "desenvolvedor", 
     "quem e voce", "quem saoz", "sobre o projeto", "quem sou eu"
-]
\ No newline at end of file
+]
+INSTRUCAO_DADOS = "INSTRUÇÃO: Responda naturalmente usando *apenas* estes DADOS FACTUAIS: "
+
+AVISO_PRAZO = "\n\n_(Resposta interrompida por tempo. Pergunte de novo se precisar do restante.)_"
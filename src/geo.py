@@ -0,0 +1,127 @@
+import heapq
+import math
+from typing import NamedTuple
+
+RAIO_TERRA_KM = 6371.0088
+# Células de 0,01° (~1,1 km): Axixá inteira cabe em poucas dezenas delas
+TAMANHO_CELULA = 0.01
+KM_POR_GRAU = math.pi * RAIO_TERRA_KM / 180
+ANEIS_MAXIMOS = 40
+
+class Proximo(NamedTuple):
+    distancia_km: float
+    categoria: str
+    posicao: int
+    item: dict
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi = fi2 - fi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def coordenada_valida(lat, lon) -> bool:
+    return (isinstance(lat, (int, float)) and isinstance(lon, (int, float))
+            and not isinstance(lat, bool) and not isinstance(lon, bool)
+            and math.isfinite(lat) and math.isfinite(lon)
+            and -90 <= lat <= 90 and -180 <= lon <= 180)
+
+def coordenadas_do_item(item: dict):
+    # Campos opcionais no prompt.json: "lat"/"lon" ou "latitude"/"longitude"
+    lat = item.get("lat", item.get("latitude"))
+    lon = item.get("lon", item.get("longitude"))
+    if isinstance(lat, str) or isinstance(lon, str):
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return None
+    return (float(lat), float(lon)) if coordenada_valida(lat, lon) else None
+
+def _celula(lat: float, lon: float) -> tuple:
+    return math.floor(lat / TAMANHO_CELULA), math.floor(lon / TAMANHO_CELULA)
+
+class IndiceEspacial:
+    # Grade uniforme: a busca abre anéis de células em volta do ponto até que
+    # nenhuma célula ainda não visitada possa ter algo mais perto que o k-ésimo
+    __slots__ = ("_celulas", "_pontos", "_limites")
+
+    def __init__(self):
+        self._celulas = {}
+        self._pontos = 0
+        self._limites = None
+
+    def adicionar(self, lat: float, lon: float, categoria: str, posicao: int, item: dict):
+        self._celulas.setdefault(_celula(lat, lon), []).append((lat, lon, categoria, posicao, item))
+        self._pontos += 1
+        linha, coluna = _celula(lat, lon)
+        if self._limites is None:
+            self._limites = [linha, linha, coluna, coluna]
+        else:
+            self._limites = [min(self._limites[0], linha), max(self._limites[1], linha),
+                             min(self._limites[2], coluna), max(self._limites[3], coluna)]
+
+    def __len__(self):
+        return self._pontos
+
+    def _anel(self, linha: int, coluna: int, r: int):
+        if r == 0:
+            yield linha, coluna
+            return
+        for dc in range(-r, r + 1):
+            yield linha - r, coluna + dc
+            yield linha + r, coluna + dc
+        for dl in range(-r + 1, r):
+            yield linha + dl, coluna - r
+            yield linha + dl, coluna + r
+
+    def _anel_maximo(self, linha: int, coluna: int) -> int:
+        lmin, lmax, cmin, cmax = self._limites
+        return max(abs(linha - lmin), abs(linha - lmax), abs(coluna - cmin), abs(coluna - cmax))
+
+    def proximos(self, lat: float, lon: float, k: int = 3, categorias=None, raio_km: float = None) -> list:
+        if not self._pontos or k <= 0:
+            return []
+        melhores = []
+
+        def avaliar(pontos):
+            for plat, plon, categoria, posicao, item in pontos:
+                if categorias and categoria not in categorias:
+                    continue
+                distancia = haversine_km(lat, lon, plat, plon)
+                if raio_km is not None and distancia > raio_km:
+                    continue
+                entrada = (-distancia, categoria, posicao, item)
+                if len(melhores) < k:
+                    heapq.heappush(melhores, entrada)
+                elif distancia < -melhores[0][0]:
+                    heapq.heapreplace(melhores, entrada)
+
+        linha, coluna = _celula(lat, lon)
+        anel_maximo = self._anel_maximo(linha, coluna)
+        if anel_maximo > ANEIS_MAXIMOS:
+            # Ponto longe da cidade: percorrer anéis vazios custa mais que olhar tudo
+            for pontos in self._celulas.values():
+                avaliar(pontos)
+        else:
+            for r in range(anel_maximo + 1):
+                # Cota inferior para o anel r: (r - 1) células na direção mais estreita,
+                # a longitude, que encolhe com cos(lat) na latitude mais alta que o anel alcança
+                cosseno = math.cos(math.radians(min(abs(lat) + (r + 1) * TAMANHO_CELULA, 90)))
+                minimo_anel = 0.99 * max(r - 1, 0) * TAMANHO_CELULA * KM_POR_GRAU * cosseno
+                if raio_km is not None and minimo_anel > raio_km:
+                    break
+                if len(melhores) == k and minimo_anel > -melhores[0][0]:
+                    break
+                for celula in self._anel(linha, coluna, r):
+                    avaliar(self._celulas.get(celula, ()))
+        return [Proximo(-d, categoria, posicao, item) for d, categoria, posicao, item in sorted(melhores, reverse=True)]
+
+def construir_indice_espacial(indice: dict) -> IndiceEspacial:
+    espacial = IndiceEspacial()
+    for categoria, cache_data in indice.items():
+        for posicao, item in enumerate(cache_data["objects"]):
+            coordenadas = coordenadas_do_item(item)
+            if coordenadas:
+                espacial.adicionar(*coordenadas, categoria, posicao, item)
+    return espacial
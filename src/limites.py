@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+from limits.storage import Storage
+from src.config import LIMITER_SYNC_INTERVAL, LIMITER_MAX_PENDING, REDIS_TIMEOUT
+from src.conexao_redis import obter_redis
+
+class ArmazenamentoRedisPreguicoso(Storage):
+    # "guia+redis://..." no storage_uri do Limiter: o RedisStorage do limits (e o import do
+    # pacote redis, ~0,2s) só é criado na primeira requisição limitada, não na partida
+    STORAGE_SCHEME = ["guia+redis", "guia+rediss"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.uri = uri.removeprefix("guia+")
+        # Sem timeout o redis-py espera o socket para sempre se o Redis não responder
+        self.options = dict({"socket_connect_timeout": REDIS_TIMEOUT, "socket_timeout": REDIS_TIMEOUT}, **options,
+                            wrap_exceptions=wrap_exceptions)
+        self._real = None
+        self._lock = threading.Lock()
+
+    @property
+    def real(self):
+        if self._real is None:
+            with self._lock:
+                if self._real is None:
+                    from limits.storage import RedisStorage
+                    self._real = RedisStorage(self.uri, **self.options)
+        return self._real
+
+    @property
+    def base_exceptions(self):
+        return self.real.base_exceptions
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        return self.real.incr(key, expiry, amount)
+
+    def get(self, key: str) -> int:
+        return self.real.get(key)
+
+    def get_expiry(self, key: str) -> float:
+        return self.real.get_expiry(key)
+
+    def check(self) -> bool:
+        return self.real.check()
+
+    def reset(self):
+        return self.real.reset()
+
+    def clear(self, key: str) -> None:
+        return self.real.clear(key)
+
+class Janela:
+    # Contagem local de uma chave: o que o Redis tinha na última sincronização,
+    # o que está sendo enviado agora, o que ainda não foi enviado e o que não chegou por falha no Redis
+    __slots__ = ("global_visto", "em_voo", "pendente", "atrasado", "expira", "tocada")
+
+    def __init__(self, expira: float):
+        self.global_visto = 0
+        self.em_voo = 0
+        self.pendente = 0
+        self.atrasado = 0
+        self.expira = expira
+        self.tocada = False
+
+    @property
+    def total(self) -> int:
+        return self.global_visto + self.em_voo + self.pendente + self.atrasado
+
+class ArmazenamentoHibrido(Storage):
+    # "guia+hibrido+redis://...": permite ou nega localmente e manda as contagens ao Redis
+    # em lote a cada `intervalo`. Uma chave força a sincronização na hora ao acumular
+    # `max_pendente` acertos não enviados, então cada instância admite no máximo
+    # max_pendente - 1 acertos por janela com a visão atrasada das outras.
+    STORAGE_SCHEME = ["guia+hibrido+redis", "guia+hibrido+rediss"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, intervalo: float = LIMITER_SYNC_INTERVAL,
+                 max_pendente: int = LIMITER_MAX_PENDING, prefixo: str = "guia:limite:", **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.uri = uri.removeprefix("guia+hibrido+")
+        self.intervalo = intervalo
+        self.max_pendente = max(1, int(max_pendente))
+        self.prefixo = prefixo
+        self.janelas = {}
+        self.sincronizacoes = 0
+        self.falhas = 0
+        self._retomar = 0.0
+        self._cliente = None
+        self._lock = threading.Lock()
+        self._lock_envio = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _redis(self):
+        # Está no caminho da requisição (chave nova): o cliente compartilhado falha rápido e a contagem segue local
+        return self._cliente if self._cliente is not None else obter_redis(self.uri)
+
+    @property
+    def base_exceptions(self):
+        import redis
+        return redis.RedisError
+
+    def _garantir_thread(self):
+        # Mesmo cuidado do gravador de logs: após um fork a thread do pai não existe no filho
+        if self.intervalo <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="limites-redis", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            self.sincronizar()
+
+    def sincronizar(self, chaves=None, expiry: int = None):
+        # Um lote por vez: INCRBY do que ficou pendente e PTTL para alinhar o fim da janela
+        with self._lock_envio:
+            agora = time.time()
+            envio = []
+            with self._lock:
+                for chave in list(chaves or self.janelas):
+                    janela = self.janelas.get(chave)
+                    if janela is None:
+                        continue
+                    if janela.expira <= agora:
+                        del self.janelas[chave]
+                        continue
+                    if chaves is None and not janela.pendente and not janela.atrasado and not janela.tocada:
+                        continue
+                    quantidade = janela.pendente + janela.atrasado
+                    janela.pendente, janela.atrasado, janela.tocada = 0, 0, False
+                    janela.em_voo += quantidade
+                    envio.append((chave, janela, quantidade, expiry or max(1, round(janela.expira - agora))))
+            if not envio:
+                return
+            try:
+                pipe = self._redis().pipeline(transaction=False)
+                for chave, _, quantidade, ttl in envio:
+                    pipe.set(self.prefixo + chave, 0, ex=ttl, nx=True)
+                    pipe.incrby(self.prefixo + chave, quantidade)
+                    pipe.pttl(self.prefixo + chave)
+                respostas = pipe.execute()
+            except Exception as e:
+                # Sem Redis, cada instância segue contando sozinha e reenvia no próximo lote;
+                # até lá as requisições não esperam pelo timeout de novo
+                print(f"Aviso (limites: Redis indisponível): {e}")
+                with self._lock:
+                    self.falhas += 1
+                    self._retomar = time.time() + max(self.intervalo, 1)
+                    for _, janela, quantidade, _ in envio:
+                        janela.em_voo -= quantidade
+                        janela.atrasado += quantidade
+                return
+            agora = time.time()
+            with self._lock:
+                self.sincronizacoes += 1
+                self._retomar = 0.0
+                for i, (_, janela, quantidade, _) in enumerate(envio):
+                    valor, pttl = respostas[3 * i + 1], respostas[3 * i + 2]
+                    janela.em_voo -= quantidade
+                    janela.global_visto = int(valor)
+                    if pttl and pttl > 0:
+                        janela.expira = agora + pttl / 1000
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        self._garantir_thread()
+        with self._lock:
+            janela = self.janelas.get(key)
+            nova = janela is None or janela.expira <= time.time()
+            if nova:
+                janela = self.janelas[key] = Janela(time.time() + expiry)
+            janela.pendente += amount
+            janela.tocada = True
+            if (not nova and janela.pendente < self.max_pendente) or time.time() < self._retomar:
+                return janela.total
+        # Chave nova na janela ou erro no limite: busca a contagem global agora
+        self.sincronizar([key], expiry if nova else None)
+        with self._lock:
+            return janela.total
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            janela = self.janelas.get(key)
+            return janela.total if janela and janela.expira > time.time() else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            janela = self.janelas.get(key)
+            return janela.expira if janela else time.time()
+
+    def check(self) -> bool:
+        try:
+            return bool(self._redis().ping())
+        except Exception:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self.janelas.clear()
+        cliente = self._redis()
+        chaves = list(cliente.scan_iter(match=self.prefixo + "*"))
+        if chaves:
+            cliente.delete(*chaves)
+        return len(chaves)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self.janelas.pop(key, None)
+        self._redis().delete(self.prefixo + key)
@@ -1,19 +1,42 @@
+import asyncio
+import queue
+import threading
 import requests
+import httpx
 import json
-from src.config import OPENROUTER_API_KEY, OPENROUTER_API_URL, MODEL_NAME
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src import metricas
+from src.constants import INSTRUCAO_DADOS, AVISO_PRAZO
+from src.orcamento import ajustar_prompt
+from src.sse import ler_stream, ler_stream_async
+from src.config import (
+    OPENROUTER_API_KEY, OPENROUTER_API_URL, MODEL_NAME,
+    LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_CONNECT_RETRIES, LLM_RETRY_BACKOFF,
+    LLM_PROVIDER, LLM_STUB_URL, LLM_FALLBACK_MODEL, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN, LLM_DEADLINE,
+    LLM_FLUSH_CHARS, LLM_FLUSH_INTERVAL
+)
 
-def conversar_com_chat(pergunta: str, system_prompt: str, item_data_json: str = None, historico: list = None):
-    if not system_prompt:
-        yield "[Erro crítico: Prompt não carregado.]"
-        return
-
-    headers = {
+def criar_sessao_http(pool_size: int = LLM_POOL_SIZE, retries: int = LLM_CONNECT_RETRIES, backoff: float = LLM_RETRY_BACKOFF) -> requests.Session:
+    # Só repete falhas de conexão: depois que o POST saiu não dá para reenviar sem duplicar a geração
+    retry = Retry(total=retries, connect=retries, read=0, status=0, other=0, redirect=0, backoff_factor=backoff)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
         "HTTP-Referer": "https://guialocalizaxixa.com",
         "X-Title": "Guia Digital - LocalizAxixá",
-    }
-    
+    })
+    return session
+
+# Sessão compartilhada entre as threads: mantém as conexões TLS abertas (keep-alive)
+http_session = criar_sessao_http()
+
+def montar_mensagens(pergunta: str, system_prompt: str, item_data_json: str = None, historico: list = None) -> list:
     messages = [{"role": "system", "content": system_prompt}]
     
     if historico:
@@ -22,32 +45,323 @@ def conversar_com_chat(pergunta: str, system_prompt: str, item_data_json: str =
     if item_data_json:
         messages.append({
             "role": "system", 
-            "content": f"INSTRUÇÃO: Responda naturalmente usando *apenas* estes DADOS FACTUAIS: {item_data_json}"
+            "content": f"{INSTRUCAO_DADOS}{item_data_json}"
         })
     
     messages.append({"role": "user", "content": pergunta})
+    return messages
+
+def montar_corpo(messages: list, modelo: str = MODEL_NAME) -> dict:
+    return {
+        "model": modelo,
+        "messages": messages,
+        "temperature": 0.3,
+        "max_tokens": 1024,
+        "stream": True
+    }
+
+def preparar_mensagens(pergunta: str, system_prompt: str, item_data_json: str = None, historico: list = None) -> list:
+    ajuste = ajustar_prompt(pergunta, system_prompt, item_data_json, historico)
+    if ajuste.economizados:
+        metricas.tokens_economizados.incrementar(quantidade=ajuste.economizados)
+        print(f"[Orçamento] Prompt ~{ajuste.tokens} tokens ({ajuste.economizados} economizados)")
+    return montar_mensagens(pergunta, system_prompt, ajuste.item_data_json, ajuste.historico)
+
+def serializar_corpo(messages: list, modelo: str = MODEL_NAME) -> bytes:
+    inicio = time.perf_counter()
+    corpo = json.dumps(montar_corpo(messages, modelo), ensure_ascii=False).encode("utf-8")
+    metricas.observar("serializar", time.perf_counter() - inicio)
+    return corpo
+
+def criar_cliente_async(pool_size: int = LLM_POOL_SIZE, retries: int = LLM_CONNECT_RETRIES) -> httpx.AsyncClient:
+    # O transporte do httpx só repete falhas de conexão, igual à sessão síncrona
+    transport = httpx.AsyncHTTPTransport(retries=retries, limits=httpx.Limits(
+        max_connections=None, max_keepalive_connections=pool_size))
+    return httpx.AsyncClient(
+        transport=transport,
+        # requests envia os cabeçalhos em latin-1 ("LocalizAxixá"); o httpx só aceita ASCII em str
+        headers={k: v.encode("latin-1") for k, v in http_session.headers.items()},
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    )
+
+# Um cliente por event loop: o AsyncClient não pode ser compartilhado entre loops
+_clientes_async = {}
+
+def obter_cliente_async() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None or cliente.is_closed:
+        for antigo in [l for l in _clientes_async if l.is_closed()]:
+            del _clientes_async[antigo]
+        cliente = _clientes_async[loop] = criar_cliente_async()
+    return cliente
+
+class Disjuntor:
+    # Fechado: passa tudo. Aberto: recusa até a espera acabar. Depois disso deixa passar
+    # uma tentativa por vez (meio-aberto); sucesso fecha, falha abre de novo.
+    def __init__(self, falhas_max: int = LLM_BREAKER_FAILURES, espera: float = LLM_BREAKER_COOLDOWN):
+        self.falhas_max = falhas_max
+        self.espera = espera
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    def permite(self) -> bool:
+        if self.falhas < self.falhas_max:
+            return True
+        with self._lock:
+            agora = time.monotonic()
+            if agora < self.aberto_ate:
+                return False
+            self.aberto_ate = agora + self.espera
+            return True
+
+    def estado(self) -> str:
+        if self.falhas < self.falhas_max:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "meio_aberto"
+
+    def sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self.aberto_ate = 0.0
+
+    def falha(self) -> bool:
+        with self._lock:
+            self.falhas += 1
+            if self.falhas >= self.falhas_max:
+                self.aberto_ate = time.monotonic() + self.espera
+                return True
+        return False
+
+class PrazoEsgotado(Exception):
+    pass
+
+class LeituraEmThread:
+    # O POST (com os retries de conexão) e as leituras do socket rodam numa thread; quem consome
+    # espera na fila só até o prazo, então conexão lenta ou upstream parado não seguram a resposta
+    FIM = object()
+
+    def __init__(self, abrir):
+        self.fila = queue.Queue()
+        self.parar = threading.Event()
+        threading.Thread(target=self._ler, args=(abrir,), name="llm-stream", daemon=True).start()
+
+    def _ler(self, abrir):
+        try:
+            response = abrir()
+            try:
+                response.raise_for_status()
+                for pedaco in response.iter_content(chunk_size=None):
+                    if self.parar.is_set():
+                        return
+                    self.fila.put(pedaco)
+            finally:
+                response.close()
+            self.fila.put(self.FIM)
+        except Exception as e:
+            self.fila.put(e)
+
+    def pedacos(self, prazo: float, espera: float = None):
+        try:
+            while True:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    raise PrazoEsgotado()
+                try:
+                    item = self.fila.get(timeout=min(restante, espera) if espera else restante)
+                except queue.Empty:
+                    # Nada chegou no intervalo: None deixa o agrupador enviar o que já acumulou
+                    if espera:
+                        yield None
+                    continue
+                if item is self.FIM:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Cliente saiu ou o prazo acabou: a thread fecha a conexão no próximo pedaço
+            # (ou no timeout de leitura, se o upstream estiver parado)
+            self.parar.set()
 
+async def pedacos_com_prazo(pedacos, prazo: float, espera: float = None):
+    # Cada leitura espera só o que resta do prazo; a tarefa pendente é cancelada ao sair
+    iterador = pedacos.__aiter__()
+    proximo = None
     try:
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json={
-            "model": MODEL_NAME,
-            "messages": messages,
-            "temperature": 0.3,
-            "max_tokens": 1024,
-            "stream": True
-        }, stream=True)
-        
-        response.raise_for_status()
-        
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode('utf-8').replace('data: ', '').strip()
-                if decoded_line and decoded_line != '[DONE]':
-                    try:
-                        json_line = json.loads(decoded_line)
-                        content = json_line["choices"][0].get("delta", {}).get("content", "")
-                        if content:
-                            yield content
-                    except json.JSONDecodeError:
-                        continue
-    except Exception as e:
-        yield f"[Erro IA: {str(e)}]"
\ No newline at end of file
+        while True:
+            if proximo is None:
+                proximo = asyncio.ensure_future(iterador.__anext__())
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                raise PrazoEsgotado()
+            feitos, _ = await asyncio.wait({proximo}, timeout=min(restante, espera) if espera else restante)
+            if not feitos:
+                if espera:
+                    yield None
+                continue
+            try:
+                pedaco = proximo.result()
+            except StopAsyncIteration:
+                return
+            proximo = None
+            yield pedaco
+    finally:
+        if proximo is not None and not proximo.done():
+            proximo.cancel()
+
+def espera_agrupador():
+    # Só precisa acordar durante pausas do upstream se o texto for agrupado
+    return LLM_FLUSH_INTERVAL if LLM_FLUSH_CHARS > 0 and LLM_FLUSH_INTERVAL > 0 else None
+
+class ProvedorOpenRouter:
+    def __init__(self, modelo: str = MODEL_NAME, nome: str = None):
+        self.modelo = modelo
+        self.nome = nome or f"openrouter:{modelo}"
+        self.disjuntor = Disjuntor()
+
+    @property
+    def url(self) -> str:
+        return OPENROUTER_API_URL
+
+    def timeouts(self, prazo: float) -> tuple:
+        # (conexão, leitura) limitados ao que resta do prazo
+        restante = max(0.1, prazo - time.monotonic())
+        return min(LLM_CONNECT_TIMEOUT, restante), min(LLM_READ_TIMEOUT, restante)
+
+    def stream(self, messages: list, prazo: float):
+        corpo = serializar_corpo(messages, self.modelo)
+        leitura = LeituraEmThread(lambda: http_session.post(self.url, data=corpo, stream=True, timeout=self.timeouts(prazo)))
+        # Fechar este gerador (cliente desconectou) fecha pedacos(), que avisa a thread
+        yield from ler_stream(leitura.pedacos(prazo, espera_agrupador()), LLM_FLUSH_CHARS, LLM_FLUSH_INTERVAL)
+
+    async def stream_async(self, messages: list, prazo: float):
+        conexao, leitura = self.timeouts(prazo)
+        cliente = obter_cliente_async()
+        pedido = cliente.build_request("POST", self.url, content=serializar_corpo(messages, self.modelo),
+                                       timeout=httpx.Timeout(leitura, connect=conexao))
+        try:
+            # Conexão e retries do transporte também contam no prazo
+            response = await asyncio.wait_for(cliente.send(pedido, stream=True), max(0, prazo - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise PrazoEsgotado()
+        try:
+            response.raise_for_status()
+            pedacos = pedacos_com_prazo(response.aiter_bytes(), prazo, espera_agrupador())
+            async for content in ler_stream_async(pedacos, LLM_FLUSH_CHARS, LLM_FLUSH_INTERVAL):
+                yield content
+        finally:
+            await response.aclose()
+
+    def registrar_sucesso(self, primeiro_token: float):
+        metricas.provedor_primeiro_token.observar(self.nome, primeiro_token)
+        self.disjuntor.sucesso()
+
+    def registrar_falha(self, erro):
+        metricas.falhas_provedor.incrementar(self.nome)
+        if self.disjuntor.falha():
+            print(f"[Disjuntor] {self.nome} aberto por {self.disjuntor.espera:.0f}s: {erro}")
+
+class ProvedorLocal(ProvedorOpenRouter):
+    # Servidor stub determinístico (python -m src.stub_llm): mesmo protocolo SSE, sem custo
+    def __init__(self, url: str = LLM_STUB_URL):
+        super().__init__(modelo="stub", nome="local")
+        self._url = url
+
+    @property
+    def url(self) -> str:
+        return self._url
+
+def criar_provedores() -> list:
+    principal = ProvedorLocal() if LLM_PROVIDER == "local" else ProvedorOpenRouter(MODEL_NAME)
+    if LLM_FALLBACK_MODEL:
+        return [principal, ProvedorOpenRouter(LLM_FALLBACK_MODEL)]
+    return [principal]
+
+# Em ordem de preferência: o próximo só é tentado se o anterior falhar antes do primeiro token
+provedores = criar_provedores()
+
+def estado_provedores() -> list:
+    return [{"nome": p.nome, "disjuntor": p.disjuntor.estado(), "falhas": p.disjuntor.falhas} for p in provedores]
+
+def prazo_esgotado(provedor, primeiro_token):
+    # Lento não é fora do ar: o prazo não abre o disjuntor
+    metricas.prazos_esgotados.incrementar()
+    if primeiro_token is not None:
+        provedor.registrar_sucesso(primeiro_token)
+
+def conversar_com_chat(pergunta: str, system_prompt: str, item_data_json: str = None, historico: list = None):
+    if not system_prompt:
+        yield "[Erro crítico: Prompt não carregado.]"
+        return
+
+    prazo = time.monotonic() + LLM_DEADLINE
+    messages = preparar_mensagens(pergunta, system_prompt, item_data_json, historico)
+    erro = "nenhum provedor disponível"
+    for provedor in provedores:
+        if not provedor.disjuntor.permite():
+            continue
+        inicio = time.monotonic()
+        primeiro_token = None
+        stream = provedor.stream(messages, prazo)
+        try:
+            for content in stream:
+                if primeiro_token is None:
+                    primeiro_token = time.monotonic() - inicio
+                yield content
+            provedor.registrar_sucesso(primeiro_token or time.monotonic() - inicio)
+            return
+        except Exception as e:
+            if isinstance(e, PrazoEsgotado) or time.monotonic() >= prazo:
+                # Encerra com aviso em vez de deixar a plataforma cortar a função no meio
+                prazo_esgotado(provedor, primeiro_token)
+                yield AVISO_PRAZO
+                return
+            erro = str(e)
+            provedor.registrar_falha(erro)
+            if primeiro_token is not None:
+                metricas.erros_upstream.incrementar()
+                yield f"[Erro IA: {erro}]"
+                return
+        finally:
+            stream.close()
+    metricas.erros_upstream.incrementar()
+    yield f"[Erro IA: {erro}]"
+
+async def conversar_com_chat_async(pergunta: str, system_prompt: str, item_data_json: str = None, historico: list = None):
+    if not system_prompt:
+        yield "[Erro crítico: Prompt não carregado.]"
+        return
+
+    prazo = time.monotonic() + LLM_DEADLINE
+    messages = preparar_mensagens(pergunta, system_prompt, item_data_json, historico)
+    erro = "nenhum provedor disponível"
+    for provedor in provedores:
+        if not provedor.disjuntor.permite():
+            continue
+        inicio = time.monotonic()
+        primeiro_token = None
+        stream = provedor.stream_async(messages, prazo)
+        try:
+            async for content in stream:
+                if primeiro_token is None:
+                    primeiro_token = time.monotonic() - inicio
+                yield content
+            provedor.registrar_sucesso(primeiro_token or time.monotonic() - inicio)
+            return
+        except Exception as e:
+            if isinstance(e, PrazoEsgotado) or time.monotonic() >= prazo:
+                prazo_esgotado(provedor, primeiro_token)
+                yield AVISO_PRAZO
+                return
+            erro = str(e)
+            provedor.registrar_falha(erro)
+            if primeiro_token is not None:
+                metricas.erros_upstream.incrementar()
+                yield f"[Erro IA: {erro}]"
+                return
+        finally:
+            await stream.aclose()
+    metricas.erros_upstream.incrementar()
+    yield f"[Erro IA: {erro}]"
@@ -1,33 +1,200 @@
+import atexit
+import csv
 import datetime
-from supabase import create_client, Client
-from src.config import SUPABASE_URL, SUPABASE_KEY
+import os
+import queue
+import threading
+import time
+from src.config import SUPABASE_URL, SUPABASE_KEY, LOG_FILE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_QUEUE_SIZE, LOG_SYNC
 
+supabase_configurado = bool(SUPABASE_URL and SUPABASE_KEY)
+supabase_client = None
+_lock_supabase = threading.Lock()
 
+def obter_supabase():
+    # O pacote supabase pesa ~0,4s de import: só carrega no primeiro lote, já na thread do gravador
+    global supabase_client
+    if supabase_client is None:
+        with _lock_supabase:
+            if supabase_client is None:
+                from supabase import create_client
+                supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase_client
 
-supabase_client = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except Exception as e:
-        print(f"Erro ao conectar Supabase na inicialização: {e}")
-
-def log_interaction(pergunta, resposta, local_encontrado):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"\n--- LOG [{timestamp}] ---")
-    print(f"User: {pergunta}")
-    print(f"Local: {local_encontrado}")
-
-    if supabase_client:
+CSV_COLUNAS = ["data_hora", "pergunta_usuario", "resposta_ia", "local_encontrado", "caminho"]
+CSV_COLUNAS_V1 = CSV_COLUNAS[:4]
+
+def gravar_supabase(lote: list):
+    # A tabela logs precisa da coluna caminho (text)
+    rows = [{"pergunta": r["pergunta"], "resposta": r["resposta"], "local": r["local"], "caminho": r.get("caminho", "")}
+            for r in lote]
+    # Um único insert por lote em vez de um round-trip por interação
+    obter_supabase().table("logs").insert(rows).execute()
+    print(f"Salvo no Supabase (lote de {len(rows)})!")
+
+def migrar_csv(caminho: str):
+    # Arquivo da versão anterior (sem a coluna caminho): reescreve com o cabeçalho novo e
+    # caminho vazio nas linhas antigas, para o CSV não ficar com linhas de tamanhos diferentes
+    with open(caminho, encoding="utf-8", newline="") as f:
+        linhas = list(csv.reader(f))
+    if not linhas or linhas[0] != CSV_COLUNAS_V1:
+        return
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUNAS)
+        writer.writerows(linha + [""] for linha in linhas[1:])
+    os.replace(temporario, caminho)
+    print(f"{caminho} migrado para o cabeçalho com a coluna caminho.")
+
+_csv_conferidos = set()
+
+def gravar_arquivo(lote: list, caminho: str = None):
+    caminho = caminho or LOG_FILE
+    novo = not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+    if not novo and caminho not in _csv_conferidos:
+        migrar_csv(caminho)
+    _csv_conferidos.add(caminho)
+    with open(caminho, "a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        if novo:
+            writer.writerow(CSV_COLUNAS)
+        for r in lote:
+            writer.writerow([r["data_hora"], r["pergunta"], r["resposta"], r["local"], r.get("caminho", "")])
+
+class GravadorLogs:
+    def __init__(self, gravar, tamanho_lote: int = LOG_BATCH_SIZE, intervalo: float = LOG_FLUSH_INTERVAL,
+                 tamanho_fila: int = LOG_QUEUE_SIZE, reserva=None, sincrono: bool = LOG_SYNC):
+        self.gravar = gravar
+        self.sincrono = sincrono
+        self.reserva = reserva
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.descartados = 0
+        self.gravados = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def registrar(self, registro: dict) -> bool:
+        # Modo síncrono fica sem thread (ela não roda com a função congelada e o lote pendente se
+        # perderia na reciclagem): o registro espera na fila até o flush depois da resposta
+        if not self.sincrono:
+            self._garantir_thread()
+        try:
+            self.fila.put_nowait(registro)
+            return True
+        except queue.Full:
+            # Backpressure: sob rajada descartamos em vez de segurar a requisição
+            with self._lock:
+                self.descartados += 1
+            return False
+
+    def _garantir_thread(self):
+        # Após um fork (gunicorn --preload) a thread do processo pai não existe no filho
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._loop, name="gravador-logs", daemon=True)
+                self._thread.start()
+
+    def _coletar_lote(self, espera: float) -> list:
+        lote = []
         try:
-            data = {
-                "pergunta": pergunta,
-                "resposta": resposta[:1000],
-                "local": str(local_encontrado) or "Nenhum"
-            }
-            # Se falhar por permissão RLS ou rede, capturamos no except
-            supabase_client.table("logs").insert(data).execute()
-            print("Salvo no Supabase (Background)!")
-        except Exception as e:
-            print(f"Aviso Supabase (Log não salvo): {e}")
-    else:
-        print("Supabase não configurado ou indisponível.")
\ No newline at end of file
+            lote.append(self.fila.get(timeout=espera))
+        except queue.Empty:
+            return lote
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _loop(self):
+        while not self._parar.is_set():
+            lote = self._coletar_lote(self.intervalo)
+            if lote:
+                self._gravar_lote(lote)
+
+    def _gravar_lote(self, lote: list):
+        with self._lock_gravacao:
+            try:
+                self.gravar(lote)
+                self.gravados += len(lote)
+                return
+            except Exception as e:
+                print(f"Aviso (Log não salvo): {e}")
+            if self.reserva:
+                try:
+                    self.reserva(lote)
+                    self.gravados += len(lote)
+                    return
+                except Exception as e:
+                    print(f"Aviso (Log reserva não salvo): {e}")
+            self.falhas += len(lote)
+
+    def flush(self):
+        lote = []
+        while True:
+            try:
+                lote.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(lote)
+                lote = []
+        if lote:
+            self._gravar_lote(lote)
+
+    def encerrar(self, timeout: float = 5):
+        self._parar.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+
+    def estatisticas(self) -> dict:
+        return {
+            "na_fila": self.fila.qsize(),
+            "gravados": self.gravados,
+            "descartados": self.descartados,
+            "falhas": self.falhas
+        }
+
+if supabase_configurado:
+    gravador = GravadorLogs(gravar_supabase, reserva=gravar_arquivo if LOG_FILE else None)
+elif LOG_FILE:
+    gravador = GravadorLogs(gravar_arquivo)
+else:
+    gravador = None
+    print("Supabase não configurado e LOG_FILE vazio: interações não serão salvas.")
+
+if gravador:
+    atexit.register(gravador.encerrar)
+
+def descarregar_logs():
+    # LOG_SYNC: chamado quando a resposta já saiu, para a gravação não atrasar o cliente
+    if gravador and gravador.sincrono:
+        gravador.flush()
+
+def log_interaction(pergunta, resposta, local_encontrado, caminho=None):
+    if not gravador:
+        return
+    gravador.registrar({
+        "data_hora": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "pergunta": pergunta,
+        "resposta": (resposta or "")[:1000],
+        "local": str(local_encontrado) or "Nenhum",
+        "caminho": caminho or ""
+    })
@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+from src.config import METRICS_ENABLED
+
+# Exposição no formato texto do Prometheus sem depender do prometheus_client.
+# Cada processo (worker do gunicorn, instância da Vercel) tem os próprios valores.
+BUCKETS_ETAPAS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulo: str, buckets: tuple = BUCKETS_ETAPAS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulo = rotulo
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor_rotulo: str, segundos: float):
+        indice = bisect.bisect_left(self.buckets, segundos)
+        with self._lock:
+            serie = self.series.get(valor_rotulo)
+            if serie is None:
+                serie = self.series[valor_rotulo] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += segundos
+            serie[2] += 1
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self.series.items()}
+        for valor_rotulo, (contagens, soma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{self.rotulo}="{valor_rotulo}",le="{limite}"}} {acumulado}')
+            linhas.append(f'{self.nome}_bucket{{{self.rotulo}="{valor_rotulo}",le="+Inf"}} {total}')
+            linhas.append(f'{self.nome}_sum{{{self.rotulo}="{valor_rotulo}"}} {soma}')
+            linhas.append(f'{self.nome}_count{{{self.rotulo}="{valor_rotulo}"}} {total}')
+        return linhas
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulo: str = None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulo = rotulo
+        self.valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor_rotulo: str = "", quantidade: int = 1):
+        with self._lock:
+            self.valores[valor_rotulo] = self.valores.get(valor_rotulo, 0) + quantidade
+
+    def __getitem__(self, valor_rotulo: str) -> int:
+        return self.valores.get(valor_rotulo, 0)
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            valores = dict(self.valores)
+        if not self.rotulo:
+            linhas.append(f"{self.nome} {valores.get('', 0)}")
+        for valor_rotulo, total in sorted(valores.items()):
+            if self.rotulo:
+                linhas.append(f'{self.nome}{{{self.rotulo}="{valor_rotulo}"}} {total}')
+        return linhas
+
+class Medidor:
+    # Valor calculado na hora da coleta
+    def __init__(self, nome: str, ajuda: str, funcao):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.funcao = funcao
+
+    def exportar(self) -> list:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} gauge", f"{self.nome} {self.funcao()}"]
+
+etapas = Histograma("guia_etapa_segundos", "Duração de cada etapa do /chat", "etapa")
+respostas = Contador("guia_respostas_total", "Respostas por caminho (rapido, template, cache, llm)", "caminho")
+cache_consultas = Contador("guia_cache_consultas_total", "Consultas ao cache de respostas", "resultado")
+erros_upstream = Contador("guia_erros_upstream_total", "Falhas ao falar com a OpenRouter")
+limite_excedido = Contador("guia_limite_excedido_total", "Requisições recusadas pelo rate limit (429)")
+provedor_primeiro_token = Histograma("guia_provedor_primeiro_token_segundos", "Tempo até o primeiro token por provedor de LLM", "provedor")
+falhas_provedor = Contador("guia_falhas_provedor_total", "Falhas por provedor de LLM (erro ou timeout)", "provedor")
+prazos_esgotados = Contador("guia_prazo_esgotado_total", "Respostas da IA encerradas pelo LLM_DEADLINE")
+streams_coalescidos = Contador("guia_streams_coalescidos_total", "Requisições que reaproveitaram um stream da OpenRouter já aberto")
+tokens_economizados = Contador("guia_tokens_economizados_total", "Tokens de prompt cortados pelo orçamento (estimativa local)")
+
+REGISTRO = [etapas, respostas, cache_consultas, erros_upstream, limite_excedido, tokens_economizados, streams_coalescidos,
+            provedor_primeiro_token, falhas_provedor, prazos_esgotados]
+
+def observar(etapa: str, segundos: float):
+    if METRICS_ENABLED:
+        etapas.observar(etapa, segundos)
+
+class Cronometro:
+    # Marca o tempo desde a marca anterior (ou desde a criação): uma chamada a perf_counter por etapa.
+    # Etapa None só avança a marca, sem observar
+    __slots__ = ("inicio", "ultimo")
+
+    def __init__(self):
+        self.inicio = self.ultimo = time.perf_counter() if METRICS_ENABLED else 0.0
+
+    def marcar(self, etapa: str, desde_inicio: bool = False):
+        if not METRICS_ENABLED:
+            return
+        agora = time.perf_counter()
+        if etapa:
+            etapas.observar(etapa, agora - (self.inicio if desde_inicio else self.ultimo))
+        self.ultimo = agora
+
+def exportar() -> str:
+    linhas = []
+    for metrica in REGISTRO:
+        linhas.extend(metrica.exportar())
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,103 @@
+import json
+from typing import NamedTuple
+from src.config import PROMPT_MAX_TOKENS, HISTORY_MSG_MAX_TOKENS
+from src.constants import INSTRUCAO_DADOS
+
+# Sem tokenizer remoto: os BPE usados pela OpenRouter ficam perto de 4 bytes UTF-8 por token em português
+BYTES_POR_TOKEN = 4
+TOKENS_POR_MENSAGEM = 4
+
+# Do que menos importa para o que mais importa; nome/orgao e localização nunca saem
+ORDEM_DESCARTE = ("dica", "acessibilidade", "tipo")
+LIMITES_TEXTO = (240, 120)
+ORDEM_DESCARTE_FINAL = ("telefone", "description", "descrição", "descricao")
+
+class AjustePrompt(NamedTuple):
+    item_data_json: str
+    historico: list
+    tokens: int
+    economizados: int
+
+def estimar_tokens(texto) -> int:
+    if not texto:
+        return 0
+    return -(-len(str(texto).encode("utf-8")) // BYTES_POR_TOKEN)
+
+def encurtar(texto: str, max_tokens: int) -> str:
+    if estimar_tokens(texto) <= max_tokens:
+        return texto
+    cortado = texto.encode("utf-8")[:max_tokens * BYTES_POR_TOKEN - 3].decode("utf-8", "ignore")
+    return cortado.rsplit(" ", 1)[0] + "…"
+
+def tokens_historico(historico: list) -> int:
+    return sum(estimar_tokens(m.get("content") if isinstance(m, dict) else m) + TOKENS_POR_MENSAGEM for m in historico)
+
+def tokens_payload(item_data_json: str) -> int:
+    if not item_data_json:
+        return 0
+    return estimar_tokens(INSTRUCAO_DADOS) + estimar_tokens(item_data_json) + TOKENS_POR_MENSAGEM
+
+def _sem_campo(valor, campo: str):
+    if isinstance(valor, dict):
+        return {k: _sem_campo(v, campo) for k, v in valor.items() if k != campo}
+    if isinstance(valor, list):
+        return [_sem_campo(v, campo) for v in valor]
+    return valor
+
+def _textos_cortados(valor, limite: int):
+    if isinstance(valor, dict):
+        return {k: _textos_cortados(v, limite) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_textos_cortados(v, limite) for v in valor]
+    if isinstance(valor, str) and len(valor) > limite:
+        return valor[:limite].rsplit(" ", 1)[0] + "…"
+    return valor
+
+def reducoes_payload(dados):
+    # Cada passo devolve uma versão menor; quem chama para no primeiro que couber
+    if isinstance(dados, dict) and isinstance(dados.get("items"), list):
+        while len(dados["items"]) > 1:
+            dados = {**dados, "items": dados["items"][:-1]}
+            yield dados
+    for campo in ORDEM_DESCARTE:
+        dados = _sem_campo(dados, campo)
+        yield dados
+    for limite in LIMITES_TEXTO:
+        dados = _textos_cortados(dados, limite)
+        yield dados
+    for campo in ORDEM_DESCARTE_FINAL:
+        dados = _sem_campo(dados, campo)
+        yield dados
+
+def cortar_payload(item_data_json: str, max_tokens: int) -> str:
+    if tokens_payload(item_data_json) <= max_tokens:
+        return item_data_json
+    try:
+        dados = json.loads(item_data_json)
+    except ValueError:
+        return encurtar(item_data_json, max(1, max_tokens - tokens_payload("x")))
+    for reduzido in reducoes_payload(dados):
+        item_data_json = json.dumps(reduzido, ensure_ascii=False)
+        if tokens_payload(item_data_json) <= max_tokens:
+            break
+    return item_data_json
+
+def ajustar_prompt(pergunta: str, system_prompt: str, item_data_json: str = None, historico: list = None,
+                   limite: int = PROMPT_MAX_TOKENS, limite_mensagem: int = HISTORY_MSG_MAX_TOKENS) -> AjustePrompt:
+    historico = list(historico or [])[-4:]
+    fixos = estimar_tokens(system_prompt) + estimar_tokens(pergunta) + 2 * TOKENS_POR_MENSAGEM
+    antes = fixos + tokens_historico(historico) + tokens_payload(item_data_json)
+
+    historico = [
+        {**m, "content": encurtar(m["content"], limite_mensagem)} if isinstance(m, dict) and isinstance(m.get("content"), str) else m
+        for m in historico
+    ]
+    if limite:
+        # Os dados factuais valem mais que o histórico: sai primeiro a mensagem mais antiga
+        while historico and fixos + tokens_historico(historico) + tokens_payload(item_data_json) > limite:
+            historico = historico[1:]
+        if item_data_json and fixos + tokens_payload(item_data_json) > limite:
+            item_data_json = cortar_payload(item_data_json, limite - fixos)
+
+    depois = fixos + tokens_historico(historico) + tokens_payload(item_data_json)
+    return AjustePrompt(item_data_json, historico, depois, antes - depois)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+from typing import NamedTuple
+from src.config import KB_RELOAD_INTERVAL
+from src.search import construir_indice, indice_de_tabelas, serializar_payload, tabelas_do_indice
+from src.snapshot import ler_snapshot
+from src.utils import load_prompt_data
+
+SECOES_ESTATICAS = ("historia_axixa", "comidas_tipicas")
+
+class BaseConhecimento(NamedTuple):
+    data: dict
+    system_prompt: str
+    indice: dict
+    secoes: dict
+    versao: str
+    assinatura: tuple
+
+def _assinatura(caminho: str) -> tuple:
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def conteudo_snapshot(base: BaseConhecimento) -> dict:
+    return {
+        "data": base.data,
+        "system_prompt": base.system_prompt,
+        "tabelas": tabelas_do_indice(base.indice),
+        "secoes": base.secoes
+    }
+
+def carregar_base(caminho: str, snapshot: str = None) -> BaseConhecimento:
+    assinatura = _assinatura(caminho)
+    try:
+        with open(caminho, "rb") as f:
+            fonte = f.read()
+    except OSError as e:
+        print(f"[Erro] Ocorreu um erro ao ler o {caminho}: {e}")
+        return None
+    versao = hashlib.sha1(fonte).hexdigest()[:12]
+
+    # Partida a frio: com um snapshot válido do mesmo prompt.json, nada é normalizado de novo
+    conteudo = ler_snapshot(snapshot, fonte) if snapshot else None
+    if conteudo:
+        return BaseConhecimento(
+            data=conteudo["data"],
+            system_prompt=conteudo["system_prompt"],
+            indice=indice_de_tabelas(conteudo["tabelas"]),
+            secoes=conteudo["secoes"],
+            versao=versao,
+            assinatura=assinatura
+        )
+
+    data = load_prompt_data(caminho)
+    if not data:
+        return None
+    return BaseConhecimento(
+        data=data,
+        system_prompt="\n".join(data.get("system_prompt", [])),
+        indice=construir_indice(data),
+        # Seções estáticas já serializadas: história e lista de comidas típicas
+        secoes={secao: serializar_payload(data.get(secao)) for secao in SECOES_ESTATICAS},
+        versao=versao,
+        assinatura=assinatura
+    )
+
+class Recarregador:
+    # Acompanha o mtime do prompt.json e monta a base nova fora do caminho das requisições;
+    # quem usa só enxerga a troca pronta, via callback.
+    def __init__(self, caminho: str, ao_trocar, assinatura_atual: tuple = None, intervalo: float = KB_RELOAD_INTERVAL):
+        self.caminho = caminho
+        self.ao_trocar = ao_trocar
+        self.intervalo = intervalo
+        self.recargas = 0
+        self._vista = assinatura_atual
+        self._lock = threading.Lock()
+        self._lock_thread = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def verificar_agora(self) -> bool:
+        # Uma recarga por vez; se já houver outra em andamento, esta verificação é pulada
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            assinatura = _assinatura(self.caminho)
+            if assinatura is None or assinatura == self._vista:
+                return False
+            # Marca como vista antes de carregar: um JSON quebrado não é relido em loop
+            self._vista = assinatura
+            nova = carregar_base(self.caminho)
+            if nova is None:
+                print(f"[Recarga] {self.caminho} inválido; mantendo a base atual.")
+                return False
+            self.ao_trocar(nova)
+            self.recargas += 1
+            print(f"[Recarga] Base de conhecimento atualizada (versão {nova.versao}).")
+            return True
+        finally:
+            self._lock.release()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar_agora()
+            except Exception as e:
+                print(f"[Recarga] Erro ao recarregar: {e}")
+
+    def iniciar(self):
+        # Chamado também a cada requisição: após um fork (gunicorn --preload) a thread do pai não existe no filho
+        if self.intervalo <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock_thread:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._loop, name="recarregador-base", daemon=True)
+                self._thread.start()
+
+    def parar(self):
+        self._parar.set()
@@ -0,0 +1,48 @@
+from src.constants import CATEGORY_KEYWORDS_MAP
+from src.config import TEMPLATE_MIN_SCORE
+
+CAMPOS_TEMPLATE = [
+    ("localizacao", "📍 **Endereço:**"),
+    ("endereco", "📍 **Endereço:**"),
+    ("descricao", "ℹ️"),
+    ("descrição", "ℹ️"),
+    ("telefone", "📞 **Telefone:**"),
+    ("acessibilidade", "♿ **Acesso:**")
+]
+
+def pergunta_so_sobre_item(termos: list, texto_item: str, categoria: str) -> bool:
+    # "Onde fica o IEMA?" pode sair pronto; "A prefeitura abre sábado?" precisa da IA
+    conhecidos = set(texto_item.split()) | set(CATEGORY_KEYWORDS_MAP.get(categoria, []))
+    return bool(termos) and all(t in conhecidos for t in termos)
+
+def renderizar_item(item: dict) -> str:
+    nome = item.get("nome") or item.get("orgao")
+    linhas = [f"**{nome}**"]
+    vistos = set()
+    for campo, rotulo in CAMPOS_TEMPLATE:
+        valor = item.get(campo)
+        if valor and rotulo not in vistos:
+            vistos.add(rotulo)
+            linhas.append(f"{rotulo} {valor}")
+    linhas.append("Toque no botão abaixo para ver no mapa.")
+    return "\n\n".join(linhas)
+
+def resposta_template(resultado, rota, indice, minimo: float = None):
+    minimo = TEMPLATE_MIN_SCORE if minimo is None else minimo
+    if not minimo or not resultado or resultado.item.get("is_general") or resultado.score < minimo:
+        return None
+    texto_item = indice[resultado.categoria]["texts"][resultado.posicao]
+    if not pergunta_so_sobre_item(rota.termos, texto_item, resultado.categoria):
+        return None
+    return renderizar_item(resultado.item)
+
+def renderizar_reserva(item: dict) -> str:
+    # Resposta sem IA quando nenhum provedor responde (disjuntor aberto, timeout)
+    if not item.get("is_general"):
+        return renderizar_item(item)
+    linhas = ["No momento não consigo gerar uma resposta completa, mas aqui vão algumas opções:"]
+    for opcao in item.get("items", []):
+        nome = opcao.get("nome") or opcao.get("orgao")
+        local = opcao.get("localizacao") or opcao.get("endereco")
+        linhas.append(f"- **{nome}**" + (f" ({local})" if local else ""))
+    return "\n".join(linhas)
@@ -0,0 +1,124 @@
+import re
+from typing import NamedTuple
+from src.constants import (
+    CATEGORIAS_ALVO, CATEGORY_KEYWORDS_MAP, GENERIC_TRIGGERS, STOP_WORDS,
+    SAUDACOES_WORDS, SAUDACOES_PHRASES, IDENTITY_KEYWORDS, HISTORY_KEYWORDS, FOOD_LIST_KEYWORDS,
+    PERTO_KEYWORDS
+)
+
+class Rota(NamedTuple):
+    texto: str
+    termos: list
+    query_final: str
+    saudacao: bool
+    identidade: bool
+    historia: bool
+    lista_comidas: bool
+    categoria_generica: str
+    categorias: frozenset
+    categoria_detectada: str
+    perto_de_mim: bool = False
+
+def _regex_trie(palavras) -> str:
+    # Alternância fatorada por prefixo: o motor de regex não testa cada palavra do zero
+    trie = {}
+    for palavra in palavras:
+        no = trie
+        for c in palavra:
+            no = no.setdefault(c, {})
+        no[""] = {}
+
+    def montar(no):
+        ramos = [re.escape(c) + montar(filho) for c, filho in sorted(no.items()) if c]
+        if not ramos:
+            return ""
+        corpo = ramos[0] if len(ramos) == 1 else "(?:" + "|".join(ramos) + ")"
+        # Opcional e guloso: em cada posição casa sempre a palavra mais longa
+        return f"(?:{corpo})?" if "" in no else corpo
+
+    return montar(trie)
+
+def compilar_roteador():
+    tabela = {}
+    for frase in SAUDACOES_PHRASES:
+        tabela.setdefault(frase, set()).add("saudacao")
+    for chave in IDENTITY_KEYWORDS:
+        tabela.setdefault(chave, set()).add("identidade")
+    for chave in HISTORY_KEYWORDS:
+        tabela.setdefault(chave, set()).add("historia")
+    for chave in PERTO_KEYWORDS:
+        tabela.setdefault(chave, set()).add("perto")
+    for chave in FOOD_LIST_KEYWORDS:
+        tabela.setdefault(chave, set()).add(("comida", chave))
+    for categoria, keywords in CATEGORY_KEYWORDS_MAP.items():
+        for kw in keywords:
+            tabela.setdefault(kw, set()).add(("categoria", categoria))
+
+    # A regex só reporta a palavra mais longa em cada posição; as menores contidas
+    # nela (ex.: "mercado" em "mercadinho") entram pelo fecho, com o deslocamento.
+    fecho = {}
+    for maior in tabela:
+        entradas = set()
+        for menor, tags in tabela.items():
+            inicio = maior.find(menor)
+            while inicio != -1:
+                entradas.update((tag, inicio) for tag in tags)
+                inicio = maior.find(menor, inicio + 1)
+        fecho[maior] = tuple(entradas)
+
+    genericos = {}
+    for categoria, triggers in GENERIC_TRIGGERS.items():
+        for trigger in triggers:
+            genericos.setdefault(trigger, categoria)
+
+    automato = re.compile(f"(?=({_regex_trie(tabela)}))")
+    return automato, fecho, genericos
+
+_AUTOMATO, _FECHO, _GENERICOS = compilar_roteador()
+_ORDEM_CATEGORIAS = {categoria: i for i, categoria in enumerate(CATEGORIAS_ALVO)}
+_COMIDA_TAGS = {("comida", chave) for chave in FOOD_LIST_KEYWORDS}
+
+def _palavra_importante(texto: str, pos: int) -> bool:
+    inicio = pos
+    while inicio > 0 and not texto[inicio - 1].isspace():
+        inicio -= 1
+    fim = pos
+    while fim < len(texto) and not texto[fim].isspace():
+        fim += 1
+    palavra = texto[inicio:fim]
+    return palavra not in STOP_WORDS and len(palavra) > 1
+
+def rotear(texto: str) -> Rota:
+    # texto já normalizado (normalize_text)
+    palavras = texto.split()
+    termos = [w for w in palavras if w not in STOP_WORDS and len(w) > 1]
+    query_final = " ".join(termos) if termos else texto
+
+    tags = set()
+    categorias = set()
+    for match in _AUTOMATO.finditer(texto):
+        for tag, deslocamento in _FECHO[match.group(1)]:
+            if tag[0] != "categoria":
+                tags.add(tag)
+                continue
+            if tag[1] in categorias:
+                continue
+            # Categorias são detectadas na query sem stop words, como no find_item_smart
+            if termos and not _palavra_importante(texto, match.start() + deslocamento):
+                continue
+            categorias.add(tag[1])
+
+    detectada = min(categorias, key=_ORDEM_CATEGORIAS.__getitem__) if categorias else None
+    return Rota(
+        texto=texto,
+        termos=termos,
+        query_final=query_final,
+        saudacao=bool(SAUDACOES_WORDS.intersection(palavras)) or "saudacao" in tags,
+        identidade="identidade" in tags,
+        historia="historia" in tags,
+        lista_comidas=_COMIDA_TAGS <= tags,
+        categoria_generica=_GENERICOS.get(query_final),
+        categorias=frozenset(categorias),
+        categoria_detectada=detectada,
+        perto_de_mim="perto" in tags
+    )
@@ -1,28 +1,95 @@
+import json
+from bisect import bisect_left
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import NamedTuple
 from rapidfuzz import process, fuzz
 from src.utils import normalize_text
-from src.constants import CATEGORIAS_ALVO, CATEGORY_KEYWORDS_MAP, STOP_WORDS
-
-SEARCH_CACHE = {}
-GENERIC_TRIGGERS = {
-    "escolas": ["escola", "escolas", "colegio", "colegios", "estudar"],
-    "lojas": ["loja", "lojas", "comercio", "compras"],
-    "igrejas": ["igreja", "igrejas"],
-    "pontos_turisticos": ["turismo", "passear", "pontos turisticos", "praia", "praias"],
-    "predios_municipais": ["orgaos", "predios", "reparticoes"],
-    "campos_esportivos": ["esportes", "campos", "ginasio"],
-    "cemiterios": ["cemiterio", "cemiterios"],
-    "pousadas_dormitorios": ["dormir", "pousada", "pousadas"],
-    "comidas_tipicas": ["comida", "comer"]
-}
+from src.geo import IndiceEspacial, construir_indice_espacial
+from src.constants import CATEGORIAS_ALVO
+from src.router import Rota, rotear
 
-def build_search_index(data: dict):
-    global SEARCH_CACHE
-    if not data: return
+class CorpusPlano(NamedTuple):
+    # Todas as categorias num único corpus, na ordem de CATEGORIAS_ALVO: uma chamada ao cdist pontua tudo
+    texts: tuple
+    names: tuple
+    fatias: tuple
+
+class IndiceBusca(Mapping):
+    # Leitura como um dict de categorias; o corpus plano vem junto para a busca vetorizada
+    # e a grade espacial para as perguntas "perto de mim"
+    __slots__ = ("_categorias", "corpus", "espacial")
+
+    def __init__(self, categorias: dict, corpus: CorpusPlano = None, espacial: IndiceEspacial = None):
+        self._categorias = MappingProxyType(categorias)
+        self.corpus = corpus
+        self.espacial = espacial
+
+    def __getitem__(self, categoria):
+        return self._categorias[categoria]
+
+    def __iter__(self):
+        return iter(self._categorias)
+
+    def __len__(self):
+        return len(self._categorias)
+
+SEARCH_CACHE = IndiceBusca({})
+
+def _grams(texto: str) -> set:
+    grams = set()
+    for token in texto.split():
+        grams.add(token)
+        for i in range(len(token) - 2):
+            grams.add(token[i:i + 3])
+    return grams
+
+def _tamanho_tokens(texto: str) -> int:
+    return len(" ".join(sorted(set(texto.split()))))
+
+def _limite_sem_intersecao(tamanho_query: int, tamanhos: list) -> float:
+    # token_set_ratio sem tokens em comum vira ratio() entre os tokens unicos,
+    # limitado por 200 * min(a, b) / (a + b): o pico fica no tamanho mais proximo da query.
+    if not tamanho_query or not tamanhos: return 0
+    limite = 0
+    pos = bisect_left(tamanhos, tamanho_query)
+    for tamanho in tamanhos[max(pos - 1, 0):pos + 1]:
+        if tamanho:
+            limite = max(limite, 200 * min(tamanho_query, tamanho) / (tamanho_query + tamanho))
+    return limite
+
+def dados_publicos(valor):
+    # Campos internos (prefixo "_") não vão para o LLM: vazariam dados e gastariam tokens
+    if isinstance(valor, dict):
+        return {k: dados_publicos(v) for k, v in valor.items() if not str(k).startswith("_")}
+    if isinstance(valor, (list, tuple)):
+        return [dados_publicos(v) for v in valor]
+    return valor
+
+def serializar_payload(valor) -> str:
+    return json.dumps(dados_publicos(valor), ensure_ascii=False)
+
+def payload_geral(categoria: str, items) -> str:
+    geral = {
+        "is_general": True,
+        "category": categoria,
+        "items": list(items[:4])
+    }
+    if categoria.lower() in ("escolas", "lojas", "igrejas"):
+        geral["description"] = " povoados"
+    return serializar_payload(geral)
+
+def construir_indice(data: dict) -> dict:
+    # Índice novo e imutável; os itens do prompt.json não são alterados
+    indice = {}
+    if not data: return IndiceBusca(indice)
     
     for categoria in CATEGORIAS_ALVO:
         items = data.get(categoria, [])
         processed_texts = []
-        processed_objects = []
+        processed_names = []
+        processed_payloads = []
+        inverted_index = {}
 
         for item in items:
             nome = item.get("nome") or item.get("orgao") or ""
@@ -31,56 +98,124 @@ def build_search_index(data: dict):
             texto_cru = f"{nome} {desc} {local} {categoria}"
             texto_busca = normalize_text(texto_cru)
             
-            item["_nome_normalizado"] = normalize_text(nome)
-            
+            for gram in _grams(texto_busca):
+                inverted_index.setdefault(gram, []).append(len(processed_texts))
+
             processed_texts.append(texto_busca)
-            processed_objects.append(item)
+            processed_names.append(normalize_text(nome))
+            processed_payloads.append(serializar_payload(item))
         
-        SEARCH_CACHE[categoria] = {
-            "texts": processed_texts,
-            "objects": processed_objects
+        indice[categoria] = {
+            "texts": tuple(processed_texts),
+            "names": tuple(processed_names),
+            "objects": tuple(items),
+            "payloads": tuple(processed_payloads),
+            "payload_geral": payload_geral(categoria, items),
+            "index": {gram: tuple(pos) for gram, pos in inverted_index.items()},
+            "token_lengths": tuple(sorted(_tamanho_tokens(t) for t in processed_texts))
         }
+    return indice_de_tabelas(indice)
 
-def find_item_smart(pergunta: str):
-    if not pergunta: return None
+def indice_de_tabelas(tabelas: dict) -> IndiceBusca:
+    # Tabelas já normalizadas (de construir_indice ou do snapshot) viram o índice somente leitura
+    indice = {
+        categoria: MappingProxyType(dict(cache_data, index=MappingProxyType(cache_data["index"])))
+        for categoria, cache_data in tabelas.items()
+    }
+    return IndiceBusca(indice, construir_corpus(indice), construir_indice_espacial(indice))
 
-    pergunta_limpa = normalize_text(pergunta)
-    termos_importantes = [word for word in pergunta_limpa.split() if word not in STOP_WORDS and len(word) > 1]
-    
-    if termos_importantes:
-        query_final = " ".join(termos_importantes)
-    else:
-        query_final = pergunta_limpa
-    for categoria, triggers in GENERIC_TRIGGERS.items():
-        if query_final in triggers:
-            all_items = SEARCH_CACHE.get(categoria, {}).get("objects", [])
-            return {
-                "is_general": True,
-                "category": categoria,
-                "items": all_items[:4]
-            }
-
-    best_item = None
+def tabelas_do_indice(indice: IndiceBusca) -> dict:
+    # Inverso de indice_de_tabelas: dicts simples, que o pickle sabe gravar
+    return {categoria: dict(cache_data, index=dict(cache_data["index"])) for categoria, cache_data in indice.items()}
+
+def construir_corpus(indice: dict) -> CorpusPlano:
+    texts, names, fatias = [], [], []
+    for categoria in CATEGORIAS_ALVO:
+        cache_data = indice.get(categoria)
+        if not cache_data or not cache_data["texts"]:
+            continue
+        fatias.append((categoria, len(texts), len(texts) + len(cache_data["texts"])))
+        texts.extend(cache_data["texts"])
+        names.extend(cache_data["names"])
+    return CorpusPlano(tuple(texts), tuple(names), tuple(fatias))
+
+def publicar_indice(indice: dict):
+    global SEARCH_CACHE
+    # Troca atômica da referência: buscas em andamento continuam com o índice antigo
+    SEARCH_CACHE = indice
+
+def build_search_index(data: dict):
+    if not data: return
+    indice = construir_indice(data)
+    publicar_indice(indice)
+    return indice
+
+def _melhor_match(query_final: str, query_grams: set, tamanho_query: int, cache_data: dict, piso: float):
+    texts = cache_data["texts"]
+    index = cache_data.get("index")
+    if index is None:
+        return process.extractOne(query_final, texts, scorer=fuzz.token_set_ratio)
+
+    candidatos = set()
+    for gram in query_grams:
+        candidatos.update(index.get(gram, ()))
+
+    match = None
+    if candidatos:
+        ordenados = sorted(candidatos)
+        parcial = process.extractOne(query_final, [texts[i] for i in ordenados], scorer=fuzz.token_set_ratio)
+        if parcial:
+            match = (parcial[0], parcial[1], ordenados[parcial[2]])
+
+    # Itens fora dos candidatos nao tem token em comum com a query; so vale varrer
+    # tudo se o limite teorico deles ainda puder empatar com o melhor candidato.
+    if len(candidatos) < len(texts):
+        limite = _limite_sem_intersecao(tamanho_query, cache_data["token_lengths"])
+        if limite >= piso and (match is None or limite >= match[1]):
+            return process.extractOne(query_final, texts, scorer=fuzz.token_set_ratio)
+    return match
+
+class ResultadoBusca(NamedTuple):
+    item: dict
+    categoria: str
+    posicao: int
+    score: float
+    payload: str
+
+def _resultado_geral(indice: dict, categoria: str) -> ResultadoBusca:
+    cache_data = indice.get(categoria) or {}
+    all_items = cache_data.get("objects", ())
+    payload = cache_data.get("payload_geral") or payload_geral(categoria, all_items)
+    return ResultadoBusca(
+        item={
+            "is_general": True,
+            "category": categoria,
+            "items": list(all_items[:4])
+        },
+        categoria=categoria,
+        posicao=None,
+        score=0,
+        payload=payload
+    )
+
+def _melhor_por_categoria(rota: Rota, indice: dict):
+    # Caminho de uma pergunta: poda pelo índice invertido, uma categoria por vez
+    best = None
     best_score = 0
-    detected_category = None
+    query_final = rota.query_final
+    query_grams = _grams(query_final)
+    tamanho_query = _tamanho_tokens(query_final)
     for categoria in CATEGORIAS_ALVO:
-        cat_bonus = 0
-        keywords = CATEGORY_KEYWORDS_MAP.get(categoria, [])
-        if any(kw in query_final for kw in keywords):
-            cat_bonus = 10
-            if not detected_category:
-                detected_category = categoria
-        cache_data = SEARCH_CACHE.get(categoria)
+        cat_bonus = 10 if categoria in rota.categorias else 0
+        cache_data = indice.get(categoria)
         if not cache_data or not cache_data["texts"]: continue
             
-        match = process.extractOne(query_final, cache_data["texts"], scorer=fuzz.token_set_ratio)
+        match = _melhor_match(query_final, query_grams, tamanho_query, cache_data, 75 - 15 - cat_bonus)
         
         if match:
             _, score_base, index = match
-            item_match = cache_data["objects"][index]
-            nome_norm = item_match.get("_nome_normalizado", "")
             current_score = score_base
-            name_score = fuzz.token_set_ratio(query_final, nome_norm)
+            name_score = fuzz.token_set_ratio(query_final, cache_data["names"][index])
             if name_score > 90:
                 current_score += 15
             elif name_score > 70:
@@ -90,15 +225,123 @@ def find_item_smart(pergunta: str):
 
             if score_final > best_score:
                 best_score = score_final
-                best_item = item_match
-    if best_score >= 75:
-        return best_item
-    if detected_category:
-        all_items = SEARCH_CACHE[detected_category]["objects"]
-        return {
-            "is_general": True,
-            "category": detected_category,
-            "items": all_items[:4] 
-        }
+                best = (categoria, index, score_final)
+    return best
+
+def _melhores_vetorizado(rotas: list, corpus: CorpusPlano, workers: int = 1) -> list:
+    # Mesmo critério do laço por categoria: o melhor texto de cada categoria leva o bônus
+    # do próprio nome e o da categoria; empate fica com a categoria que vem antes
+    if not rotas or not corpus.fatias:
+        return [None] * len(rotas)
+    # numpy (~40ms de import) só carrega quando a busca vetorizada roda, não na partida
+    import numpy as np
+    queries = [rota.query_final for rota in rotas]
+    textos = process.cdist(queries, corpus.texts, scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)
+    nomes = process.cdist(queries, corpus.names, scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)
+    linhas = np.arange(len(queries))
+    finais = np.empty((len(queries), len(corpus.fatias)))
+    vencedores = np.empty((len(queries), len(corpus.fatias)), dtype=np.intp)
+    for j, (categoria, inicio, fim) in enumerate(corpus.fatias):
+        posicoes = inicio + textos[:, inicio:fim].argmax(axis=1)
+        score_nome = nomes[linhas, posicoes]
+        bonus_nome = np.where(score_nome > 90, 15, np.where(score_nome > 70, 5, 0))
+        bonus_cat = np.fromiter((10 if categoria in rota.categorias else 0 for rota in rotas), dtype=np.float64, count=len(rotas))
+        finais[:, j] = textos[linhas, posicoes] + bonus_nome + bonus_cat
+        vencedores[:, j] = posicoes
+    melhores = finais.argmax(axis=1)
+    resultado = []
+    for i, j in enumerate(melhores):
+        score = float(finais[i, j])
+        categoria, inicio, _ = corpus.fatias[j]
+        resultado.append((categoria, int(vencedores[i, j]) - inicio, score) if score > 0 else None)
+    return resultado
+
+def _montar_resultado(indice: dict, rota: Rota, melhor) -> ResultadoBusca:
+    if melhor and melhor[2] >= 75:
+        categoria, posicao, score = melhor
+        cache_data = indice[categoria]
+        return ResultadoBusca(cache_data["objects"][posicao], categoria, posicao, score, cache_data["payloads"][posicao])
+    if rota.categoria_detectada:
+        return _resultado_geral(indice, rota.categoria_detectada)
+    return None
+
+class ItemRanqueado(NamedTuple):
+    item: dict
+    categoria: str
+    posicao: int
+    score: float
+    fuzzy: float
+    bonus_nome: int
+    bonus_categoria: int
+
+def ranquear(pergunta: str, indice: dict = None, categorias=None, piso: float = 0) -> list:
+    # Todos os itens com o mesmo critério do find_item_smart (fuzzy do texto + bônus do nome
+    # e da categoria), do maior score para o menor; empate segue a ordem do corpus
+    if indice is None:
+        indice = SEARCH_CACHE
+    corpus = getattr(indice, "corpus", None) or construir_corpus(indice)
+    if not pergunta or not corpus.fatias:
+        return []
+    import numpy as np
+    rota = rotear(normalize_text(pergunta))
+    textos = process.cdist([rota.query_final], corpus.texts, scorer=fuzz.token_set_ratio, dtype=np.float64)[0]
+    nomes = process.cdist([rota.query_final], corpus.names, scorer=fuzz.token_set_ratio, dtype=np.float64)[0]
+    bonus_nome = np.where(nomes > 90, 15, np.where(nomes > 70, 5, 0))
+    bonus_cat = np.zeros(len(corpus.texts))
+    filtro = np.zeros(len(corpus.texts), dtype=bool)
+    for categoria, inicio, fim in corpus.fatias:
+        if categoria in rota.categorias:
+            bonus_cat[inicio:fim] = 10
+        filtro[inicio:fim] = not categorias or categoria in categorias
+    finais = textos + bonus_nome + bonus_cat
+    ordem = np.argsort(-finais, kind="stable")
+    ordem = ordem[filtro[ordem] & (finais[ordem] > 0) & (finais[ordem] >= piso)]
+
+    fatias = [(inicio, fim, categoria) for categoria, inicio, fim in corpus.fatias]
+    inicios = [inicio for inicio, _, _ in fatias]
+    resultado = []
+    for i in ordem.tolist():
+        inicio, _, categoria = fatias[bisect_left(inicios, i + 1) - 1]
+        posicao = i - inicio
+        resultado.append(ItemRanqueado(
+            indice[categoria]["objects"][posicao], categoria, posicao, float(finais[i]),
+            float(textos[i]), int(bonus_nome[i]), int(bonus_cat[i])
+        ))
+    return resultado
+
+def buscar_item(pergunta: str, rota: Rota = None, indice: dict = None) -> ResultadoBusca:
+    if not pergunta: return None
+
+    if indice is None:
+        indice = SEARCH_CACHE
+    if rota is None:
+        rota = rotear(normalize_text(pergunta))
+    if rota.categoria_generica:
+        return _resultado_geral(indice, rota.categoria_generica)
+    return _montar_resultado(indice, rota, _melhor_por_categoria(rota, indice))
+
+def buscar_itens(perguntas: list, indice: dict = None, workers: int = -1) -> list:
+    # Lote (avaliação offline, testes em massa): pontua todas as perguntas num só cdist
+    if indice is None:
+        indice = SEARCH_CACHE
+    rotas = [rotear(normalize_text(p)) if p else None for p in perguntas]
+    pendentes = [i for i, rota in enumerate(rotas) if rota and not rota.categoria_generica]
+    corpus = getattr(indice, "corpus", None) or construir_corpus(indice)
+    melhores = dict(zip(pendentes, _melhores_vetorizado([rotas[i] for i in pendentes], corpus, workers)))
+
+    resultados = []
+    for i, rota in enumerate(rotas):
+        if rota is None:
+            resultados.append(None)
+        elif rota.categoria_generica:
+            resultados.append(_resultado_geral(indice, rota.categoria_generica))
+        else:
+            resultados.append(_montar_resultado(indice, rota, melhores[i]))
+    return resultados
+
+def find_item_smart(pergunta: str, rota: Rota = None, indice: dict = None):
+    resultado = buscar_item(pergunta, rota, indice)
+    return resultado.item if resultado else None
 
-    return None
\ No newline at end of file
+def find_items_smart(questions: list, indice: dict = None, workers: int = -1) -> list:
+    return [r.item if r else None for r in buscar_itens(questions, indice, workers)]
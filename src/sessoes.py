@@ -0,0 +1,98 @@
+import json
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from src.conexao_redis import obter_redis
+from src.orcamento import encurtar
+
+# Id opaco gerado pelo servidor; o cliente só devolve o que recebeu
+_FORMATO_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+def novo_id_sessao() -> str:
+    return secrets.token_urlsafe(16)
+
+def id_sessao_valido(sessao) -> bool:
+    return isinstance(sessao, str) and bool(_FORMATO_ID.match(sessao))
+
+def mensagens_do_turno(pergunta: str, resposta: str, limite_mensagem: int) -> list:
+    # Só o que o montador do prompt usa, já encurtado como em ajustar_prompt
+    return [
+        {"role": "user", "content": encurtar(pergunta, limite_mensagem)},
+        {"role": "assistant", "content": encurtar(resposta, limite_mensagem)}
+    ]
+
+class ArmazemSessoes:
+    # Anel das últimas mensagens por sessão, num LRU com TTL renovado a cada turno
+    def __init__(self, max_sessoes: int, ttl: float, max_mensagens: int, limite_mensagem: int):
+        self.max_sessoes = max_sessoes
+        self.ttl = ttl
+        self.max_mensagens = max_mensagens
+        self.limite_mensagem = limite_mensagem
+        self.sessoes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def historico(self, sessao: str) -> list:
+        with self._lock:
+            entrada = self.sessoes.get(sessao)
+            if entrada is None:
+                return []
+            mensagens, expira = entrada
+            if expira < time.monotonic():
+                del self.sessoes[sessao]
+                return []
+            self.sessoes.move_to_end(sessao)
+            return list(mensagens)
+
+    def registrar(self, sessao: str, pergunta: str, resposta: str):
+        novas = mensagens_do_turno(pergunta, resposta, self.limite_mensagem)
+        with self._lock:
+            entrada = self.sessoes.get(sessao)
+            mensagens = entrada[0] if entrada and entrada[1] >= time.monotonic() else deque(maxlen=self.max_mensagens)
+            mensagens.extend(novas)
+            self.sessoes[sessao] = (mensagens, time.monotonic() + self.ttl)
+            self.sessoes.move_to_end(sessao)
+            while len(self.sessoes) > self.max_sessoes:
+                self.sessoes.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.sessoes.clear()
+
+    def __len__(self):
+        return len(self.sessoes)
+
+class ArmazemSessoesRedis:
+    # Mesmo anel numa lista do Redis (RPUSH + LTRIM + EXPIRE), compartilhado entre instâncias
+    def __init__(self, url: str, ttl: float, max_mensagens: int, limite_mensagem: int, prefixo: str = "guia:sessao:"):
+        self.url = url
+        self.ttl = ttl
+        self.max_mensagens = max_mensagens
+        self.limite_mensagem = limite_mensagem
+        self.prefixo = prefixo
+        self._cliente = None
+
+    def _redis(self):
+        # Cliente compartilhado de src/conexao_redis.py; os testes injetam um falso em _cliente
+        return self._cliente if self._cliente is not None else obter_redis(self.url)
+
+    def historico(self, sessao: str) -> list:
+        try:
+            return [json.loads(m) for m in self._redis().lrange(self.prefixo + sessao, 0, -1)]
+        except Exception as e:
+            # Sem Redis a conversa segue sem histórico
+            print(f"Aviso (sessão Redis indisponível): {e}")
+            return []
+
+    def registrar(self, sessao: str, pergunta: str, resposta: str):
+        chave = self.prefixo + sessao
+        novas = [json.dumps(m, ensure_ascii=False) for m in mensagens_do_turno(pergunta, resposta, self.limite_mensagem)]
+        try:
+            pipe = self._redis().pipeline()
+            pipe.rpush(chave, *novas)
+            pipe.ltrim(chave, -self.max_mensagens, -1)
+            pipe.expire(chave, max(int(self.ttl), 1))
+            pipe.execute()
+        except Exception as e:
+            print(f"Aviso (sessão Redis indisponível): {e}")
@@ -0,0 +1,80 @@
+# Snapshot do índice de busca, gerado no build: python -m src.snapshot
+# Guarda os textos normalizados, nomes, tabelas por categoria e payloads já serializados,
+# para a partida a frio não reconstruir o índice a partir do prompt.json.
+import hashlib
+import os
+import pickle
+import sys
+
+# Mudou o formato das tabelas? Incremente: snapshots antigos passam a ser ignorados
+FORMATO = 2
+MAGICO = b"GUIAIDX"
+_CABECALHO = len(MAGICO) + 2 + 32 + 32 + 32
+# Código que monta o conteúdo (normalização, tabelas, payloads) e os módulos de src que ele importa:
+# o hash vai no cabeçalho, então mexer na construção do índice invalida o snapshot mesmo que ninguém
+# lembre de incrementar FORMATO. Ficam de fora config.py (só lê o ambiente) e este arquivo (FORMATO)
+ARQUIVOS_CODIGO = ("search.py", "utils.py", "reloader.py", "constants.py", "geo.py", "router.py")
+
+def assinatura_codigo() -> bytes:
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    sha = hashlib.sha256()
+    for nome in ARQUIVOS_CODIGO:
+        with open(os.path.join(pasta, nome), "rb") as f:
+            sha.update(f.read())
+    return sha.digest()
+
+def gravar_snapshot(destino: str, fonte: bytes, conteudo: dict):
+    corpo = pickle.dumps(conteudo, protocol=pickle.HIGHEST_PROTOCOL)
+    cabecalho = (MAGICO + FORMATO.to_bytes(2, "big") + hashlib.sha256(fonte).digest() + assinatura_codigo()
+                 + hashlib.sha256(corpo).digest())
+    temporario = f"{destino}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(cabecalho + corpo)
+    os.replace(temporario, destino)
+
+def ler_snapshot(caminho: str, fonte: bytes):
+    # Só confia no snapshot se ele for do prompt.json e do código atuais e estiver íntegro; senão, None e o índice é reconstruído
+    try:
+        with open(caminho, "rb") as f:
+            bruto = f.read()
+    except OSError:
+        return None
+    if len(bruto) < _CABECALHO or not bruto.startswith(MAGICO):
+        print(f"[Snapshot] {caminho} não é um snapshot do índice; reconstruindo.")
+        return None
+    pos = len(MAGICO)
+    formato = int.from_bytes(bruto[pos:pos + 2], "big")
+    fonte_sha, codigo_sha = bruto[pos + 2:pos + 34], bruto[pos + 34:pos + 66]
+    corpo_sha, corpo = bruto[pos + 66:_CABECALHO], bruto[_CABECALHO:]
+    if formato != FORMATO:
+        print(f"[Snapshot] Formato {formato} diferente do atual ({FORMATO}); reconstruindo.")
+        return None
+    if fonte_sha != hashlib.sha256(fonte).digest():
+        print("[Snapshot] Desatualizado em relação ao prompt.json; reconstruindo.")
+        return None
+    if codigo_sha != assinatura_codigo():
+        print("[Snapshot] Gerado por outra versão do código do índice; reconstruindo.")
+        return None
+    if corpo_sha != hashlib.sha256(corpo).digest():
+        print(f"[Snapshot] Checksum inválido em {caminho}; reconstruindo.")
+        return None
+    return pickle.loads(corpo)
+
+def main():
+    from src.config import INDEX_SNAPSHOT
+    from src.reloader import carregar_base, conteudo_snapshot
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    origem = sys.argv[1] if len(sys.argv) > 1 else os.path.join(raiz, "data", "prompt.json")
+    destino = sys.argv[2] if len(sys.argv) > 2 else INDEX_SNAPSHOT
+    if not destino:
+        sys.exit("INDEX_SNAPSHOT vazio: informe o destino do snapshot.")
+    base = carregar_base(origem)
+    if base is None:
+        sys.exit(f"Não foi possível ler {origem}.")
+    with open(origem, "rb") as f:
+        gravar_snapshot(destino, f.read(), conteudo_snapshot(base))
+    print(f"Snapshot {destino} gerado (versão {base.versao}, {os.path.getsize(destino)} bytes).")
+
+if __name__ == "__main__":
+    main()
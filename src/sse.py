@@ -0,0 +1,155 @@
+import json
+import time
+from json.decoder import scanstring
+
+# Parser incremental de Server-Sent Events (https://html.spec.whatwg.org/multipage/server-sent-events.html)
+# no formato da OpenRouter: recebe pedaços de bytes como chegam do socket e devolve só o texto dos deltas.
+
+FIM_DE_FRASE = (".", "!", "?", "\n", ":", ";")
+
+def conteudo_do_evento(dados: bytes) -> str:
+    # Caminho rápido: decodifica só a string de "content" dentro de "delta", sem json.loads do evento todo
+    delta = dados.find(b'"delta"')
+    if delta != -1:
+        chave = dados.find(b'"content"', delta)
+        if chave != -1 and dados[chave - 1:chave] != b"\\":
+            pos = chave + 9
+            while dados[pos:pos + 1] in (b" ", b":"):
+                pos += 1
+            if dados[pos:pos + 1] == b'"':
+                texto = dados[pos + 1:].decode("utf-8")
+                return scanstring(texto, 0)[0]
+            if dados.startswith(b"null", pos):
+                return ""
+    evento = json.loads(dados)
+    return evento["choices"][0].get("delta", {}).get("content", "") or ""
+
+class LeitorSSE:
+    def __init__(self):
+        self._buffer = b""
+        self._dados = []
+        self.terminou = False
+
+    def alimentar(self, pedaco: bytes) -> list:
+        conteudos = []
+        buffer = self._buffer + pedaco if self._buffer else pedaco
+        inicio = 0
+        while not self.terminou:
+            fim = buffer.find(b"\n", inicio)
+            if fim == -1:
+                break
+            linha = buffer[inicio:fim]
+            inicio = fim + 1
+            if linha.endswith(b"\r"):
+                linha = linha[:-1]
+            if not linha:
+                conteudo = self._despachar()
+                if conteudo:
+                    conteudos.append(conteudo)
+            elif linha.startswith(b"data:"):
+                valor = linha[5:]
+                self._dados.append(valor[1:] if valor.startswith(b" ") else valor)
+            elif linha == b"data":
+                # Campo sem ":" vale com valor vazio (só acrescenta a quebra de linha)
+                self._dados.append(b"")
+            # Comentários (": OPENROUTER PROCESSING") e campos event/id/retry não carregam texto
+        self._buffer = buffer[inicio:]
+        return conteudos
+
+    def finalizar(self) -> list:
+        # Conexão fechou sem a linha em branco final: o último evento ainda vale
+        conteudos = self.alimentar(b"\n") if self._buffer else []
+        conteudo = self._despachar()
+        return conteudos + ([conteudo] if conteudo else [])
+
+    def _despachar(self) -> str:
+        if not self._dados:
+            return ""
+        dados = b"\n".join(self._dados)
+        self._dados = []
+        if dados == b"[DONE]":
+            self.terminou = True
+            return ""
+        try:
+            return conteudo_do_evento(dados)
+        except json.JSONDecodeError:
+            return ""
+
+class Agrupador:
+    # Junta deltas pequenos: um write por frase/pedaço em vez de um por token.
+    # O primeiro delta sai na hora para não atrasar o tempo até o primeiro token.
+    def __init__(self, tamanho: int, intervalo: float):
+        self.tamanho = tamanho
+        self.intervalo = intervalo
+        self.partes = []
+        self.acumulado = 0
+        self.ultimo_envio = None
+
+    def adicionar(self, conteudo: str):
+        self.partes.append(conteudo)
+        self.acumulado += len(conteudo)
+        agora = time.monotonic()
+        if (self.ultimo_envio is None or self.acumulado >= self.tamanho or agora - self.ultimo_envio >= self.intervalo
+                or conteudo.rstrip(" ").endswith(FIM_DE_FRASE)):
+            self.ultimo_envio = agora
+            return self.esvaziar()
+        return None
+
+    def vencido(self):
+        # Upstream parado: o acumulado sai quando o intervalo vence, sem esperar o próximo token
+        if self.partes and time.monotonic() - self.ultimo_envio >= self.intervalo:
+            self.ultimo_envio = time.monotonic()
+            return self.esvaziar()
+        return None
+
+    def esvaziar(self):
+        if not self.partes:
+            return None
+        texto = "".join(self.partes)
+        self.partes = []
+        self.acumulado = 0
+        return texto
+
+def _saidas(leitor: LeitorSSE, agrupador: Agrupador, pedaco) -> list:
+    # Pedaço None: quem lê o socket esperou o intervalo sem receber nada
+    if pedaco is None:
+        saida = agrupador.vencido()
+        return [saida] if saida else []
+    return [saida for saida in map(agrupador.adicionar, leitor.alimentar(pedaco)) if saida]
+
+def ler_stream(pedacos, tamanho: int, intervalo: float):
+    # Lê até o fim mesmo depois do [DONE]: assim a conexão volta limpa para o pool
+    leitor = LeitorSSE()
+    agrupador = Agrupador(tamanho, intervalo)
+    try:
+        for pedaco in pedacos:
+            yield from _saidas(leitor, agrupador, pedaco)
+    except Exception:
+        # Erro ou prazo no meio do stream: o texto já recebido sai antes
+        resto = agrupador.esvaziar()
+        if resto:
+            yield resto
+        raise
+    for conteudo in leitor.finalizar():
+        agrupador.adicionar(conteudo)
+    resto = agrupador.esvaziar()
+    if resto:
+        yield resto
+
+async def ler_stream_async(pedacos, tamanho: int, intervalo: float):
+    leitor = LeitorSSE()
+    agrupador = Agrupador(tamanho, intervalo)
+    try:
+        async for pedaco in pedacos:
+            for saida in _saidas(leitor, agrupador, pedaco):
+                yield saida
+    except Exception:
+        resto = agrupador.esvaziar()
+        if resto:
+            yield resto
+        raise
+    for conteudo in leitor.finalizar():
+        agrupador.adicionar(conteudo)
+    resto = agrupador.esvaziar()
+    if resto:
+        yield resto
@@ -0,0 +1,82 @@
+# Servidor LLM local e determinístico, compatível com o SSE da OpenRouter (testes de carga, sem custo):
+#   python -m src.stub_llm --porta 8099 --primeiro-token 0.3 --intervalo 0.02
+#   LLM_PROVIDER=local LLM_STUB_URL=http://127.0.0.1:8099/v1/chat/completions uvicorn asgi:asgi_app
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+def partes_resposta(pergunta: str, quantidade: int) -> list:
+    # Mesma pergunta, mesma resposta: facilita comparar execuções
+    palavras = f"Resposta simulada do guia para: {pergunta}".split()
+    tamanho = max(1, -(-len(palavras) // quantidade))
+    return [" ".join(palavras[i:i + tamanho]) + " " for i in range(0, len(palavras), tamanho)]
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.pedidos += 1
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        pergunta = (corpo.get("messages") or [{}])[-1].get("content", "")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.server.primeiro_token)
+        eventos = [json.dumps({"choices": [{"delta": {"content": p}}]}, ensure_ascii=False)
+                   for p in partes_resposta(pergunta, self.server.partes)]
+        try:
+            for i, evento in enumerate(eventos + ["[DONE]"]):
+                if i:
+                    time.sleep(self.server.intervalo)
+                linha = f"data: {evento}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(linha):x}\r\n".encode() + linha + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def criar_servidor(host: str = "127.0.0.1", porta: int = 0, primeiro_token: float = 0.0, intervalo: float = 0.0,
+                   partes: int = 5, status: int = 200) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, porta), StubLLMHandler)
+    server.daemon_threads = True
+    server.primeiro_token = primeiro_token
+    server.intervalo = intervalo
+    server.partes = partes
+    server.status = status
+    server.pedidos = 0
+    server.lock = threading.Lock()
+    return server
+
+def iniciar_em_thread(**kwargs) -> ThreadingHTTPServer:
+    server = criar_servidor(**kwargs)
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM stub com SSE no formato da OpenRouter")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--primeiro-token", type=float, default=0.3, help="segundos até o primeiro chunk")
+    parser.add_argument("--intervalo", type=float, default=0.02, help="segundos entre chunks")
+    parser.add_argument("--partes", type=int, default=5)
+    parser.add_argument("--status", type=int, default=200, help="responde com este status (ex.: 503 para testar o disjuntor)")
+    args = parser.parse_args()
+    server = criar_servidor(args.host, args.porta, args.primeiro_token, args.intervalo, args.partes, args.status)
+    print(f"LLM stub em http://{args.host}:{server.server_port}/v1/chat/completions")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
+import codecs
 import json
-import re
 import unicodedata
+from functools import lru_cache
 
 def load_prompt_data(file_path: str) -> dict:
     try:
@@ -11,9 +12,26 @@ def load_prompt_data(file_path: str) -> dict:
         print(f"[Erro] Ocorreu um erro ao ler o {file_path}: {e}")
         return None
 
+def _ascii_nfkd(text: str) -> str:
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
+
+# NFKD + descarte do que não é ASCII funciona caractere a caractere, então o resultado
+# de Latin-1/Latin Extended (acentos do português) e dos acentos combinantes é pré-calculado.
+_TABELA_ACENTOS = {chr(codigo): _ascii_nfkd(chr(codigo)) for codigo in range(0x80, 0x370)}
+
+def _trocar_acentos(erro: UnicodeEncodeError):
+    trecho = erro.object[erro.start:erro.end]
+    return "".join([_TABELA_ACENTOS[c] if c in _TABELA_ACENTOS else _ascii_nfkd(c) for c in trecho]), erro.end
+
+codecs.register_error("guia_ascii", _trocar_acentos)
+
+# Equivalente em bytes ASCII do re.sub(r'[^\w\s]', ' ', ...)
+_TABELA_PONTUACAO = bytes(
+    b if chr(b).isalnum() or chr(b) == "_" or chr(b).isspace() else ord(" ") for b in range(128)
+) + bytes(range(128, 256))
+
+@lru_cache(maxsize=4096)
 def normalize_text(text: str) -> str:
     if not text: return ""
-    text = text.lower()
-    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
-    text = re.sub(r'[^\w\s]', ' ', text)
-    return text.strip()
\ No newline at end of file
+    text = text.lower().encode('ascii', 'guia_ascii').translate(_TABELA_PONTUACAO).decode('ascii')
+    return text.strip()
@@ -1,6 +1,162 @@
+// Trocar a versão invalida os caches antigos no próximo "activate"
+const VERSAO = 'v2';
+const CACHE_ESTATICO = `guia-estatico-${VERSAO}`;
+const CACHE_DADOS = `guia-dados-${VERSAO}`;
+const URL_CONHECIMENTO = '/conhecimento';
+const ARQUIVOS_ESTATICOS = ['/', '/static/style.css', '/static/favicon.webp', '/static/manifest.json'];
+
 self.addEventListener('install', (e) => {
   console.log('[Service Worker] Install');
+  e.waitUntil(Promise.all([
+    caches.open(CACHE_ESTATICO).then((cache) => cache.addAll(ARQUIVOS_ESTATICOS)),
+    caches.open(CACHE_DADOS).then((cache) => cache.add(URL_CONHECIMENTO)).catch(() => null)
+  ]).then(() => self.skipWaiting()));
 });
+
+self.addEventListener('activate', (e) => {
+  e.waitUntil(
+    caches.keys()
+      .then((nomes) => Promise.all(nomes
+        .filter((nome) => nome !== CACHE_ESTATICO && nome !== CACHE_DADOS)
+        .map((nome) => caches.delete(nome))))
+      .then(() => self.clients.claim())
+  );
+});
+
+// Mesmo resultado do normalize_text do servidor (src/utils.py)
+function normalizar(texto) {
+  return (texto || '')
+    .toLowerCase()
+    .normalize('NFKD')
+    .replace(/[^\x00-\x7F]/g, '')
+    .replace(/[^\w\s]/g, ' ')
+    .trim();
+}
+
+let conhecimentoMemoria = null;
+
+async function carregarConhecimento() {
+  if (conhecimentoMemoria) return conhecimentoMemoria;
+  const cache = await caches.open(CACHE_DADOS);
+  let resposta = await cache.match(URL_CONHECIMENTO);
+  if (!resposta) {
+    try {
+      resposta = await fetch(URL_CONHECIMENTO);
+      if (resposta.ok) await cache.put(URL_CONHECIMENTO, resposta.clone());
+    } catch (err) {
+      return null;
+    }
+  }
+  conhecimentoMemoria = await resposta.json();
+  return conhecimentoMemoria;
+}
+
+function rotear(texto, conhecimento) {
+  const r = conhecimento.roteamento;
+  const palavras = texto.split(/\s+/).filter(Boolean);
+  if (palavras.some((p) => r.saudacoes_palavras.includes(p)) || r.saudacoes_frases.some((f) => texto.includes(f))) {
+    return { tipo: 'saudacao' };
+  }
+  if (r.identidade.some((k) => texto.includes(k))) return { tipo: 'identidade' };
+  if (r.historia.some((k) => texto.includes(k))) return { tipo: 'historia' };
+
+  const termos = palavras.filter((p) => !r.stop_words.includes(p) && p.length > 1);
+  const queryFinal = termos.length ? termos.join(' ') : texto;
+  for (const [categoria, gatilhos] of Object.entries(r.gatilhos_gerais)) {
+    if (gatilhos.includes(queryFinal)) return { tipo: 'geral', categoria };
+  }
+  return null;
+}
+
+function respostaJson(conteudo) {
+  return new Response(JSON.stringify(conteudo), { headers: { 'Content-Type': 'application/json' } });
+}
+
+function respostaStream(localNome, texto) {
+  const corpo = JSON.stringify({ mapa_link: null, local_nome: localNome }) + '\n' + texto;
+  return new Response(corpo, { headers: { 'Content-Type': 'text/plain; charset=utf-8' } });
+}
+
+function respostaOffline(rota, conhecimento) {
+  if (rota.tipo === 'historia') {
+    const linhas = Object.values(conhecimento.historia || {}).map((t) => `- ${t}`);
+    return respostaStream('História', `**História de Axixá** (modo offline)\n\n${linhas.join('\n')}`);
+  }
+  const itens = (conhecimento.categorias[rota.categoria] || []).slice(0, 4);
+  const linhas = itens.map((i) => `- **${i.nome}**${i.local ? ` — ${i.local}` : ''}`);
+  return respostaStream(`Geral: ${rota.categoria}`, `Sem conexão agora, mas aqui vão algumas opções:\n\n${linhas.join('\n')}`);
+}
+
+async function responderChat(request) {
+  const copia = request.clone();
+  let rota = null;
+  let conhecimento = null;
+  try {
+    const corpo = await request.clone().json();
+    conhecimento = await carregarConhecimento();
+    if (conhecimento) rota = rotear(normalizar(corpo.pergunta), conhecimento);
+  } catch (err) {
+    rota = null;
+  }
+
+  // Saudação e créditos não dependem do LLM: respondidos no aparelho
+  if (rota && rota.tipo === 'saudacao') {
+    return respostaJson({ resposta: conhecimento.respostas.saudacao, mapa_link: null, local_nome: 'Saudação' });
+  }
+  if (rota && rota.tipo === 'identidade') {
+    return respostaJson({ resposta: conhecimento.respostas.creditos, mapa_link: null, local_nome: 'Créditos' });
+  }
+
+  try {
+    return await fetch(copia);
+  } catch (err) {
+    // História e listas gerais têm resposta pronta a partir do snapshot quando a rede cai
+    if (rota) return respostaOffline(rota, conhecimento);
+    throw err;
+  }
+}
+
+async function cachePrimeiro(request) {
+  const cache = await caches.open(CACHE_ESTATICO);
+  const emCache = await cache.match(request);
+  const daRede = fetch(request).then((resposta) => {
+    if (resposta.ok) cache.put(request, resposta.clone());
+    return resposta;
+  });
+  if (emCache) {
+    daRede.catch(() => null);
+    return emCache;
+  }
+  return daRede;
+}
+
+async function conhecimentoAtualizado(request) {
+  const cache = await caches.open(CACHE_DADOS);
+  try {
+    const resposta = await fetch(request);
+    if (resposta.ok) {
+      await cache.put(URL_CONHECIMENTO, resposta.clone());
+      conhecimentoMemoria = null;
+    }
+    return resposta;
+  } catch (err) {
+    const emCache = await cache.match(URL_CONHECIMENTO);
+    if (emCache) return emCache;
+    throw err;
+  }
+}
+
 self.addEventListener('fetch', (e) => {
-  e.respondWith(fetch(e.request));
-});
\ No newline at end of file
+  const url = new URL(e.request.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (e.request.method === 'POST' && url.pathname === '/chat') {
+    e.respondWith(responderChat(e.request));
+  } else if (e.request.method !== 'GET') {
+    return;
+  } else if (url.pathname === URL_CONHECIMENTO) {
+    e.respondWith(conhecimentoAtualizado(e.request));
+  } else if (url.pathname === '/' || url.pathname.startsWith('/static/')) {
+    e.respondWith(cachePrimeiro(e.request));
+  }
+});
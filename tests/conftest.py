@@ -1,6 +1,11 @@
+import os
 import json
 import pytest
 import requests
+
+# Os testes não devem escrever no data/usage_logs.csv versionado
+os.environ.setdefault("LOG_FILE", "")
+
 import app as appmod
 import src.llm as llm
 
@@ -44,6 +49,13 @@ def block_external_and_mock_llm(monkeypatch):
         raise RuntimeError("Chamadas HTTP externas estão bloqueadas durante os testes. Use mocks.")
 
     monkeypatch.setattr(requests, "post", _blocked_requests_post)
+    monkeypatch.setattr(llm.http_session, "post", _blocked_requests_post)
+
+    # Evita que respostas em cache de um teste vazem para o próximo
+    appmod.cache_respostas.clear()
+    appmod.cache_busca.clear()
+    for provedor in llm.provedores:
+        provedor.disjuntor.sucesso()
 
     # Permite que o resto dos testes sejam executados
     yield
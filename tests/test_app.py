@@ -6,7 +6,10 @@ from unittest.mock import patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import app as appmod
 from app import app, limiter
+from src.cache_respostas import CacheLRU
+from src.reloader import carregar_base
 
 @pytest.fixture
 def client():
@@ -152,4 +155,193 @@ def test_negativos(client):
 def test_busca_geral_categorias(client, pergunta):
     data = post_pergunta(client, pergunta)
     assert "Geral:" in str(data['local_nome'])
-    assert "povoados" in data['resposta'].lower()
\ No newline at end of file
+    assert "povoados" in data['resposta'].lower()
+
+def test_cache_de_respostas(client):
+    primeira = client.post('/chat', json={'pergunta': 'A prefeitura abre sábado?'}).data
+    segunda = client.post('/chat', json={'pergunta': 'a PREFEITURA abre  sabado'}).data
+    assert primeira.split(b'\n', 1)[1] == segunda.split(b'\n', 1)[1]
+    assert json.loads(segunda.split(b'\n', 1)[0])['origem'] == "cache"
+    assert appmod.conversar_com_chat.call_count == 1
+
+    # Na mesma sessão a resposta depende da conversa: vai para a IA
+    sessao = json.loads(primeira.split(b'\n', 1)[0])['sessao']
+    client.post('/chat', json={'pergunta': 'A prefeitura abre sábado?', 'sessao': sessao}).data
+    assert appmod.conversar_com_chat.call_count == 2
+
+def test_cache_compartilhado_entre_parafrases(client):
+    for pergunta in ["A prefeitura abre sábado?", "sábado a prefeitura abre?", "Prefeitura abre nos sábados"]:
+        client.post('/chat', json={'pergunta': pergunta}).data
+    assert appmod.conversar_com_chat.call_count == 1
+    assert appmod.estatisticas_cache()["hits"] >= 2
+
+    # Mesmos termos, mas outro item resolvido: outra chave
+    client.post('/chat', json={'pergunta': 'A Eli Lojas abre sábado?'}).data
+    assert appmod.conversar_com_chat.call_count == 2
+
+def test_cache_lru_com_ttl():
+    lru = CacheLRU(2, 60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None and lru.get("a") == 1 and lru.expulsos == 1
+
+    expirado = CacheLRU(2, -1)
+    expirado.set("a", 1)
+    assert expirado.get("a") is None
+
+def test_resposta_template_sem_ia(client):
+    antes = appmod.caminhos["template"]
+    data = post_pergunta(client, "Onde fica o IEMA?")
+    assert "IEMA" in data['local_nome']
+    assert data['resposta'].startswith("**IEMA")
+    assert "Endereço" in data['resposta']
+    assert appmod.conversar_com_chat.call_count == 0
+    assert appmod.caminhos["template"] == antes + 1
+
+    cabecalho = json.loads(client.post('/chat', json={'pergunta': 'Onde fica o IEMA?'}).data.decode('utf-8').split('\n')[0])
+    assert cabecalho['origem'] == "template"
+
+    # Pergunta que vai além do item continua na IA; a consulta direta usa o template
+    # mesmo no meio de uma conversa
+    vagas = post_pergunta(client, "O IEMA tem vagas abertas?")
+    assert vagas['resposta'] == "Resposta simulada da IA."
+    cabecalho = json.loads(client.post('/chat', json={'pergunta': 'Onde fica o IEMA?', 'sessao': vagas['sessao']}).data.decode('utf-8').split('\n')[0])
+    assert cabecalho['origem'] == "template"
+    assert appmod.conversar_com_chat.call_count == 1
+
+def test_metricas(client):
+    post_pergunta(client, "A prefeitura abre sábado?")
+    post_pergunta(client, "A prefeitura abre sábado?")
+    texto = client.get('/metrics').data.decode('utf-8')
+    assert 'guia_etapa_segundos_bucket{etapa="normalizar",le="+Inf"}' in texto
+    assert 'guia_etapa_segundos_count{etapa="primeiro_token"}' in texto
+    assert 'guia_cache_consultas_total{resultado="hit"}' in texto
+    assert 'guia_respostas_total{caminho="llm"}' in texto
+
+    limiter.enabled = True
+    limiter.reset()
+    antes = appmod.metricas.limite_excedido[""]
+    status = [client.post('/chat', json={'pergunta': 'oi'}).status_code for _ in range(11)]
+    limiter.enabled = False
+    limiter.reset()
+    assert status[-1] == 429
+    assert appmod.metricas.limite_excedido[""] == antes + 1
+
+def test_etapas_da_ia_so_no_caminho_llm(client):
+    def contagem(etapa):
+        serie = appmod.metricas.etapas.series.get(etapa)
+        return (serie[2], serie[1]) if serie else (0, 0.0)
+
+    antes = {etapa: contagem(etapa) for etapa in ("primeiro_token", "stream")}
+    post_pergunta(client, "Onde fica o IEMA?")
+    post_pergunta(client, "A prefeitura abre sábado?")
+    post_pergunta(client, "A prefeitura abre sábado?")
+    depois = {etapa: contagem(etapa) for etapa in ("primeiro_token", "stream")}
+    # Template e cache não contam; stream vai do início do stream, então cobre o primeiro token
+    assert depois["primeiro_token"][0] == antes["primeiro_token"][0] + 1
+    assert depois["stream"][0] == antes["stream"][0] + 1
+    assert depois["stream"][1] - antes["stream"][1] >= depois["primeiro_token"][1] - antes["primeiro_token"][1]
+
+def test_reserva_quando_a_ia_falha(client):
+    def fora_do_ar(pergunta, system, item_data, hist):
+        yield "[Erro IA: 503 Service Unavailable]"
+
+    appmod.conversar_com_chat.side_effect = fora_do_ar
+    data = post_pergunta(client, "A Josy Boutique abre domingo?")
+    assert data['resposta'].startswith("**Josy Boutique**")
+    geral = post_pergunta(client, "Quero ver lojas")
+    assert "- **" in geral['resposta']
+    # Resposta de reserva não vai para o cache: a próxima tenta a IA de novo
+    post_pergunta(client, "A Josy Boutique abre domingo?")
+    assert appmod.conversar_com_chat.call_count == 3
+
+    # Prazo esgotado antes do primeiro token também cai no template
+    def sem_tempo(pergunta, system, item_data, hist):
+        yield appmod.AVISO_PRAZO
+
+    appmod.conversar_com_chat.side_effect = sem_tempo
+    assert post_pergunta(client, "A Josy Boutique abre domingo?")['resposta'].startswith("**Josy Boutique**")
+
+def test_snapshot_conhecimento(client):
+    response = client.get('/conhecimento')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['respostas']['saudacao'].startswith("Olá! Sou o Guia Digital")
+    assert "escolas" in data['categorias'] and data['categorias']['escolas'][0]['nome']
+    assert response.headers['ETag'] == f'"{data["versao"]}"'
+
+    nao_modificado = client.get('/conhecimento', headers={'If-None-Match': response.headers['ETag']})
+    assert nao_modificado.status_code == 304
+
+    sw = client.get('/sw.js')
+    assert sw.status_code == 200
+    assert sw.headers['Service-Worker-Allowed'] == '/'
+
+def test_perto_de_mim_com_localizacao(client, tmp_path):
+
+    with open(appmod.PROMPT_FILE, encoding='utf-8-sig') as f:
+        data = json.load(f)
+    # prompt.json não traz coordenadas: duas escolas ganham lat/lon só neste teste
+    data['escolas'][0].update(lat=-2.8390, lon=-44.0620)
+    data['escolas'][1].update(latitude=-2.8600, longitude=-44.0800)
+    caminho = tmp_path / "prompt.json"
+    caminho.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    original = appmod.base
+    appmod.trocar_base(carregar_base(str(caminho)))
+    try:
+        response = client.post('/chat', json={'pergunta': 'Qual a escola mais próxima de mim?', 'localizacao': {'lat': -2.8580, 'lon': -44.0790}})
+        cabecalho = json.loads(response.data.decode('utf-8').split('\n')[0])
+        assert cabecalho['local_nome'] == "Perto de você"
+        assert "-2.860000,-44.080000" in cabecalho['mapa_link']
+        item_data = json.loads(appmod.conversar_com_chat.call_args[0][2])
+        assert [i['nome'] for i in item_data['items']] == [data['escolas'][1]['nome'], data['escolas'][0]['nome']]
+        assert item_data['items'][0]['distancia_km'] < item_data['items'][1]['distancia_km']
+
+        # Localização inválida ou ausente: segue a busca textual de sempre
+        for localizacao in (None, {'lat': 'x', 'lon': 1}, {'lat': 200, 'lon': 0}):
+            response = client.post('/chat', json={'pergunta': 'Qual a escola mais próxima de mim?', 'localizacao': localizacao})
+            assert json.loads(response.data.decode('utf-8').split('\n')[0])['local_nome'] != "Perto de você"
+    finally:
+        appmod.trocar_base(original)
+
+def test_search_top_k(client):
+    response = client.get('/search?q=Onde fica a Josy Boutique?')
+    assert response.status_code == 200
+    data = response.get_json()
+    primeiro = data['resultados'][0]
+    assert primeiro['nome'] == "Josy Boutique" and primeiro['categoria'] == "lojas"
+    assert primeiro['motivos'] == {"fuzzy": 100.0, "bonus_nome": 15, "bonus_categoria": 0}
+    assert primeiro['score'] == 115.0 and primeiro['mapa_link'].startswith("https://www.google.com/maps/")
+    assert not any(k.startswith("_") for k in primeiro['item'])
+    assert response.headers['Cache-Control'] == "public, max-age=60"
+    assert appmod.conversar_com_chat.call_count == 0
+
+def test_search_paginacao_e_filtro(client):
+    with patch('app.ranquear', wraps=appmod.ranquear) as ranquear:
+        paginas = [client.get(f'/search?q=escolas&limite=5&pagina={p}').get_json() for p in (1, 2, 3)]
+        # As páginas saem do mesmo ranking em cache
+        assert ranquear.call_count == 1
+    total = paginas[0]['total']
+    assert total > 10 and paginas[0]['paginas'] == -(-total // 5)
+    nomes = [r['nome'] for p in paginas for r in p['resultados']]
+    assert len(nomes) == 15 and len(set(nomes)) == 15
+    scores = [r['score'] for p in paginas for r in p['resultados']]
+    assert scores == sorted(scores, reverse=True)
+
+    filtrado = client.get('/search?q=igreja&categoria=igrejas').get_json()
+    assert filtrado['resultados'] and {r['categoria'] for r in filtrado['resultados']} == {"igrejas"}
+    assert client.get('/search?q=igreja&categoria=igrejas,bares').status_code == 400
+    assert client.get('/search?q=').status_code == 400
+    assert client.get('/search?q=escolas&limite=999').get_json()['limite'] == appmod.SEARCH_MAX_LIMIT
+    assert client.get('/search?q=xyzwq kkkk').get_json()['total'] == 0
+
+def test_search_tem_limite_proprio(client):
+    limiter.enabled = True
+    limiter.reset()
+    status = [client.get('/search?q=escolas').status_code for _ in range(15)]
+    limiter.enabled = False
+    limiter.reset()
+    # O /chat barra na 11ª pergunta por minuto; o /search aguenta mais
+    assert set(status) == {200}
@@ -0,0 +1,124 @@
+import sys
+import os
+import json
+import threading
+import time
+import asyncio
+import httpx
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asgi
+from app import limiter
+from tests.test_cenarios_100 import CENARIOS
+
+
+async def _fake_conversar_async(pergunta, system_prompt, item_data_json=None, historico=None):
+    await asyncio.sleep(0.05)
+    if item_data_json and "povoados" in str(item_data_json):
+        yield "A cidade é cheia de povoados. "
+    yield "Resposta simulada da IA."
+
+
+@pytest.fixture(autouse=True)
+def mock_llm_async(monkeypatch):
+    monkeypatch.setattr(asgi, "conversar_com_chat_async", _fake_conversar_async)
+    limiter.enabled = False
+    yield
+    limiter.enabled = True
+
+
+async def _postar(client, pergunta):
+    response = await client.post("/chat", json={"pergunta": pergunta})
+    if response.headers["content-type"].startswith("application/json"):
+        return response.status_code, response.json()
+    linhas = response.text.split("\n")
+    data = json.loads(linhas[0])
+    data["resposta"] = "".join(linhas[1:])
+    return response.status_code, data
+
+
+def _rodar(perguntas):
+    async def principal():
+        transport = httpx.ASGITransport(app=asgi.asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://guia") as client:
+            return await asyncio.gather(*[_postar(client, p) for p in perguntas])
+    return asyncio.run(principal())
+
+
+def test_mesmo_contrato_do_flask():
+    from app import app
+    perguntas = [p for p, _ in CENARIOS if p]
+    with app.test_client() as client:
+        esperados = [json.loads(client.post('/chat', json={'pergunta': p}).data.decode('utf-8').split('\n')[0]) for p in perguntas]
+
+    for esperado, (status, data) in zip(esperados, _rodar(perguntas)):
+        assert status == 200
+        assert data["local_nome"] == esperado["local_nome"]
+        assert data["mapa_link"] == esperado["mapa_link"]
+
+
+def test_saudacao_e_erros():
+    (_, saudacao), (status_vazio, vazio), (status_longo, _) = _rodar(["Olá", "", "x" * 501])
+    assert saudacao["local_nome"] == "Saudação"
+    assert "Sou o Guia Digital" in saudacao["resposta"]
+    assert status_vazio == 400 and vazio == {"erro": "Pergunta vazia"}
+    assert status_longo == 400
+
+
+def test_limite_aplicado_fora_do_event_loop(monkeypatch):
+    threads = []
+    original = limiter.limiter.hit
+    monkeypatch.setattr(limiter.limiter, "hit", lambda *a, **k: threads.append(threading.current_thread()) or original(*a, **k))
+    limiter.enabled = True
+    limiter.reset()
+    try:
+        status = [_rodar(["Onde fica o IEMA?"])[0][0] for _ in range(11)]
+    finally:
+        limiter.enabled = False
+        limiter.reset()
+    assert status == [200] * 10 + [429]
+    assert len(threads) == 11 and threading.main_thread() not in threads
+
+
+def test_streams_concorrentes_nao_bloqueiam():
+    inicio = time.perf_counter()
+    respostas = _rodar([f"A Eli Lojas abre domingo? {i}" for i in range(300)])
+    assert all(data["resposta"] == "Resposta simulada da IA." for _, data in respostas)
+    # 300 streams de 50ms em série levariam 15s
+    assert time.perf_counter() - inicio < 5
+
+
+def test_perguntas_identicas_compartilham_upstream(monkeypatch):
+    chamadas = []
+
+    async def contar(pergunta, system_prompt, item_data_json=None, historico=None):
+        chamadas.append(pergunta)
+        await asyncio.sleep(0.1)
+        yield "Resposta simulada da IA."
+
+    monkeypatch.setattr(asgi, "conversar_com_chat_async", contar)
+    respostas = _rodar(["Quando é a festa da cidade?"] * 30)
+    assert all(data["resposta"] == "Resposta simulada da IA." for _, data in respostas)
+    assert len(chamadas) == 1
+
+
+def test_sessao_no_servidor(monkeypatch):
+    historicos = []
+
+    async def registrar(pergunta, system_prompt, item_data_json=None, historico=None):
+        historicos.append(historico)
+        yield "Resposta simulada da IA."
+
+    monkeypatch.setattr(asgi, "conversar_com_chat_async", registrar)
+
+    async def principal():
+        transport = httpx.ASGITransport(app=asgi.asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://guia") as client:
+            primeira = await client.post("/chat", json={"pergunta": "Quando é a festa da cidade?"})
+            sessao = json.loads(primeira.text.split("\n")[0])["sessao"]
+            await client.post("/chat", json={"pergunta": "E onde fica?", "sessao": sessao})
+    asyncio.run(principal())
+    assert historicos[0] == []
+    assert [m["role"] for m in historicos[1]] == ["user", "assistant"]
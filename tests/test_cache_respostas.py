@@ -0,0 +1,49 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cache_respostas import CacheRedis
+from src.conexao_redis import obter_redis
+from src.config import REDIS_TIMEOUT
+
+
+class RedisFalso:
+    def __init__(self):
+        self.dados = {}
+
+    def get(self, chave):
+        return self.dados.get(chave)
+
+    def set(self, chave, valor, ex=None):
+        self.dados[chave] = valor
+        return True
+
+    def scan_iter(self, match):
+        return [c for c in self.dados if c.startswith(match.rstrip("*"))]
+
+    def delete(self, *chaves):
+        for chave in chaves:
+            self.dados.pop(chave, None)
+
+
+def test_cache_redis_preguicoso():
+    cache = CacheRedis("redis://127.0.0.1:1/0", 60)
+    assert cache._cliente is None
+    cache._cliente = RedisFalso()
+    assert cache.get("resposta:x") is None
+    cache.set("resposta:x", "Olá, Axixá")
+    assert cache.get("resposta:x") == "Olá, Axixá"
+    cache._cliente.dados["guia:resposta:y"] = b"!\x80\x04\x95"
+    assert cache.get("resposta:y") is None
+    cache.clear()
+    assert cache._cliente.dados == {}
+
+
+def test_cliente_redis_compartilhado_com_timeout():
+    cliente = obter_redis("redis://127.0.0.1:1/0")
+    assert obter_redis("redis://127.0.0.1:1/0") is cliente
+    opcoes = cliente.connection_pool.connection_kwargs
+    assert opcoes["socket_timeout"] == opcoes["socket_connect_timeout"] == REDIS_TIMEOUT
+    # Porta fechada: falha rápido e vira miss em vez de travar
+    assert CacheRedis("redis://127.0.0.1:1/0", 60).get("resposta:x") is None
@@ -0,0 +1,89 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.coalescencia import CoalescedorStreams, CoalescedorStreamsAsync
+
+
+def test_threads_compartilham_um_stream():
+    chamadas = []
+    liberar = threading.Event()
+
+    def upstream():
+        chamadas.append(1)
+        yield "Olá, "
+        liberar.wait(5)
+        yield "Axixá!"
+
+    coalescedor = CoalescedorStreams()
+    resultados = []
+
+    def cliente():
+        resultados.append("".join(coalescedor.transmitir("k", upstream)))
+
+    threads = [threading.Thread(target=cliente) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    # Chegou depois do primeiro chunk: recebe o prefixo e continua no mesmo stream
+    atrasado = coalescedor.transmitir("k", upstream)
+    assert next(atrasado) == "Olá, "
+    liberar.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(chamadas) == 1
+    assert resultados == ["Olá, Axixá!"] * 5
+    assert "".join(atrasado) == "Axixá!"
+    assert coalescedor.voos == {}
+
+
+def test_sem_chave_nao_coalesce():
+    coalescedor = CoalescedorStreams()
+    chamadas = []
+
+    def upstream():
+        chamadas.append(1)
+        yield "x"
+
+    assert list(coalescedor.transmitir(None, upstream)) == ["x"]
+    assert list(coalescedor.transmitir(None, upstream)) == ["x"]
+    assert len(chamadas) == 2
+
+
+def test_async_fan_out_e_cancelamento():
+    chamadas = []
+    fechados = []
+
+    async def upstream():
+        chamadas.append(1)
+        try:
+            for parte in ["A ", "B ", "C"]:
+                await asyncio.sleep(0.02)
+                yield parte
+        finally:
+            fechados.append(1)
+
+    async def principal():
+        coalescedor = CoalescedorStreamsAsync()
+
+        async def cliente():
+            return "".join([p async for p in coalescedor.transmitir("k", upstream)])
+
+        textos = await asyncio.gather(*[cliente() for _ in range(20)])
+        assert textos == ["A B C"] * 20
+        assert len(chamadas) == 1
+
+        # Único cliente desiste no meio: o upstream é cancelado
+        stream = coalescedor.transmitir("k2", upstream)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        assert len(fechados) == 2
+        assert coalescedor.voos == {}
+
+    asyncio.run(principal())
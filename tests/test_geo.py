@@ -0,0 +1,89 @@
+import sys
+import os
+import random
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.geo import IndiceEspacial, coordenadas_do_item, haversine_km
+from src.router import rotear
+
+# Centro aproximado de Axixá
+CENTRO = (-2.8389, -44.0622)
+CATEGORIAS = ("escolas", "igrejas", "pousadas_dormitorios")
+
+
+def pontos_sinteticos(n, espalhamento=0.08, seed=7):
+    rng = random.Random(seed)
+    return [
+        (CENTRO[0] + rng.uniform(-espalhamento, espalhamento), CENTRO[1] + rng.uniform(-espalhamento, espalhamento),
+         CATEGORIAS[i % len(CATEGORIAS)], i, {"nome": f"Lugar {i}"})
+        for i in range(n)
+    ]
+
+
+def forca_bruta(pontos, lat, lon, k, categorias=None, raio_km=None):
+    distancias = sorted(
+        (haversine_km(lat, lon, plat, plon), categoria, posicao)
+        for plat, plon, categoria, posicao, _ in pontos
+        if (not categorias or categoria in categorias)
+    )
+    return [(c, p) for d, c, p in distancias if raio_km is None or d <= raio_km][:k]
+
+
+def montar(pontos):
+    espacial = IndiceEspacial()
+    for ponto in pontos:
+        espacial.adicionar(*ponto)
+    return espacial
+
+
+def test_haversine():
+    assert haversine_km(*CENTRO, *CENTRO) == 0
+    # São Luís fica a uns 40 km de Axixá em linha reta
+    assert 30 < haversine_km(*CENTRO, -2.5307, -44.3068) < 50
+
+
+@pytest.mark.parametrize("k,categorias,raio_km", [
+    (1, None, None), (3, None, None), (5, {"igrejas"}, None), (10, None, 2.0), (4, {"escolas", "pousadas_dormitorios"}, 5.0)
+])
+def test_grade_igual_a_forca_bruta(k, categorias, raio_km):
+    pontos = pontos_sinteticos(400)
+    espacial = montar(pontos)
+    rng = random.Random(11)
+    for _ in range(50):
+        lat, lon = CENTRO[0] + rng.uniform(-0.1, 0.1), CENTRO[1] + rng.uniform(-0.1, 0.1)
+        obtidos = [(p.categoria, p.posicao) for p in espacial.proximos(lat, lon, k, categorias, raio_km)]
+        assert obtidos == forca_bruta(pontos, lat, lon, k, categorias, raio_km)
+
+
+def test_ponto_longe_da_cidade():
+    pontos = pontos_sinteticos(50)
+    espacial = montar(pontos)
+    # Brasília: cai no caminho que percorre todos os pontos em vez dos anéis
+    obtidos = [(p.categoria, p.posicao) for p in espacial.proximos(-15.79, -47.88, 3)]
+    assert obtidos == forca_bruta(pontos, -15.79, -47.88, 3)
+    assert espacial.proximos(-15.79, -47.88, 3, raio_km=15) == []
+
+
+def test_indice_vazio():
+    assert IndiceEspacial().proximos(*CENTRO, 3) == []
+
+
+def test_coordenadas_do_item():
+    assert coordenadas_do_item({"lat": -2.8, "lon": -44.0}) == (-2.8, -44.0)
+    assert coordenadas_do_item({"latitude": "-2.8", "longitude": "-44.0"}) == (-2.8, -44.0)
+    assert coordenadas_do_item({"nome": "Sem mapa"}) is None
+    assert coordenadas_do_item({"lat": 95, "lon": 0}) is None
+    assert coordenadas_do_item({"lat": "abc", "lon": "1"}) is None
+
+
+@pytest.mark.parametrize("texto,perto", [
+    ("qual a escola mais proxima", True),
+    ("tem pousada perto de mim", True),
+    ("igreja aqui perto", True),
+    ("farmacia perto", False),
+    ("onde fica a escola", False),
+])
+def test_rota_perto_de_mim(texto, perto):
+    assert rotear(texto).perto_de_mim is perto
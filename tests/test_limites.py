@@ -0,0 +1,183 @@
+import sys
+import os
+import json
+import subprocess
+import time
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as appmod
+from src.limites import ArmazenamentoHibrido, ArmazenamentoRedisPreguicoso
+
+LIMITE = parse("10 per minute")
+
+
+class PipelineFalso:
+    def __init__(self, redis):
+        self.redis = redis
+        self.comandos = []
+
+    def set(self, chave, valor, ex=None, nx=False):
+        self.comandos.append(("set", chave, valor, ex, nx))
+
+    def incrby(self, chave, quantidade):
+        self.comandos.append(("incrby", chave, quantidade))
+
+    def pttl(self, chave):
+        self.comandos.append(("pttl", chave))
+
+    def execute(self):
+        if self.redis.fora:
+            raise ConnectionError("Redis fora do ar")
+        self.redis.viagens += 1
+        respostas = []
+        for comando in self.comandos:
+            nome, chave = comando[0], comando[1]
+            if nome == "set":
+                if chave not in self.redis.dados:
+                    self.redis.dados[chave] = [comando[2], time.time() + comando[3]]
+                respostas.append(True)
+            elif nome == "incrby":
+                self.redis.dados[chave][0] += comando[2]
+                respostas.append(self.redis.dados[chave][0])
+            else:
+                respostas.append(int((self.redis.dados[chave][1] - time.time()) * 1000))
+        return respostas
+
+
+class RedisFalso:
+    def __init__(self):
+        self.dados = {}
+        self.viagens = 0
+        self.fora = False
+
+    def pipeline(self, transaction=True):
+        return PipelineFalso(self)
+
+    def delete(self, *chaves):
+        for chave in chaves:
+            self.dados.pop(chave, None)
+
+    def scan_iter(self, match):
+        return [c for c in self.dados if c.startswith(match.rstrip("*"))]
+
+    def ping(self):
+        return True
+
+
+def hibrido(redis, max_pendente=3):
+    # intervalo 0: sem thread; a sincronização em lote é chamada à mão
+    armazenamento = ArmazenamentoHibrido("guia+hibrido+redis://127.0.0.1:1/0", intervalo=0, max_pendente=max_pendente)
+    armazenamento._cliente = redis
+    return armazenamento
+
+
+def test_armazenamento_limiter_preguicoso():
+    armazenamento = ArmazenamentoRedisPreguicoso("guia+redis://127.0.0.1:1/0")
+    assert armazenamento.uri == "redis://127.0.0.1:1/0"
+    assert armazenamento._real is None
+
+
+def test_esquema_registrado_e_sem_conexao_na_criacao():
+    armazenamento = storage_from_string("guia+hibrido+redis://127.0.0.1:1/0")
+    assert isinstance(armazenamento, ArmazenamentoHibrido)
+    assert armazenamento.uri == "redis://127.0.0.1:1/0" and armazenamento._cliente is None
+
+
+def test_decide_localmente_e_sincroniza_em_lote():
+    redis = RedisFalso()
+    armazenamento = hibrido(redis)
+    limitador = FixedWindowRateLimiter(armazenamento)
+    resultados = [limitador.hit(LIMITE, "cliente") for _ in range(11)]
+    assert resultados == [True] * 10 + [False]
+    # 1 viagem ao abrir a janela + 1 a cada 3 acertos pendentes, em vez de 11
+    assert redis.viagens <= 5
+    armazenamento.sincronizar()
+    assert list(redis.dados.values())[0][0] == 11
+    assert 55 < armazenamento.get_expiry(LIMITE.key_for("cliente")) - time.time() <= 60
+
+
+@pytest.mark.parametrize("max_pendente", [1, 3, 5])
+def test_erro_limitado_entre_instancias(max_pendente):
+    redis = RedisFalso()
+    instancias = [FixedWindowRateLimiter(hibrido(redis, max_pendente)) for _ in range(3)]
+    admitidos = 0
+    for rodada in range(20):
+        for limitador in instancias:
+            admitidos += limitador.hit(LIMITE, "cliente")
+        if rodada % 4 == 3:
+            for limitador in instancias:
+                limitador.storage.sincronizar()
+    assert 10 <= admitidos <= 10 + len(instancias) * (max_pendente - 1)
+
+
+def test_redis_fora_conta_localmente():
+    redis = RedisFalso()
+    redis.fora = True
+    armazenamento = hibrido(redis)
+    limitador = FixedWindowRateLimiter(armazenamento)
+    assert [limitador.hit(LIMITE, "cliente") for _ in range(11)] == [True] * 10 + [False]
+    # Após a primeira falha as requisições não tentam o Redis de novo até o próximo lote
+    assert armazenamento.falhas == 1
+
+    redis.fora = False
+    armazenamento.sincronizar()
+    assert list(redis.dados.values())[0][0] == 11
+    assert not limitador.hit(LIMITE, "cliente")
+
+
+def test_saudacao_isenta_do_limite(monkeypatch):
+    assert appmod.custo_pergunta({"pergunta": "Olá"}) == appmod.LIMITE_CUSTO_RAPIDO
+    assert appmod.custo_pergunta({"pergunta": "Onde fica o IEMA?"}) == appmod.LIMITE_CUSTO_NORMAL == 1
+    assert appmod.custo_pergunta(None) == 1
+
+    monkeypatch.setattr(appmod, "LIMITE_CUSTO_RAPIDO", 0)
+    appmod.limiter.enabled = True
+    appmod.limiter.reset()
+    try:
+        with appmod.app.test_client() as client:
+            saudacoes = [client.post('/chat', json={'pergunta': 'oi'}).status_code for _ in range(12)]
+            perguntas = [client.post('/chat', json={'pergunta': 'Onde fica o IEMA?'}).status_code for _ in range(11)]
+    finally:
+        appmod.limiter.enabled = False
+        appmod.limiter.reset()
+    assert set(saudacoes) == {200}
+    assert perguntas[:10] == [200] * 10 and perguntas[-1] == 429
+
+
+def test_custo_calculado_uma_vez_por_requisicao(monkeypatch):
+    chamadas = []
+    original = appmod.custo_pergunta
+    monkeypatch.setattr(appmod, "custo_pergunta", lambda data: chamadas.append(data) or original(data))
+    appmod.limiter.enabled = True
+    appmod.limiter.reset()
+    try:
+        with appmod.app.test_client() as client:
+            for _ in range(2):
+                assert client.post('/chat', json={'pergunta': 'oi'}).status_code == 200
+    finally:
+        appmod.limiter.enabled = False
+        appmod.limiter.reset()
+    assert len(chamadas) == 2
+
+
+def test_custo_normal_escala_o_limite():
+    # Pergunta normal custa 2 e saudação 1: o limite vira 20 por minuto, ainda 10 perguntas
+    raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    env = dict(os.environ, LIMITE_CUSTO_NORMAL="2", LIMITE_CUSTO_RAPIDO="1", REDIS_URL="", LOG_FILE="", KB_RELOAD_INTERVAL="0")
+    codigo = """
+import json, app
+from unittest.mock import patch
+with patch('app.conversar_com_chat', side_effect=lambda *a: iter(['ok'])), app.app.test_client() as client:
+    status = [client.post('/chat', json={'pergunta': p}).status_code for p in ['oi'] * 4 + ['Onde fica o IEMA?'] * 8 + ['oi']]
+print(json.dumps([app.LIMITE_CHAT, status]))
+"""
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=raiz, env=env, capture_output=True, text=True, timeout=60)
+    assert saida.returncode == 0, saida.stderr
+    limite, status = json.loads(saida.stdout.strip().splitlines()[-1])
+    assert limite == "20 per minute"
+    assert status == [200] * 12 + [429]
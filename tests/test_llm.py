@@ -0,0 +1,257 @@
+import sys
+import os
+import json
+import socket
+import threading
+import time
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.llm as llm
+from src.llm import conversar_com_chat
+
+PARTES = ["Olá", ", visitante", "! Bem-vindo a Axixá."]
+
+
+class StubSSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.pedidos.append(corpo)
+        self.server.portas.add(self.client_address[1])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        eventos = [json.dumps({"choices": [{"delta": {"content": p}}]}) for p in PARTES]
+        if self.server.infinito:
+            eventos = eventos * 1000
+        try:
+            for evento in eventos + ["[DONE]"]:
+                linha = f"data: {evento}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(linha):x}\r\n".encode() + linha + b"\r\n")
+                self.wfile.flush()
+                if self.server.infinito:
+                    time.sleep(0.01)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.desconectou.set()
+
+
+@pytest.fixture
+def stub_sse(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSSEHandler)
+    server.pedidos = []
+    server.portas = set()
+    server.infinito = False
+    server.desconectou = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(llm, "OPENROUTER_API_URL", f"http://127.0.0.1:{server.server_port}/api/v1/chat/completions")
+    monkeypatch.setattr(llm, "http_session", llm.criar_sessao_http(pool_size=2, backoff=0))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_do_stub(stub_sse):
+    resposta = "".join(conversar_com_chat("oi", "system", '{"nome": "IEMA"}', [{"role": "user", "content": "a"}] * 6))
+    assert resposta == "".join(PARTES)
+
+    mensagens = stub_sse.pedidos[0]["messages"]
+    assert len(mensagens) == 1 + 4 + 2
+    assert stub_sse.pedidos[0]["stream"] is True
+
+
+def test_sessao_reutiliza_conexao(stub_sse):
+    for _ in range(3):
+        assert "".join(conversar_com_chat("oi", "system")) == "".join(PARTES)
+    assert len(stub_sse.pedidos) == 3
+    assert len(stub_sse.portas) == 1
+
+
+def test_cancelamento_fecha_upstream(stub_sse):
+    stub_sse.infinito = True
+    stream = conversar_com_chat("oi", "system")
+    assert next(stream) == PARTES[0]
+    stream.close()
+    assert stub_sse.desconectou.wait(5)
+
+
+def test_falha_de_conexao_vira_mensagem(monkeypatch):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    monkeypatch.setattr(llm, "OPENROUTER_API_URL", f"http://127.0.0.1:{porta}/")
+    monkeypatch.setattr(llm, "http_session", llm.criar_sessao_http(retries=2, backoff=0))
+    resposta = "".join(conversar_com_chat("oi", "system"))
+    assert resposta.startswith("[Erro IA:")
+    assert "Max retries exceeded" in resposta
+
+
+def test_stream_async_do_stub(stub_sse):
+    import asyncio
+
+    async def coletar():
+        return [chunk async for chunk in llm.conversar_com_chat_async("oi", "system", '{"nome": "IEMA"}')]
+
+    assert "".join(asyncio.run(coletar())) == "".join(PARTES)
+    assert stub_sse.pedidos[0]["messages"][-1] == {"role": "user", "content": "oi"}
+
+
+def test_disjuntor_abre_e_fecha(monkeypatch):
+    disjuntor = llm.Disjuntor(falhas_max=2, espera=0.2)
+    disjuntor.falha()
+    assert disjuntor.permite()
+    disjuntor.falha()
+    assert disjuntor.estado() == "aberto" and not disjuntor.permite()
+    time.sleep(0.25)
+    # Meio-aberto: só uma tentativa passa até alguém registrar o resultado
+    assert disjuntor.permite()
+    assert not disjuntor.permite()
+    disjuntor.sucesso()
+    assert disjuntor.estado() == "fechado" and disjuntor.permite()
+
+
+def test_failover_para_o_segundo_provedor(monkeypatch):
+    from src import stub_llm
+    fora = stub_llm.iniciar_em_thread(status=503)
+    bom = stub_llm.iniciar_em_thread(partes=2)
+    try:
+        principal = llm.ProvedorLocal(f"http://127.0.0.1:{fora.server_port}/v1/chat/completions")
+        reserva = llm.ProvedorLocal(f"http://127.0.0.1:{bom.server_port}/v1/chat/completions")
+        principal.disjuntor = llm.Disjuntor(falhas_max=2, espera=60)
+        monkeypatch.setattr(llm, "provedores", [principal, reserva])
+        monkeypatch.setattr(llm, "http_session", llm.criar_sessao_http(pool_size=2, backoff=0))
+
+        for _ in range(3):
+            assert "".join(conversar_com_chat("oi", "system")) == "Resposta simulada do guia para: oi "
+        # Depois de 2 falhas o disjuntor abre e o principal deixa de ser chamado
+        assert fora.pedidos == 2
+        assert bom.pedidos == 3
+        assert principal.disjuntor.estado() == "aberto"
+    finally:
+        for server in (fora, bom):
+            server.shutdown()
+            server.server_close()
+
+
+def test_prazo_encerra_stream_com_aviso(monkeypatch):
+    from src import stub_llm
+    from src.constants import AVISO_PRAZO
+    lento = stub_llm.iniciar_em_thread(partes=20, intervalo=0.1)
+    try:
+        monkeypatch.setattr(llm, "provedores", [llm.ProvedorLocal(f"http://127.0.0.1:{lento.server_port}/v1/chat/completions")])
+        monkeypatch.setattr(llm, "LLM_DEADLINE", 0.35)
+        monkeypatch.setattr(llm, "http_session", llm.criar_sessao_http(pool_size=2, backoff=0))
+        inicio = time.monotonic()
+        partes = list(conversar_com_chat("uma pergunta bem longa para gerar muitas partes no stub local", "system"))
+        assert partes[-1] == AVISO_PRAZO
+        assert 1 < len(partes) < 20
+        assert time.monotonic() - inicio < 1
+    finally:
+        lento.shutdown()
+        lento.server_close()
+
+
+class StubTravaHandler(StubSSEHandler):
+    # Tokens em 0s, 0,01s e 0,44s e depois o upstream para de responder sem fechar a conexão
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for espera, parte in zip((0, 0.01, 0.43), PARTES):
+                time.sleep(espera)
+                linha = f"data: {json.dumps({'choices': [{'delta': {'content': parte}}]})}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(linha):x}\r\n".encode() + linha + b"\r\n")
+                self.wfile.flush()
+            time.sleep(5)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def upstream_travado(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTravaHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    provedor = llm.ProvedorOpenRouter("modelo")
+    monkeypatch.setattr(llm, "provedores", [provedor])
+    monkeypatch.setattr(llm, "OPENROUTER_API_URL", f"http://127.0.0.1:{server.server_port}/api/v1/chat/completions")
+    monkeypatch.setattr(llm, "http_session", llm.criar_sessao_http(pool_size=2, backoff=0))
+    # Timeout de leitura maior que o que resta depois do último token: só o prazo corta
+    monkeypatch.setattr(llm, "LLM_DEADLINE", 0.6)
+    monkeypatch.setattr(llm, "LLM_READ_TIMEOUT", 0.5)
+    monkeypatch.setattr(llm, "LLM_FLUSH_CHARS", 0)
+    yield provedor
+    server.shutdown()
+    server.server_close()
+
+
+def test_prazo_vale_para_upstream_parado(upstream_travado):
+    from src.constants import AVISO_PRAZO
+    import asyncio
+
+    async def coletar():
+        return [chunk async for chunk in llm.conversar_com_chat_async("oi", "system")]
+
+    for coletar_partes in (lambda: list(conversar_com_chat("oi", "system")), lambda: asyncio.run(coletar())):
+        inicio = time.monotonic()
+        partes = coletar_partes()
+        assert partes == PARTES + [AVISO_PRAZO]
+        assert 0.55 < time.monotonic() - inicio < 0.9
+    # Prazo esgotado não abre o disjuntor
+    assert upstream_travado.disjuntor.falhas == 0
+
+
+def test_prazo_vale_para_conexao_sem_resposta(monkeypatch):
+    from src.constants import AVISO_PRAZO
+    import asyncio
+    # Aceita a conexão (backlog do kernel) mas nunca responde
+    with socket.socket() as servidor:
+        servidor.bind(("127.0.0.1", 0))
+        servidor.listen(8)
+        provedor = llm.ProvedorOpenRouter("modelo")
+        monkeypatch.setattr(llm, "provedores", [provedor])
+        monkeypatch.setattr(llm, "OPENROUTER_API_URL", f"http://127.0.0.1:{servidor.getsockname()[1]}/")
+        monkeypatch.setattr(llm, "http_session", llm.criar_sessao_http(pool_size=2, backoff=0))
+        monkeypatch.setattr(llm, "LLM_DEADLINE", 0.3)
+
+        async def coletar():
+            return [chunk async for chunk in llm.conversar_com_chat_async("oi", "system")]
+
+        for coletar_partes in (lambda: list(conversar_com_chat("oi", "system")), lambda: asyncio.run(coletar())):
+            inicio = time.monotonic()
+            assert coletar_partes() == [AVISO_PRAZO]
+            assert time.monotonic() - inicio < 0.6
+        assert provedor.disjuntor.falhas == 0
+
+
+def test_agrupado_sai_durante_pausa_do_upstream(upstream_travado, monkeypatch):
+    import asyncio
+    monkeypatch.setattr(llm, "LLM_FLUSH_CHARS", 1000)
+    monkeypatch.setattr(llm, "LLM_FLUSH_INTERVAL", 0.05)
+
+    def com_tempo_sync():
+        inicio = time.monotonic()
+        return [(parte, time.monotonic() - inicio) for parte in conversar_com_chat("oi", "system")]
+
+    async def com_tempo_async():
+        inicio = time.monotonic()
+        return [(parte, time.monotonic() - inicio) async for parte in llm.conversar_com_chat_async("oi", "system")]
+
+    for coletar in (com_tempo_sync, lambda: asyncio.run(com_tempo_async())):
+        partes = dict(coletar())
+        # ", visitante" chega 10ms depois do primeiro envio e fica no buffer; o próximo token
+        # só vem em 0,44s, mas o acumulado sai quando o intervalo vence
+        assert partes[PARTES[1]] < 0.2
@@ -0,0 +1,123 @@
+import sys
+import os
+import csv
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.logger import GravadorLogs, gravar_arquivo, CSV_COLUNAS
+
+
+def registro(i):
+    return {"data_hora": "2025-11-21 11:43:11", "pergunta": f"pergunta {i}", "resposta": "ok", "local": "Saudação"}
+
+
+def test_lotes_por_tamanho():
+    lotes = []
+    gravador = GravadorLogs(lotes.append, tamanho_lote=5, intervalo=0.2, tamanho_fila=100)
+    for i in range(12):
+        gravador.registrar(registro(i))
+    gravador.encerrar()
+    assert sum(len(l) for l in lotes) == 12
+    assert max(len(l) for l in lotes) <= 5
+    assert len(lotes) < 12
+    assert gravador.estatisticas()["gravados"] == 12
+
+
+def test_lote_por_tempo():
+    lotes = []
+    gravador = GravadorLogs(lotes.append, tamanho_lote=100, intervalo=0.05, tamanho_fila=100)
+    gravador.registrar(registro(1))
+    limite = time.monotonic() + 2
+    while not lotes and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert lotes == [[registro(1)]]
+    gravador.encerrar()
+
+
+def test_backpressure_descarta_e_conta():
+    liberar = threading.Event()
+    gravador = GravadorLogs(lambda lote: liberar.wait(5), tamanho_lote=1, intervalo=0.01, tamanho_fila=3)
+    aceitos = [gravador.registrar(registro(i)) for i in range(20)]
+    assert aceitos.count(False) == gravador.estatisticas()["descartados"] > 0
+    liberar.set()
+    gravador.encerrar()
+
+
+def test_falha_usa_reserva_em_arquivo(tmp_path):
+    caminho = tmp_path / "usage_logs.csv"
+
+    def supabase_fora(lote):
+        raise RuntimeError("rede")
+
+    gravador = GravadorLogs(supabase_fora, tamanho_lote=10, intervalo=0.01, reserva=lambda lote: gravar_arquivo(lote, str(caminho)))
+    gravador.registrar(registro(1))
+    gravador.registrar(registro(2))
+    gravador.encerrar()
+
+    with open(caminho, encoding="utf-8") as f:
+        linhas = list(csv.reader(f))
+    assert linhas[0] == CSV_COLUNAS
+    assert [l[1] for l in linhas[1:]] == ["pergunta 1", "pergunta 2"]
+
+
+def test_modo_sincrono_grava_depois_da_resposta(monkeypatch):
+    import app as appmod
+    from src import logger
+
+    lotes = []
+    gravador = GravadorLogs(lotes.append, tamanho_lote=100, intervalo=60, sincrono=True)
+    gravador.registrar(registro(1))
+    # Nada de thread nem de gravação no caminho da requisição
+    assert lotes == [] and gravador._thread is None
+    gravador.flush()
+    assert lotes == [[registro(1)]]
+
+    monkeypatch.setattr(logger, "gravador", gravador)
+    appmod.limiter.enabled = False
+    try:
+        with appmod.app.test_client() as client:
+            response = client.post('/chat', json={'pergunta': 'Oi'}, buffered=False)
+            assert len(lotes) == 1
+            response.close()
+    finally:
+        appmod.limiter.enabled = True
+    assert len(lotes) == 2 and lotes[1][0]["caminho"] == "rapido"
+
+
+def test_csv_antigo_migrado_para_o_cabecalho_novo(tmp_path):
+    caminho = tmp_path / "usage_logs.csv"
+    caminho.write_text("data_hora,pergunta_usuario,resposta_ia,local_encontrado\n"
+                       "2025-11-21 11:43:11,oi,Olá,Saudação\n", encoding="utf-8")
+    gravar_arquivo([dict(registro(1), caminho="template")], str(caminho))
+    gravar_arquivo([registro(2)], str(caminho))
+
+    with open(caminho, encoding="utf-8") as f:
+        linhas = list(csv.reader(f))
+    assert linhas == [CSV_COLUNAS,
+                      ["2025-11-21 11:43:11", "oi", "Olá", "Saudação", ""],
+                      ["2025-11-21 11:43:11", "pergunta 1", "ok", "Saudação", "template"],
+                      ["2025-11-21 11:43:11", "pergunta 2", "ok", "Saudação", ""]]
+
+
+def test_supabase_recebe_o_caminho(monkeypatch):
+    from src import logger
+
+    inseridos = []
+
+    class Tabela:
+        def insert(self, rows):
+            inseridos.extend(rows)
+            return self
+
+        def execute(self):
+            pass
+
+    class Cliente:
+        def table(self, nome):
+            return Tabela()
+
+    monkeypatch.setattr(logger, "supabase_client", Cliente())
+    logger.gravar_supabase([dict(registro(1), caminho="llm"), registro(2)])
+    assert [r["caminho"] for r in inseridos] == ["llm", ""]
@@ -0,0 +1,44 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.orcamento import ajustar_prompt, cortar_payload, estimar_tokens, tokens_payload
+
+SYSTEM = "Você é o Guia Digital de Axixá."
+
+
+def test_estimativa_local():
+    assert estimar_tokens("") == 0
+    assert estimar_tokens("abcd") == 1
+    assert estimar_tokens("ção") == 2
+
+
+def test_prompt_pequeno_nao_muda():
+    payload = json.dumps({"nome": "IEMA", "localizacao": "Centro"}, ensure_ascii=False)
+    historico = [{"role": "user", "content": "oi"}, {"role": "assistant", "content": "Olá!"}]
+    ajuste = ajustar_prompt("Onde fica o IEMA?", SYSTEM, payload, historico)
+    assert ajuste.item_data_json == payload
+    assert ajuste.historico == historico
+    assert ajuste.economizados == 0
+
+
+def test_historico_longo_e_cortado_antes_dos_dados():
+    payload = json.dumps({"nome": "IEMA", "localizacao": "Centro"}, ensure_ascii=False)
+    historico = [{"role": "user", "content": "palavra " * 500}] + [{"role": "assistant", "content": "ok"}] * 5
+    ajuste = ajustar_prompt("E o telefone?", SYSTEM, payload, historico, limite=60, limite_mensagem=50)
+    assert len(ajuste.historico) < 4
+    assert ajuste.item_data_json == payload
+    assert ajuste.tokens <= 60
+    assert ajuste.economizados > 0
+
+
+def test_payload_cortado_por_prioridade():
+    itens = [{"nome": f"Loja {i}", "localizacao": "Centro", "telefone": "(98) 0000-0000", "descricao": "texto " * 80} for i in range(4)]
+    payload = json.dumps({"is_general": True, "category": "lojas", "items": itens}, ensure_ascii=False)
+    cortado = json.loads(cortar_payload(payload, 150))
+    assert tokens_payload(json.dumps(cortado, ensure_ascii=False)) <= 150
+    assert cortado["category"] == "lojas"
+    assert cortado["items"][0]["nome"] == "Loja 0"
+    assert cortado["items"][0]["localizacao"] == "Centro"
@@ -0,0 +1,103 @@
+import sys
+import os
+import json
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as appmod
+from src import search
+from src.reloader import Recarregador, carregar_base
+
+
+def escrever(caminho, nome_escola):
+    data = {
+        "system_prompt": ["Você é o guia."],
+        "escolas": [{"nome": nome_escola, "localizacao": "Centro", "descricao": "Escola municipal"}]
+    }
+    caminho.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # Garante mtime diferente mesmo em sistemas de arquivos com resolução grossa
+    st = os.stat(caminho)
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_indice_nao_altera_os_itens_originais():
+    base = carregar_base(appmod.PROMPT_FILE)
+    for item in base.data["escolas"]:
+        assert not any(chave.startswith("_") for chave in item)
+    assert base.indice["escolas"]["names"][0] == "ui delarey cardoso nunes"
+
+
+def test_recarga_troca_base_inteira(tmp_path):
+    caminho = tmp_path / "prompt.json"
+    escrever(caminho, "Escola Antiga")
+    base_antiga = carregar_base(str(caminho))
+    trocas = []
+    recarregador = Recarregador(str(caminho), trocas.append, base_antiga.assinatura, intervalo=0)
+
+    assert recarregador.verificar_agora() is False
+    escrever(caminho, "Escola Nova")
+    assert recarregador.verificar_agora() is True
+
+    nova = trocas[0]
+    assert nova.versao != base_antiga.versao
+    assert search.find_item_smart("Escola Nova", indice=nova.indice)["nome"] == "Escola Nova"
+    # Quem ainda segura o índice antigo continua vendo o índice antigo completo
+    assert search.find_item_smart("Escola Antiga", indice=base_antiga.indice)["nome"] == "Escola Antiga"
+
+
+def test_json_invalido_mantem_base(tmp_path):
+    caminho = tmp_path / "prompt.json"
+    escrever(caminho, "Escola Antiga")
+    trocas = []
+    recarregador = Recarregador(str(caminho), trocas.append, intervalo=0)
+    assert recarregador.verificar_agora() is True
+    caminho.write_text("{ quebrado", encoding="utf-8")
+    st = os.stat(caminho)
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    assert recarregador.verificar_agora() is False
+    assert recarregador.verificar_agora() is False
+    assert len(trocas) == 1
+
+
+def test_thread_reiniciada_apos_fork(tmp_path):
+    caminho = tmp_path / "prompt.json"
+    escrever(caminho, "Escola Antiga")
+    recarregador = Recarregador(str(caminho), lambda nova: None, intervalo=60)
+    recarregador.iniciar()
+    try:
+        primeira = recarregador._thread
+        recarregador.iniciar()
+        assert recarregador._thread is primeira
+        # Processo filho de um fork: mesmo objeto, outro pid, thread do pai inexistente
+        recarregador._pid = -1
+        recarregador.iniciar()
+        assert recarregador._thread is not primeira and recarregador._thread.is_alive()
+    finally:
+        recarregador.parar()
+
+
+def test_buscas_durante_trocas_sempre_veem_indice_completo():
+    original = appmod.base
+    outra = carregar_base(appmod.PROMPT_FILE)
+    erros = []
+    parar = threading.Event()
+
+    def buscar():
+        while not parar.is_set():
+            item = search.find_item_smart("Onde fica o IEMA?")
+            if not item or item.get("nome") != "IEMA - Unidade Plena de Axixá":
+                erros.append(item)
+
+    threads = [threading.Thread(target=buscar) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        for i in range(200):
+            appmod.trocar_base(outra if i % 2 else original)
+    finally:
+        parar.set()
+        for t in threads:
+            t.join()
+        appmod.trocar_base(original)
+    assert erros == []
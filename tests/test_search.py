@@ -0,0 +1,105 @@
+import sys
+import os
+import pytest
+from rapidfuzz import process, fuzz
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import search
+from src.constants import STOP_WORDS
+from src.utils import normalize_text
+from tests.test_cenarios_100 import CENARIOS
+
+
+def busca_completa(query_final):
+    resultados = {}
+    for categoria, cache_data in search.SEARCH_CACHE.items():
+        if cache_data["texts"]:
+            resultados[categoria] = process.extractOne(query_final, cache_data["texts"], scorer=fuzz.token_set_ratio)
+    return resultados
+
+
+def perguntas_de_teste():
+    perguntas = [p for p, _ in CENARIOS if p]
+    for cache_data in search.SEARCH_CACHE.values():
+        for item in cache_data["objects"]:
+            nome = item.get("nome") or item.get("orgao") or ""
+            perguntas.append(nome)
+            perguntas.append(f"onde fica {nome[:len(nome) // 2]}")
+    return perguntas + ["igrja matris", "escol", "farmacia perto", "??", "a b c"]
+
+
+def test_indice_invertido_cobre_todos_os_textos():
+    for cache_data in search.SEARCH_CACHE.values():
+        indexados = set()
+        for posicoes in cache_data["index"].values():
+            indexados.update(posicoes)
+        assert indexados == set(range(len(cache_data["texts"])))
+
+
+@pytest.mark.parametrize("pergunta", perguntas_de_teste())
+def test_poda_preserva_ranking(pergunta):
+    pergunta_limpa = normalize_text(pergunta)
+    termos = [w for w in pergunta_limpa.split() if w not in STOP_WORDS and len(w) > 1]
+    query_final = " ".join(termos) if termos else pergunta_limpa
+    query_grams = search._grams(query_final)
+    tamanho_query = search._tamanho_tokens(query_final)
+
+    for categoria, esperado in busca_completa(query_final).items():
+        obtido = search._melhor_match(query_final, query_grams, tamanho_query, search.SEARCH_CACHE[categoria], 50)
+        if esperado[1] >= 50:
+            assert obtido is not None
+            assert (obtido[1], obtido[2]) == (esperado[1], esperado[2])
+
+
+def rota_antiga(texto_input):
+    from src.constants import (SAUDACOES_WORDS, SAUDACOES_PHRASES, IDENTITY_KEYWORDS,
+                               CATEGORY_KEYWORDS_MAP, GENERIC_TRIGGERS, CATEGORIAS_ALVO)
+    termos = [w for w in texto_input.split() if w not in STOP_WORDS and len(w) > 1]
+    query_final = " ".join(termos) if termos else texto_input
+    categorias = [c for c in CATEGORIAS_ALVO if any(kw in query_final for kw in CATEGORY_KEYWORDS_MAP.get(c, []))]
+    return {
+        "saudacao": bool(set(texto_input.split()) & SAUDACOES_WORDS) or any(p in texto_input for p in SAUDACOES_PHRASES),
+        "identidade": any(k in texto_input for k in IDENTITY_KEYWORDS),
+        "historia": "historia" in texto_input,
+        "lista_comidas": "comida" in texto_input and "quais" in texto_input,
+        "categoria_generica": next((c for c, t in GENERIC_TRIGGERS.items() if query_final in t), None),
+        "categorias": frozenset(categorias),
+        "categoria_detectada": categorias[0] if categorias else None,
+        "query_final": query_final,
+    }
+
+
+def textos_de_roteamento():
+    from src.constants import CATEGORY_KEYWORDS_MAP, IDENTITY_KEYWORDS, GENERIC_TRIGGERS
+    textos = [normalize_text(p) for p in perguntas_de_teste()]
+    for keywords in list(CATEGORY_KEYWORDS_MAP.values()) + list(GENERIC_TRIGGERS.values()):
+        for kw in keywords:
+            textos += [kw, f"onde {kw}", f"{kw}s da cidade", f"o{kw}", f"quais comida {kw}"]
+    textos += IDENTITY_KEYWORDS + ["mercadinho comprar", "comprar", "onde comprar", "historia  quem   fez", "ola  bom dia", "x"]
+    return textos
+
+
+@pytest.mark.parametrize("texto", textos_de_roteamento())
+def test_roteador_equivale_as_buscas_encadeadas(texto):
+    rota = search.rotear(texto)
+    assert {campo: getattr(rota, campo) for campo in rota_antiga(texto)} == rota_antiga(texto)
+
+
+@pytest.mark.parametrize("pergunta", [p for p, _ in CENARIOS if p])
+def test_payload_precomputado(pergunta):
+    import json
+    resultado = search.buscar_item(pergunta)
+    if resultado is None:
+        return
+    assert '"_' not in resultado.payload
+    esperado = dict(resultado.item)
+    if esperado.get("is_general") and esperado["category"] in ("escolas", "lojas", "igrejas"):
+        esperado["description"] = " povoados"
+    assert json.loads(resultado.payload) == json.loads(json.dumps(esperado, ensure_ascii=False))
+
+
+def test_lote_vetorizado_igual_a_busca_individual():
+    perguntas = perguntas_de_teste() + ["", "escolas"]
+    assert search.buscar_itens(perguntas) == [search.buscar_item(p) for p in perguntas]
+    assert search.find_items_smart(perguntas[:5]) == [search.find_item_smart(p) for p in perguntas[:5]]
@@ -0,0 +1,93 @@
+import ast
+import sys
+import os
+import json
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as appmod
+from src.config import INDEX_SNAPSHOT
+from src.reloader import carregar_base, conteudo_snapshot
+from src.search import buscar_item, tabelas_do_indice
+from src.snapshot import ARQUIVOS_CODIGO, FORMATO, MAGICO, gravar_snapshot, ler_snapshot
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def gerar(tmp_path):
+    with open(appmod.PROMPT_FILE, "rb") as f:
+        fonte = f.read()
+    destino = tmp_path / "indice.snapshot"
+    gravar_snapshot(str(destino), fonte, conteudo_snapshot(carregar_base(appmod.PROMPT_FILE)))
+    return destino, fonte
+
+
+def test_snapshot_igual_a_reconstrucao(tmp_path):
+    destino, _ = gerar(tmp_path)
+    reconstruida = carregar_base(appmod.PROMPT_FILE)
+    do_snapshot = carregar_base(appmod.PROMPT_FILE, str(destino))
+    assert tabelas_do_indice(do_snapshot.indice) == tabelas_do_indice(reconstruida.indice)
+    assert do_snapshot.indice.corpus == reconstruida.indice.corpus
+    assert (do_snapshot.secoes, do_snapshot.versao, do_snapshot.system_prompt) == \
+        (reconstruida.secoes, reconstruida.versao, reconstruida.system_prompt)
+    # Os objetos do índice são os próprios itens de data, como na construção
+    assert do_snapshot.indice["escolas"]["objects"][0] is do_snapshot.data["escolas"][0]
+    pergunta = "Onde fica a Josy Boutique?"
+    assert buscar_item(pergunta, indice=do_snapshot.indice).payload == buscar_item(pergunta, indice=reconstruida.indice).payload
+
+
+def test_snapshot_invalido_e_ignorado(tmp_path):
+    destino, fonte = gerar(tmp_path)
+    assert ler_snapshot(str(destino), fonte) is not None
+    # prompt.json mudou depois do build
+    assert ler_snapshot(str(destino), fonte + b" ") is None
+    # corpo corrompido
+    bruto_ok = destino.read_bytes()
+    bruto = bytearray(bruto_ok)
+    bruto[-10] ^= 0xFF
+    corrompido = tmp_path / "corrompido.snapshot"
+    corrompido.write_bytes(bytes(bruto))
+    assert ler_snapshot(str(corrompido), fonte) is None
+    # formato antigo
+    antigo = tmp_path / "antigo.snapshot"
+    antigo.write_bytes(MAGICO + (FORMATO + 1).to_bytes(2, "big") + destino.read_bytes()[len(MAGICO) + 2:])
+    assert ler_snapshot(str(antigo), fonte) is None
+    # código do índice mudou depois do build
+    outro_codigo = tmp_path / "outro_codigo.snapshot"
+    pos = len(MAGICO) + 2 + 32
+    outro_codigo.write_bytes(bruto_ok[:pos] + bytes(32) + bruto_ok[pos + 32:])
+    assert ler_snapshot(str(outro_codigo), fonte) is None
+    assert ler_snapshot(str(tmp_path / "inexistente"), fonte) is None
+    # Em todos os casos carregar_base cai na reconstrução
+    assert carregar_base(appmod.PROMPT_FILE, str(corrompido)).indice["escolas"]["texts"]
+
+
+def test_snapshot_do_repositorio_em_dia():
+    # Mudou o prompt.json ou a construção do índice? Rode python -m src.snapshot
+    with open(appmod.PROMPT_FILE, "rb") as f:
+        conteudo = ler_snapshot(INDEX_SNAPSHOT, f.read())
+    assert conteudo is not None
+    # Além dos hashes: o snapshot versionado é igual ao que o código atual constrói
+    assert conteudo == conteudo_snapshot(carregar_base(appmod.PROMPT_FILE))
+
+
+def test_assinatura_cobre_os_modulos_importados():
+    # Todo módulo de src importado pela construção do índice entra no hash do código
+    importados = set()
+    for nome in ARQUIVOS_CODIGO:
+        with open(os.path.join(RAIZ, "src", nome), encoding="utf-8") as f:
+            arvore = ast.parse(f.read())
+        importados |= {n.module.split(".")[1] + ".py" for n in ast.walk(arvore)
+                       if isinstance(n, ast.ImportFrom) and n.module and n.module.startswith("src.")}
+    assert importados - {"config.py", "snapshot.py"} <= set(ARQUIVOS_CODIGO)
+
+
+def test_partida_sem_supabase_nem_redis():
+    env = dict(os.environ, SUPABASE_URL="https://exemplo.supabase.co", SUPABASE_KEY="chave", REDIS_URL="redis://127.0.0.1:1/0",
+               LOG_FILE="", KB_RELOAD_INTERVAL="0")
+    codigo = "import sys, json, app; print(json.dumps(sorted(m for m in ('supabase', 'redis', 'numpy') if m in sys.modules)))"
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=env, capture_output=True, text=True, timeout=60)
+    assert saida.returncode == 0, saida.stderr
+    assert json.loads(saida.stdout.strip().splitlines()[-1]) == []
+
@@ -0,0 +1,118 @@
+import sys
+import os
+import json
+import random
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sse import Agrupador, LeitorSSE, conteudo_do_evento, ler_stream
+
+TOKENS = ["Olá", ", visitante", "! A Igreja", ' da "Luz"', " fica em\nBelém", " — açaí 🌴", ". Fim"]
+
+
+def stream_openrouter(tokens, separador=b"\n"):
+    saida = b": OPENROUTER PROCESSING" + separador * 2
+    for token in tokens:
+        evento = json.dumps({"id": "x", "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}}]})
+        saida += b"data: " + evento.encode("utf-8") + separador * 2
+    return saida + b"data: [DONE]" + separador * 2
+
+
+def test_leitor_em_pedacos_arbitrarios():
+    bruto = stream_openrouter(TOKENS)
+    rng = random.Random(7)
+    for _ in range(50):
+        leitor = LeitorSSE()
+        conteudos, pos = [], 0
+        while pos < len(bruto):
+            passo = rng.randint(1, 40)
+            conteudos += leitor.alimentar(bruto[pos:pos + passo])
+            pos += passo
+        conteudos += leitor.finalizar()
+        assert conteudos == TOKENS
+        assert leitor.terminou
+
+
+def test_crlf_data_multilinha_e_comentarios():
+    bruto = (b": ping\r\n\r\nevent: message\r\nid: 1\r\ndata: {\"choices\": [{\"delta\":\r\n"
+             b"data: {\"content\": \"linha\"}}]}\r\n\r\ndata: {\"choices\":[{\"delta\":{\"content\":null}}]}\r\n\r\n")
+    leitor = LeitorSSE()
+    assert leitor.alimentar(bruto) == ["linha"]
+
+
+def test_linha_data_sem_dois_pontos_vale_como_campo_vazio():
+    bruto = b'data: {"choices": [{"delta":\r\ndata\r\ndata: {"content": "ok"}}]}\r\n\r\ndata\n\ndata: [DONE]\n\n'
+    for passo in range(1, len(bruto) + 1):
+        leitor = LeitorSSE()
+        conteudos = []
+        for pos in range(0, len(bruto), passo):
+            conteudos += leitor.alimentar(bruto[pos:pos + passo])
+        assert conteudos + leitor.finalizar() == ["ok"]
+        assert leitor.terminou
+
+    # "data" e "data:" são o mesmo campo vazio: a linha extra entra no buffer do evento
+    for linha in (b"data", b"data:"):
+        leitor = LeitorSSE()
+        leitor.alimentar(b"data: a\n" + linha + b"\ndata: b\n")
+        assert leitor._dados == [b"a", b"", b"b"]
+
+
+def test_evento_sem_linha_final_e_caminho_lento():
+    leitor = LeitorSSE()
+    assert leitor.alimentar(b'data: {"choices":[{"delta":{"reasoning":"\\"content\\": x","content":"ok"}}]}') == []
+    assert leitor.finalizar() == ["ok"]
+    assert conteudo_do_evento(b'{"choices":[{"delta":{}}]}') == ""
+
+
+def test_agrupador_envia_por_tamanho_frase_e_tempo():
+    agrupador = Agrupador(tamanho=10, intervalo=60)
+    assert agrupador.adicionar("Oi") == "Oi"
+    assert agrupador.adicionar(" tudo") is None
+    assert agrupador.adicionar(" bem?") == " tudo bem?"
+    assert agrupador.adicionar(" a") is None
+    assert agrupador.adicionar("bcdefghijk") == " abcdefghijk"
+    assert agrupador.adicionar(" resto") is None
+    assert agrupador.esvaziar() == " resto"
+
+    por_tempo = Agrupador(tamanho=1000, intervalo=0)
+    assert [por_tempo.adicionar(t) for t in ["a", "b"]] == ["a", "b"]
+
+
+def test_ler_stream_preserva_o_texto():
+    pedacos = [stream_openrouter(TOKENS)[i:i + 7] for i in range(0, len(stream_openrouter(TOKENS)), 7)]
+    saida = list(ler_stream(pedacos, 48, 60))
+    assert "".join(saida) == "".join(TOKENS)
+    assert len(saida) < len(TOKENS)
+
+
+def test_pausa_do_upstream_envia_o_acumulado():
+    eventos = [b"data: " + json.dumps({"choices": [{"delta": {"content": t}}]}).encode("utf-8") + b"\n\n" for t in ["Oi", " tudo", " bem"]]
+    recebidos = []
+
+    def pedacos():
+        yield eventos[0]
+        yield eventos[1]
+        time.sleep(0.06)
+        # Leitor esperou o intervalo sem dados
+        yield None
+        recebidos.append("pausa")
+        yield eventos[2]
+
+    for saida in ler_stream(pedacos(), 1000, 0.05):
+        recebidos.append(saida)
+    assert recebidos == ["Oi", " tudo", "pausa", " bem"]
+
+
+def test_erro_no_meio_envia_o_acumulado():
+    def pedacos():
+        yield stream_openrouter(["Oi", " tudo"])
+        raise TimeoutError("upstream")
+
+    stream = ler_stream(pedacos(), 1000, 60)
+    assert [next(stream), next(stream)] == ["Oi", " tudo"]
+    try:
+        next(stream)
+        assert False
+    except TimeoutError:
+        pass
@@ -0,0 +1,52 @@
+import sys
+import os
+import re
+import unicodedata
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import load_prompt_data, normalize_text
+from tests.test_cenarios_100 import CENARIOS
+
+PROMPT_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'prompt.json')
+
+
+def normalize_text_original(text):
+    if not text: return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return text.strip()
+
+
+def textos(valor):
+    if isinstance(valor, str):
+        yield valor
+    elif isinstance(valor, dict):
+        for chave, v in valor.items():
+            yield chave
+            yield from textos(v)
+    elif isinstance(valor, list):
+        for v in valor:
+            yield from textos(v)
+
+
+CORPUS = list(textos(load_prompt_data(PROMPT_FILE))) + [p for p, _ in CENARIOS] + [
+    "Ação, Coração & Pão!", "ÇÃO", "İstanbul", "ﬁm ½ kg", "Straße", "ΣΟΦΙΑ ὀδυσσεύς", "😀 Axixá 🎉",
+    "tab\there\nnova linha", "  espaços  ", "ñ combinante", "Ǆ ǅ ǆ", "“aspas” — travessão…", "",
+]
+
+
+@pytest.mark.parametrize("texto", CORPUS)
+def test_normalize_identico_ao_original(texto):
+    normalize_text.cache_clear()
+    assert normalize_text(texto) == normalize_text_original(texto)
+    # Segunda chamada vem do LRU e precisa devolver o mesmo valor
+    assert normalize_text(texto) == normalize_text_original(texto)
+
+
+def test_tabela_cobre_todos_os_codepoints_de_forma_identica():
+    for codigo in range(0, 0x3000):
+        c = chr(codigo)
+        assert normalize_text.__wrapped__(c + "a") == normalize_text_original(c + "a")